@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Board Profiles
+Per-board GPIO capabilities and the button pin allocator used by the generator
+"""
+
+# Pins are listed in allocation order; i2c_pins are the (SDA, SCL) defaults
+# used when button banks need the I2C bus. Buttons use the internal pull-up, so
+# input-only pins without one (ESP32 GPIO34-39) are never handed out, and
+# strapping pins are avoided because a held button can change the boot mode.
+BOARD_PROFILES = {
+    'esp32dev': {
+        'title': 'ESP32 DevKit (ESP32-WROOM-32)',
+        'framework': 'arduino',
+        'button_pins': [16, 17, 18, 19, 21, 22, 23, 25, 26, 27, 32, 33, 13, 14, 4],
+        'strapping_pins': [0, 2, 5, 12, 15],
+        'input_only_pins': [34, 35, 36, 37, 38, 39],
+        'reserved_pins': {1: 'UART TX', 3: 'UART RX', 6: 'flash', 7: 'flash', 8: 'flash',
+                          9: 'flash', 10: 'flash', 11: 'flash'},
+        'missing_pins': [20, 24, 28, 29, 30, 31],
+        'max_gpio': 39,
+        'i2c_pins': (21, 22),
+    },
+    'esp32-s2-saola-1': {
+        'title': 'ESP32-S2 Saola',
+        'framework': 'arduino',
+        'button_pins': [1, 2, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 21, 33, 34, 35, 36, 37, 38],
+        'strapping_pins': [0, 45, 46],
+        'input_only_pins': [46],
+        'reserved_pins': {19: 'USB D-', 20: 'USB D+', 26: 'flash/PSRAM', 27: 'flash', 28: 'flash',
+                          29: 'flash', 30: 'flash', 31: 'flash', 32: 'flash', 43: 'UART TX', 44: 'UART RX'},
+        'missing_pins': [22, 23, 24, 25],
+        'max_gpio': 46,
+        'i2c_pins': (8, 9),
+    },
+    'esp32-s3-devkitc-1': {
+        'title': 'ESP32-S3 DevKitC-1',
+        'framework': 'arduino',
+        'button_pins': [4, 5, 6, 7, 15, 16, 17, 18, 8, 9, 10, 11, 12, 13, 14, 1, 2, 21, 39, 40, 41, 42, 47],
+        'strapping_pins': [0, 3, 45, 46],
+        'input_only_pins': [],
+        'reserved_pins': {19: 'USB D-', 20: 'USB D+', 26: 'flash', 27: 'flash', 28: 'flash', 29: 'flash',
+                          30: 'flash', 31: 'flash', 32: 'flash', 33: 'octal PSRAM', 34: 'octal PSRAM',
+                          35: 'octal PSRAM', 36: 'octal PSRAM', 37: 'octal PSRAM', 38: 'RGB LED (v1.0)',
+                          43: 'UART TX', 44: 'UART RX', 48: 'RGB LED (v1.1)'},
+        'missing_pins': [22, 23, 24, 25],
+        'max_gpio': 48,
+        'i2c_pins': (8, 9),
+    },
+    'esp32-c3-devkitm-1': {
+        'title': 'ESP32-C3 DevKitM-1',
+        'framework': 'arduino',
+        'button_pins': [4, 5, 6, 7, 0, 1, 3, 10],
+        'strapping_pins': [2, 8, 9],
+        'input_only_pins': [],
+        'reserved_pins': {12: 'flash', 13: 'flash', 14: 'flash', 15: 'flash', 16: 'flash', 17: 'flash',
+                          18: 'USB D-', 19: 'USB D+', 20: 'UART RX', 21: 'UART TX'},
+        'missing_pins': [],
+        'max_gpio': 21,
+        'i2c_pins': (4, 5),
+    },
+    'esp32-c6-devkitc-1': {
+        'title': 'ESP32-C6 DevKitC-1',
+        'framework': 'esp-idf',
+        'button_pins': [0, 1, 2, 3, 4, 5, 6, 7, 10, 11, 18, 19, 20, 21, 22, 23],
+        'strapping_pins': [8, 9, 15],
+        'input_only_pins': [],
+        'reserved_pins': {12: 'USB D-', 13: 'USB D+', 16: 'UART TX', 17: 'UART RX', 24: 'flash',
+                          25: 'flash', 26: 'flash', 27: 'flash', 28: 'flash', 29: 'flash', 30: 'flash'},
+        'missing_pins': [],
+        'max_gpio': 30,
+        'i2c_pins': (6, 7),
+    },
+}
+DEFAULT_BOARD = 'esp32dev'
+
+
+def get_board_profile(board):
+    """Return the profile for an ESPHome board id, or None if it is unknown"""
+    return BOARD_PROFILES.get((board or DEFAULT_BOARD).strip().lower())
+
+
+def parse_gpio(pin):
+    """Return the GPIO number of 'GPIO16' style values, or None"""
+    pin = (pin or '').strip().upper()
+    if pin.startswith('GPIO') and pin[4:].isdigit():
+        return int(pin[4:])
+    return None
+
+
+def check_button_pin(profile, pin):
+    """Classify a button pin for a board
+
+    Returns (level, reason) where level is 'ok', 'warning' (strapping pin,
+    works as long as the button is not held during boot) or 'error'.
+    """
+    number = parse_gpio(pin)
+    if number is None or number > profile['max_gpio'] or number in profile['missing_pins']:
+        return 'error', f"{pin} does not exist on {profile['title']}"
+    if number in profile['reserved_pins']:
+        return 'error', f"{pin} is used for {profile['reserved_pins'][number]} on {profile['title']}"
+    if number in profile['input_only_pins']:
+        return 'error', f"{pin} is input-only without an internal pull-up on {profile['title']}"
+    if number in profile['strapping_pins']:
+        return 'warning', f"{pin} is a strapping pin on {profile['title']}; a held button can break boot"
+    return 'ok', ''
+
+
+def allocate_button_pins(profile, count, used=()):
+    """Hand out up to count button pins, skipping pins in used
+
+    Allocation is deterministic so regenerating keeps the wiring stable.
+    Returns fewer pins than requested when the board runs out of safe pins.
+    """
+    taken = {parse_gpio(pin) for pin in used}
+    free = [number for number in profile['button_pins'] if number not in taken]
+    return [f'GPIO{number}' for number in free[:count]]
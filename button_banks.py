@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Button Banks
+I/O expander and shift register banks that multiplex PC buttons beyond the
+ESP32's native pins
+"""
+
+import re
+
+# ESPHome component, pin schema key and input count for each bank type, plus the
+# rated I2C clock of the expander chips (also their default frequency)
+EXPANDER_TYPES = {
+    'mcp23017': {'component': 'mcp23017', 'pin_key': 'mcp23xxx', 'bus': 'i2c', 'inputs': 16, 'pullup': True,
+                 'max_frequency': '400kHz'},
+    'pcf8574': {'component': 'pcf8574', 'pin_key': 'pcf8574', 'bus': 'i2c', 'inputs': 8, 'pullup': False,
+                'max_frequency': '100kHz'},
+    'pcf8575': {'component': 'pcf8574', 'pin_key': 'pcf8574', 'bus': 'i2c', 'inputs': 16, 'pullup': False,
+                'max_frequency': '400kHz'},
+    '74hc165': {'component': 'sn74hc165', 'pin_key': 'sn74hc165', 'bus': 'shift', 'inputs': 8, 'pullup': False},
+}
+SHIFT_CONTROL_PINS = ('data_pin', 'clock_pin', 'load_pin')
+DEFAULT_DEBOUNCE = '30ms'
+# Bus clock when only the display uses I2C
+DEFAULT_FREQUENCY = '400kHz'
+
+BANK_SECTION_PATTERN = re.compile(r'^BANK(\d+)$')
+BANK_PIN_PATTERN = re.compile(r'^(BANK\d+):(\d+)$', re.IGNORECASE)
+DURATION_PATTERN = re.compile(r'^\d+ms$')
+FREQUENCY_PATTERN = re.compile(r'^(\d+)(k?Hz)$')
+
+
+def bank_sections(config):
+    """[BANKn] section names in bank number order"""
+    numbered = [(int(match.group(1)), name) for name in config.sections()
+                for match in [BANK_SECTION_PATTERN.match(name)] if match]
+    return [name for _, name in sorted(numbered)]
+
+
+def parse_bank_pin(value):
+    """Split 'BANK1:3' into ('BANK1', 3), or return None for other pins"""
+    match = BANK_PIN_PATTERN.match((value or '').strip())
+    if not match:
+        return None
+    return match.group(1).upper(), int(match.group(2))
+
+
+def parse_frequency(value):
+    """I2C clock in Hz for '400kHz' / '100000Hz' style values"""
+    match = FREQUENCY_PATTERN.match(value)
+    return int(match.group(1)) * (1000 if match.group(2) == 'kHz' else 1)
+
+
+def load_banks(config):
+    """Return one dict per configured bank, keyed by section name"""
+    banks = {}
+    for section in bank_sections(config):
+        bank = config[section]
+        bank_type = bank.get('type', '').strip().lower()
+        spec = EXPANDER_TYPES.get(bank_type)
+        try:
+            chips = int(bank.get('chips', '1')) if spec and spec['bus'] == 'shift' else 1
+        except ValueError:
+            chips = 0
+        default_frequency = spec.get('max_frequency', '') if spec else ''
+        banks[section] = {
+            'section': section,
+            'id': section.lower(),
+            'type': bank_type,
+            'spec': spec,
+            'address': bank.get('address', ''),
+            'frequency': bank.get('frequency', default_frequency).strip(),
+            'debounce': bank.get('debounce', DEFAULT_DEBOUNCE).strip(),
+            'chips': chips,
+            'inputs': spec['inputs'] * chips if spec else 0,
+            'pins': {key: bank.get(key, 'auto').strip() for key in SHIFT_CONTROL_PINS},
+        }
+    return banks
+
+
+def validate_banks(banks, errors):
+    """Append an error for every invalid bank setting"""
+    addresses = {}
+    for section, bank in banks.items():
+        where = f"[{section}]"
+        if bank['spec'] is None:
+            errors.append(f"{where}: type must be one of {', '.join(EXPANDER_TYPES)}")
+            continue
+        if not DURATION_PATTERN.match(bank['debounce']):
+            errors.append(f"{where}: debounce {bank['debounce']!r} must look like 30ms")
+        if bank['spec']['bus'] == 'i2c':
+            try:
+                address = int(bank['address'], 0)
+            except ValueError:
+                errors.append(f"{where}: address {bank['address']!r} must look like 0x20")
+                continue
+            if not 0x08 <= address <= 0x77:
+                errors.append(f"{where}: address {bank['address']} is outside the I2C range 0x08-0x77")
+            elif address in addresses:
+                errors.append(f"{where}: address {bank['address']} already used by [{addresses[address]}]")
+            else:
+                addresses[address] = section
+            if not FREQUENCY_PATTERN.match(bank['frequency']):
+                errors.append(f"{where}: frequency {bank['frequency']!r} must look like 400kHz")
+            elif parse_frequency(bank['frequency']) > parse_frequency(bank['spec']['max_frequency']):
+                errors.append(f"{where}: frequency {bank['frequency']} is above the "
+                              f"{bank['spec']['max_frequency']} a {bank['type']} is rated for")
+        elif bank['chips'] < 1:
+            errors.append(f"{where}: chips must be at least 1")
+
+
+def uses_i2c(banks):
+    """Whether any bank sits on the I2C bus"""
+    return any(bank['spec'] and bank['spec']['bus'] == 'i2c' for bank in banks.values())
+
+
+def i2c_frequency(banks):
+    """Clock of the shared I2C bus: the slowest frequency any I2C bank asks for
+
+    Expanders are read once per main loop pass, so a bank's frequency is what
+    sets its scan time; every chip on the bus has to keep up with it.
+    """
+    frequencies = [bank['frequency'] for bank in banks.values()
+                   if bank['spec'] and bank['spec']['bus'] == 'i2c']
+    return min(frequencies, key=parse_frequency, default=DEFAULT_FREQUENCY)
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Configuration Schema
+Versioned config.ini schema with chained migrations and a single-pass validator
+"""
+
+import configparser
+import ipaddress
+import re
+
+from board_profiles import BOARD_PROFILES, DEFAULT_BOARD, check_button_pin, get_board_profile
+from button_banks import SHIFT_CONTROL_PINS, load_banks, parse_bank_pin, uses_i2c, validate_banks
+from scripts.import_inventory import normalize_ip, normalize_mac
+from scripts.wheelhouse import PYTHON_VERSION_PATTERN, parse_python_versions
+
+# Bump together with a new entry in MIGRATIONS whenever config keys change
+CONFIG_VERSION = 9
+
+# Power actions the PC agent can execute, with their web button titles
+POWER_ACTIONS = {
+    'shutdown': 'Shutdown',
+    'restart': 'Restart',
+    'sleep': 'Sleep',
+    'hibernate': 'Hibernate',
+    'lock': 'Lock',
+    'logoff': 'Log Off',
+}
+AGENT_AUTH_MODES = ('hmac', 'none')
+# How the ESP32 and the PC agents exchange commands and status
+TRANSPORTS = ('http', 'mqtt')
+# How each PC agent is shipped: a loose script or a single .pyz bundle
+AGENT_FORMATS = ('script', 'pyz')
+# Operating systems the agent and its service files are generated for
+PC_OPERATING_SYSTEMS = ('windows', 'linux', 'macos')
+# Power actions the agent has a command for on each operating system
+OS_POWER_ACTIONS = {
+    'windows': tuple(POWER_ACTIONS),
+    'linux': tuple(POWER_ACTIONS),
+    'macos': tuple(action for action in POWER_ACTIONS if action != 'hibernate'),
+}
+
+# Optional status display; OLED models map to their height in pixels
+DISPLAY_TYPES = ('none', 'ssd1306', 'ws2812')
+OLED_MODELS = {'SSD1306 128x64': 64, 'SSD1306 128x32': 32, 'SH1106 128x64': 64}
+
+REQUIRED_ESP32_KEYS = ('device_name', 'friendly_name', 'static_ip', 'gateway', 'subnet', 'dns')
+REQUIRED_PC_KEYS = ('name', 'mac_address', 'ip_address')
+PC_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_]+$')
+PIN_PATTERN = re.compile(r'^GPIO\d+$', re.IGNORECASE)
+
+
+class ConfigSchemaError(ValueError):
+    """Raised when a configuration cannot be migrated or fails validation"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("Invalid configuration:\n" + "\n".join(f"  - {error}" for error in self.errors))
+
+
+def get_config_version(config):
+    """Schema version of a config; configs predating versioning are version 0"""
+    return int(config.get('GENERAL', 'config_version', fallback='0'))
+
+
+def migrate_0_to_1(config):
+    """Add the agent control settings introduced after the first release
+
+    Deployments created before request signing keep accepting unsigned
+    requests until agent_auth is switched to hmac and the secrets are flashed.
+    """
+    general = config['GENERAL']
+    general.setdefault('shutdown_delay', '5')
+    general.setdefault('agent_rate_limit', '6')
+    general.setdefault('agent_rate_burst', '3')
+    general.setdefault('power_actions', ','.join(POWER_ACTIONS))
+    general.setdefault('agent_auth', 'none')
+    if 'AGGREGATOR' not in config:
+        config['AGGREGATOR'] = {'listen_host': '0.0.0.0', 'port': '8080', 'poll_interval': '5'}
+
+
+def migrate_1_to_2(config):
+    """Record the board profile; earlier releases always generated esp32dev"""
+    if 'ESP32' in config:
+        config['ESP32'].setdefault('board', DEFAULT_BOARD)
+
+
+def migrate_2_to_3(config):
+    """Add agent request timeout, retry and concurrency settings
+
+    Existing deployments keep the previous 5 second request timeout.
+    """
+    general = config['GENERAL']
+    general.setdefault('agent_timeout', '5')
+    general.setdefault('agent_retries', '1')
+    general.setdefault('agent_backoff', '2')
+    general.setdefault('agent_backoff_max', '30')
+    general.setdefault('agent_max_pending', '4')
+
+
+def migrate_3_to_4(config):
+    """Add the transport setting and the MQTT broker section (HTTP stays the default)"""
+    config['GENERAL'].setdefault('transport', 'http')
+    if 'MQTT' not in config:
+        config['MQTT'] = {'broker': '', 'port': '1883', 'username': '', 'topic_prefix': 'pc_controller'}
+
+
+def migrate_4_to_5(config):
+    """Record each PC's operating system; earlier releases only generated Windows files"""
+    config['GENERAL'].setdefault('agent_idle_exit', '15')
+    for section in config.sections():
+        if re.match(r'^PC\d+$', section):
+            config[section].setdefault('os', 'windows')
+
+
+def migrate_5_to_6(config):
+    """Add the offline wheelhouse, left off so existing launchers keep installing online"""
+    config['GENERAL'].setdefault('wheelhouse', 'false')
+    config['GENERAL'].setdefault('wheelhouse_python', '3.10,3.11,3.12,3.13')
+
+
+def migrate_6_to_7(config):
+    """Add the agent packaging format; existing deployments keep the loose script"""
+    config['GENERAL'].setdefault('agent_format', 'script')
+
+
+def migrate_7_to_8(config):
+    """Add folder sync settings; no PC has a sync target until one is configured"""
+    config['GENERAL'].setdefault('sync_workers', '4')
+    for section in config.sections():
+        if re.match(r'^PC\d+$', section):
+            config[section].setdefault('sync_target', '')
+
+
+def migrate_8_to_9(config):
+    """Add the Wake-on-LAN relay, off so every PC is still woken by the ESP32 directly"""
+    config['GENERAL'].setdefault('wol_relay', '')
+
+
+# MIGRATIONS[n] upgrades a version n config to version n + 1
+MIGRATIONS = [
+    migrate_0_to_1,
+    migrate_1_to_2,
+    migrate_2_to_3,
+    migrate_3_to_4,
+    migrate_4_to_5,
+    migrate_5_to_6,
+    migrate_6_to_7,
+    migrate_7_to_8,
+    migrate_8_to_9,
+]
+
+
+def migrate_config(config):
+    """Upgrade a config in place to CONFIG_VERSION
+
+    Returns the list of versions migrated from, empty when already current.
+    """
+    if 'GENERAL' not in config:
+        raise ConfigSchemaError(["missing [GENERAL] section"])
+    version = get_config_version(config)
+    if version > CONFIG_VERSION:
+        raise ConfigSchemaError([
+            f"config_version {version} is newer than this generator supports ({CONFIG_VERSION})"
+        ])
+    applied = []
+    while version < CONFIG_VERSION:
+        MIGRATIONS[version](config)
+        applied.append(version)
+        version += 1
+        config['GENERAL']['config_version'] = str(version)
+    return applied
+
+
+def get_esp32_network(config):
+    """IPv4 network the ESP32 sits on, or None when its address is not configured"""
+    try:
+        return ipaddress.ip_network(f"{config.get('ESP32', 'static_ip')}/{config.get('ESP32', 'subnet')}",
+                                    strict=False)
+    except (configparser.Error, ValueError):
+        return None
+
+
+def is_remote_subnet(network, ip_address):
+    """Whether a PC is outside the ESP32's subnet, where its WoL broadcasts do not reach"""
+    try:
+        return network is not None and ipaddress.ip_address(ip_address) not in network
+    except ValueError:
+        return False
+
+
+def _check_int(errors, where, key, value, minimum):
+    try:
+        if int(value) < minimum:
+            errors.append(f"{where}: {key} must be at least {minimum}")
+    except ValueError:
+        errors.append(f"{where}: {key} must be a whole number, got {value!r}")
+
+
+def _check_seconds(errors, where, key, value):
+    try:
+        if float(value) <= 0:
+            errors.append(f"{where}: {key} must be greater than 0")
+    except ValueError:
+        errors.append(f"{where}: {key} must be a number of seconds, got {value!r}")
+
+
+def validate_config(config, warnings=None):
+    """Validate a migrated config in one pass, returning every error found
+
+    Problems that do not stop generation (such as strapping pins) are
+    appended to warnings when a list is given.
+    """
+    errors = []
+    warnings = [] if warnings is None else warnings
+
+    profile = get_board_profile(config.get('ESP32', 'board', fallback=DEFAULT_BOARD))
+    if profile is None:
+        errors.append(f"[ESP32]: unknown board {config.get('ESP32', 'board')!r} "
+                      f"(known: {', '.join(BOARD_PROFILES)})")
+    if 'ESP32' not in config:
+        errors.append("missing [ESP32] section")
+    else:
+        esp32 = config['ESP32']
+        for key in REQUIRED_ESP32_KEYS:
+            if not esp32.get(key):
+                errors.append(f"[ESP32]: missing {key}")
+        for key in ('static_ip', 'gateway', 'subnet', 'dns'):
+            if esp32.get(key) and not normalize_ip(esp32[key]):
+                errors.append(f"[ESP32]: {key} {esp32[key]!r} is not a valid IPv4 address")
+
+    general = config['GENERAL']
+    try:
+        num_pcs = int(general.get('num_pcs', ''))
+    except ValueError:
+        errors.append(f"[GENERAL]: num_pcs must be a whole number, got {general.get('num_pcs')!r}")
+        return errors
+    for key, minimum in (('shutdown_delay', 0), ('agent_rate_burst', 1), ('agent_retries', 0),
+                         ('agent_max_pending', 1), ('agent_idle_exit', 0), ('sync_workers', 1)):
+        if key in general:
+            _check_int(errors, "[GENERAL]", key, general[key], minimum)
+    for key in ('agent_timeout', 'agent_backoff', 'agent_backoff_max'):
+        if key in general:
+            _check_seconds(errors, "[GENERAL]", key, general[key])
+
+    transport = general.get('transport', 'http').strip().lower()
+    if transport not in TRANSPORTS:
+        errors.append(f"[GENERAL]: transport must be one of {', '.join(TRANSPORTS)}")
+    elif transport == 'mqtt':
+        mqtt = config['MQTT'] if 'MQTT' in config else {}
+        if not mqtt.get('broker', '').strip():
+            errors.append("[MQTT]: broker is required when transport = mqtt")
+        try:
+            if not 1 <= int(mqtt.get('port', '1883')) <= 65535:
+                errors.append("[MQTT]: port must be between 1 and 65535")
+        except ValueError:
+            errors.append(f"[MQTT]: port must be a whole number, got {mqtt.get('port')!r}")
+        prefix = mqtt.get('topic_prefix', 'pc_controller').strip()
+        if not prefix or any(char in prefix for char in '+#') or prefix.startswith('/') or prefix.endswith('/'):
+            errors.append(f"[MQTT]: topic_prefix {prefix!r} must be a plain topic without wildcards "
+                          f"or leading/trailing slashes")
+
+    if general.get('agent_format', 'script').strip().lower() not in AGENT_FORMATS:
+        errors.append(f"[GENERAL]: agent_format must be one of {', '.join(AGENT_FORMATS)}")
+    try:
+        general.getboolean('wheelhouse', fallback=False)
+    except ValueError:
+        errors.append(f"[GENERAL]: wheelhouse must be true or false, got {general.get('wheelhouse')!r}")
+    python_versions = parse_python_versions(general.get('wheelhouse_python', '3.12'))
+    if not python_versions or not all(PYTHON_VERSION_PATTERN.match(version) for version in python_versions):
+        errors.append(f"[GENERAL]: wheelhouse_python must list Python versions like 3.11,3.12, "
+                      f"got {general.get('wheelhouse_python')!r}")
+
+    # Uniqueness is checked against these indexes as each PC is visited
+    names, macs, ips, gpios = {}, {}, {}, {}
+    relays = {}
+    network = get_esp32_network(config)
+
+    def check_pin(where, key, pin, allow_bank=True):
+        """Validate one pin against the board and banks and claim it"""
+        if pin.lower() in ('', 'none', 'auto'):
+            return
+        bank_pin = parse_bank_pin(pin) if allow_bank else None
+        if bank_pin:
+            section, index = bank_pin
+            if section not in banks:
+                errors.append(f"{where}: {key} {pin} refers to missing [{section}]")
+                return
+            if index >= banks[section]['inputs']:
+                errors.append(f"{where}: {key} {pin} exceeds the {banks[section]['inputs']} inputs of [{section}]")
+                return
+            pin = f"{section}:{index}"
+        elif not PIN_PATTERN.match(pin):
+            errors.append(f"{where}: {key} {pin!r} must look like GPIO16"
+                          f"{', BANK1:0' if allow_bank else ''}, auto or none")
+            return
+        elif profile is not None:
+            level, reason = check_button_pin(profile, pin)
+            if level == 'error':
+                errors.append(f"{where}: {key} {reason}")
+            elif level == 'warning':
+                warnings.append(f"{where}: {key} {reason}")
+        if pin.upper() in gpios:
+            errors.append(f"{where}: {key} {pin} already used by {gpios[pin.upper()]}")
+        else:
+            gpios[pin.upper()] = f"{where} {key}"
+
+    # Pins claimed by banks and the display come first so PCs conflicting with them are reported
+    banks = load_banks(config)
+    validate_banks(banks, errors)
+    display_type = config.get('DISPLAY', 'type', fallback='none').strip().lower()
+    if display_type not in DISPLAY_TYPES:
+        errors.append(f"[DISPLAY]: type must be one of {', '.join(DISPLAY_TYPES)}")
+    elif display_type == 'ssd1306':
+        display = config['DISPLAY']
+        if display.get('model', 'SSD1306 128x64') not in OLED_MODELS:
+            errors.append(f"[DISPLAY]: model must be one of {', '.join(OLED_MODELS)}")
+        bank_addresses = {bank['address'].lower() for bank in banks.values()}
+        if display.get('address', '0x3C').lower() in bank_addresses:
+            errors.append(f"[DISPLAY]: address {display.get('address', '0x3C')} is already used by a button bank")
+    elif display_type == 'ws2812':
+        check_pin("[DISPLAY]", 'pin', config['DISPLAY'].get('pin', 'auto').strip(), allow_bank=False)
+    if (uses_i2c(banks) or display_type == 'ssd1306') and 'ESP32' in config:
+        for key in ('i2c_sda', 'i2c_scl'):
+            check_pin("[ESP32]", key, config['ESP32'].get(key, 'auto').strip(), allow_bank=False)
+    for section, bank in banks.items():
+        if bank['spec'] and bank['spec']['bus'] == 'shift':
+            for key in SHIFT_CONTROL_PINS:
+                check_pin(f"[{section}]", key, bank['pins'][key], allow_bank=False)
+
+    for pc_num in range(1, num_pcs + 1):
+        section = f'PC{pc_num}'
+        where = f"[{section}]"
+        if section not in config:
+            errors.append(f"{where}: section missing (num_pcs = {num_pcs})")
+            continue
+        pc = config[section]
+        for key in REQUIRED_PC_KEYS:
+            if not pc.get(key):
+                errors.append(f"{where}: missing {key}")
+
+        name = pc.get('name', '')
+        if name and not PC_NAME_PATTERN.match(name):
+            errors.append(f"{where}: name {name!r} may only contain letters, digits and underscores")
+        elif name:
+            if name.lower() in names:
+                errors.append(f"{where}: name {name!r} already used by [{names[name.lower()]}]")
+            names.setdefault(name.lower(), section)
+
+        mac = pc.get('mac_address', '')
+        if mac:
+            normalized = normalize_mac(mac)
+            if not normalized:
+                errors.append(f"{where}: mac_address {mac!r} is not a valid MAC address")
+            elif normalized in macs:
+                errors.append(f"{where}: mac_address {mac} already used by [{macs[normalized]}]")
+            else:
+                macs[normalized] = section
+
+        ip = pc.get('ip_address', '')
+        if ip:
+            if not normalize_ip(ip):
+                errors.append(f"{where}: ip_address {ip!r} is not a valid IPv4 address")
+            elif ip in ips:
+                errors.append(f"{where}: ip_address {ip} already used by [{ips[ip]}]")
+            else:
+                ips[ip] = section
+
+        for key in ('on_button_gpio', 'off_button_gpio'):
+            check_pin(where, key, pc.get(key, '').strip())
+
+        settings = dict(general)
+        settings.update(pc)
+        if 'shutdown_delay' in pc:
+            _check_int(errors, where, 'shutdown_delay', pc['shutdown_delay'], 0)
+        if 'agent_retries' in pc:
+            _check_int(errors, where, 'agent_retries', pc['agent_retries'], 0)
+        for key in ('agent_timeout', 'agent_backoff', 'agent_backoff_max'):
+            if key in pc:
+                _check_seconds(errors, where, key, pc[key])
+        try:
+            if float(settings.get('agent_backoff_max', '30')) < float(settings.get('agent_backoff', '2')):
+                errors.append(f"{where}: agent_backoff_max must not be less than agent_backoff")
+        except ValueError:
+            pass  # Reported above
+        actions = [a.strip().lower() for a in settings.get('power_actions', '').split(',') if a.strip()]
+        unknown = [a for a in actions if a not in POWER_ACTIONS]
+        if unknown:
+            errors.append(f"{where}: unknown power_actions {', '.join(unknown)}")
+        pc_os = pc.get('os', 'windows').strip().lower()
+        if pc_os not in PC_OPERATING_SYSTEMS:
+            errors.append(f"{where}: os must be one of {', '.join(PC_OPERATING_SYSTEMS)}")
+        elif 'power_actions' in pc:
+            unsupported = [a for a in actions if a in POWER_ACTIONS and a not in OS_POWER_ACTIONS[pc_os]]
+            if unsupported:
+                warnings.append(f"{where}: power_actions {', '.join(unsupported)} not available on {pc_os} "
+                                f"and left out")
+        auth = settings.get('agent_auth', 'none').strip().lower()
+        if auth not in AGENT_AUTH_MODES:
+            errors.append(f"{where}: agent_auth must be one of {', '.join(AGENT_AUTH_MODES)}")
+        relay = settings.get('wol_relay', '').strip()
+        if relay.lower() not in ('', 'none'):
+            relays[section] = relay
+        elif is_remote_subnet(network, ip):
+            warnings.append(f"{where}: {ip} is outside the ESP32's subnet, so its Wake-on-LAN broadcast "
+                            f"will not arrive; set wol_relay to an always-on PC on that subnet")
+
+    # Relays may be any PC, so they are resolved once every name is known
+    for section, relay in relays.items():
+        relay_section = names.get(relay.lower())
+        if relay_section is None:
+            where = f"[{section}]" if 'wol_relay' in config[section] else "[GENERAL]"
+            error = f"{where}: wol_relay {relay!r} is not the name of a configured PC"
+            if error not in errors:
+                errors.append(error)
+        elif relay_section != section and is_remote_subnet(network, config[section].get('ip_address', '')):
+            relay_pc = dict(general)
+            relay_pc.update(config[relay_section])
+            if relay_pc.get('agent_auth', 'none').strip().lower() != 'hmac':
+                errors.append(f"[{section}]: wol_relay {relay} must use agent_auth = hmac, "
+                              f"since its agent sends magic packets on request")
+
+    return errors
+
+
+def upgrade_and_validate(config, warnings=None):
+    """Migrate then validate; raises ConfigSchemaError listing every problem"""
+    applied = migrate_config(config)
+    errors = validate_config(config, warnings)
+    if errors:
+        raise ConfigSchemaError(errors)
+    return applied
+
+
+def main():
+    """Upgrade and validate a config file in place"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Upgrade and validate an ESP32 PC Controller config.ini")
+    parser.add_argument("config", nargs='?', default="config.ini", help="Configuration file (default: config.ini)")
+    parser.add_argument("--check", action="store_true", help="Validate only; do not write upgrades")
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    if not config.read(args.config):
+        print(f"❌ Config file not found: {args.config}")
+        return 1
+    warnings = []
+    try:
+        applied = upgrade_and_validate(config, warnings)
+    except ConfigSchemaError as e:
+        print(f"❌ {e}")
+        return 1
+    for warning in warnings:
+        print(f"⚠️  {warning}")
+
+    if applied and not args.check:
+        with open(args.config, 'w') as f:
+            config.write(f)
+        print(f"⬆️  Upgraded {args.config} from version {applied[0]} to {CONFIG_VERSION}")
+    elif applied:
+        print(f"ℹ️  {args.config} is version {applied[0]}; run without --check to upgrade to {CONFIG_VERSION}")
+    print(f"✅ {args.config} is valid")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Fleet Aggregator
+Keeps one connection per PC agent (and the ESP32) and serves the combined
+fleet state from a single cached JSON / Server-Sent Events endpoint
+"""
+
+import argparse
+import configparser
+import hashlib
+import http.client
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+AGENT_PORT = 5000
+ESP32_PORT = 80
+SSE_KEEPALIVE = 15
+SSE_QUEUE_SIZE = 64
+
+
+def load_fleet_config(config_file="config.ini"):
+    """Load the deployment config, preferring the copy in the deployment folder"""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    deployment_path = config.get('GENERAL', 'deployment_path', fallback=None)
+    if deployment_path:
+        deploy_config_path = Path(deployment_path) / "config.ini"
+        if deploy_config_path.exists():
+            config.read(deploy_config_path)
+    return config
+
+
+def read_sse_events(response):
+    """Yield (event, data) pairs from a Server-Sent Events response"""
+    event_type = "message"
+    data_lines = []
+    for raw_line in response:
+        line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+        if not line:
+            if data_lines:
+                yield event_type, '\n'.join(data_lines)
+            event_type = "message"
+            data_lines = []
+        elif line.startswith(':'):
+            continue  # Keep-alive comment
+        elif line.startswith('event:'):
+            event_type = line[6:].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[5:].lstrip())
+
+
+class FleetState:
+    """Thread-safe store of the latest fleet state
+
+    The JSON snapshot is serialized once per change and shared by every
+    reader, with an ETag hashed from its bytes. Heartbeats change the body
+    without an event, so the version alone cannot tag it.
+    Each change is pushed to /events subscribers as a small per-host update
+    instead of the full fleet.
+    """
+
+    def __init__(self, esp32_name, esp32_ip):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._version = 0
+        self._pcs = {}
+        self._esp32 = {
+            "name": esp32_name,
+            "ip_address": esp32_ip,
+            "online": False,
+            "states": {},
+            "last_seen": None,
+        }
+        self._snapshot = None
+        self._etag = None
+
+    def add_pc(self, name, ip_address):
+        with self._lock:
+            self._pcs[name] = {
+                "name": name,
+                "ip_address": ip_address,
+                "online": False,
+                "state": None,
+                "latency_ms": None,
+                "last_seen": None,
+                "error": None,
+            }
+            self._snapshot = None
+
+    def update_pc(self, name, **fields):
+        """Merge fields into a PC entry, notifying subscribers on change"""
+        with self._lock:
+            entry = self._pcs[name]
+            changed = {k: v for k, v in fields.items() if entry.get(k) != v}
+            if changed.keys() <= {"last_seen", "latency_ms"}:
+                # Heartbeats refresh the snapshot but are not worth an event
+                entry.update(changed)
+                self._snapshot = None
+                return
+            entry.update(changed)
+            self._publish({"type": "pc", "pc": dict(entry)})
+
+    def update_esp32(self, online=None, sensor_id=None, state=None):
+        with self._lock:
+            if online is not None:
+                if self._esp32["online"] == online and sensor_id is None:
+                    return
+                self._esp32["online"] = online
+            if online:
+                self._esp32["last_seen"] = time.time()
+            if sensor_id is not None:
+                self._esp32["states"][sensor_id] = state
+            self._publish({"type": "esp32", "esp32": json.loads(json.dumps(self._esp32))})
+
+    def _publish(self, event):
+        """Bump the version and fan an event out (caller holds the lock)"""
+        self._version += 1
+        self._snapshot = None
+        event["version"] = self._version
+        for subscriber in self._subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def snapshot(self):
+        """Return (ETag, JSON bytes) for the current fleet state"""
+        with self._lock:
+            if self._snapshot is None:
+                body = {
+                    "version": self._version,
+                    "generated": time.time(),
+                    "esp32": self._esp32,
+                    "pcs": list(self._pcs.values()),
+                    "summary": {
+                        "total": len(self._pcs),
+                        "online": sum(1 for pc in self._pcs.values() if pc["online"]),
+                    },
+                }
+                self._snapshot = json.dumps(body).encode('utf-8')
+                self._etag = f'"{hashlib.blake2b(self._snapshot, digest_size=12).hexdigest()}"'
+            return self._etag, self._snapshot
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+
+class AgentMonitor(threading.Thread):
+    """Follow one PC agent, preferring its /events stream over polling /status"""
+
+    def __init__(self, fleet, name, ip_address, poll_interval):
+        super().__init__(name=f"monitor-{name}", daemon=True)
+        self.fleet = fleet
+        self.pc_name = name
+        self.ip_address = ip_address
+        self.poll_interval = poll_interval
+        self.streaming = True
+
+    def run(self):
+        while True:
+            try:
+                if self.streaming:
+                    self.follow_events()
+                else:
+                    self.poll_status()
+                    time.sleep(self.poll_interval)
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                self.fleet.update_pc(self.pc_name, online=False, error=str(e) or type(e).__name__)
+                time.sleep(self.poll_interval)
+
+    def follow_events(self):
+        """Hold a long-lived SSE connection to the agent"""
+        connection = http.client.HTTPConnection(self.ip_address, AGENT_PORT, timeout=SSE_KEEPALIVE * 3)
+        try:
+            start = time.monotonic()
+            connection.request("GET", "/events", headers={"Accept": "text/event-stream"})
+            response = connection.getresponse()
+            if response.status == 404:
+                # Agent predates the event stream - fall back to polling
+                self.streaming = False
+                return
+            if response.status != 200:
+                raise http.client.HTTPException(f"HTTP {response.status} from /events")
+            latency_ms = round((time.monotonic() - start) * 1000, 1)
+            self.fleet.update_pc(self.pc_name, online=True, error=None,
+                                 latency_ms=latency_ms, last_seen=time.time())
+            for event_type, data in read_sse_events(response):
+                if event_type == "status":
+                    event = json.loads(data)
+                    self.fleet.update_pc(self.pc_name, online=True, state=event.get("state"),
+                                         last_seen=time.time())
+            raise ConnectionError("Event stream closed")
+        finally:
+            connection.close()
+
+    def poll_status(self):
+        connection = http.client.HTTPConnection(self.ip_address, AGENT_PORT, timeout=5)
+        try:
+            start = time.monotonic()
+            connection.request("GET", "/status")
+            response = connection.getresponse()
+            body = json.loads(response.read() or b'{}')
+            latency_ms = round((time.monotonic() - start) * 1000, 1)
+            self.fleet.update_pc(self.pc_name, online=response.status == 200, error=None,
+                                 state=body.get("state"), latency_ms=latency_ms,
+                                 last_seen=time.time())
+        finally:
+            connection.close()
+
+
+class ESP32Monitor(threading.Thread):
+    """Follow the ESPHome web_server /events stream for text sensor states"""
+
+    def __init__(self, fleet, ip_address, poll_interval):
+        super().__init__(name="monitor-esp32", daemon=True)
+        self.fleet = fleet
+        self.ip_address = ip_address
+        self.poll_interval = poll_interval
+
+    def run(self):
+        while True:
+            connection = http.client.HTTPConnection(self.ip_address, ESP32_PORT, timeout=SSE_KEEPALIVE * 3)
+            try:
+                connection.request("GET", "/events", headers={"Accept": "text/event-stream"})
+                response = connection.getresponse()
+                if response.status != 200:
+                    raise http.client.HTTPException(f"HTTP {response.status} from ESP32 /events")
+                self.fleet.update_esp32(online=True)
+                for event_type, data in read_sse_events(response):
+                    if event_type == "state":
+                        event = json.loads(data)
+                        sensor_id = event.get("id", "")
+                        if sensor_id.startswith("text_sensor-"):
+                            self.fleet.update_esp32(online=True, sensor_id=sensor_id,
+                                                    state=event.get("state"))
+            except (OSError, http.client.HTTPException, ValueError):
+                self.fleet.update_esp32(online=False)
+            finally:
+                connection.close()
+            time.sleep(self.poll_interval)
+
+
+def make_handler(fleet):
+    """Build the request handler bound to a FleetState"""
+
+    class FleetRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path in ("/", "/fleet"):
+                self.send_fleet()
+            elif self.path == "/events":
+                self.send_events()
+            elif self.path == "/health":
+                self.send_body(200, b'{"status": "ok"}')
+            else:
+                self.send_body(404, b'{"status": "error", "message": "Not found"}')
+
+        def send_body(self, status_code, body, headers=None):
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_fleet(self):
+            etag, body = fleet.snapshot()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_body(200, body, {"ETag": etag, "Cache-Control": "no-cache"})
+
+        def send_events(self):
+            subscriber = fleet.subscribe()
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                # Start every subscriber from a full snapshot
+                _, body = fleet.snapshot()
+                self.wfile.write(b"event: snapshot\ndata: " + body + b"\n\n")
+                self.wfile.flush()
+                while True:
+                    try:
+                        event = subscriber.get(timeout=SSE_KEEPALIVE)
+                    except queue.Empty:
+                        self.wfile.write(b": keepalive\n\n")
+                    else:
+                        payload = json.dumps(event)
+                        self.wfile.write(f"event: {event['type']}\ndata: {payload}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                fleet.unsubscribe(subscriber)
+                self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass  # Dashboards poll often; keep the console for fleet events
+
+    return FleetRequestHandler
+
+
+def build_fleet(config):
+    """Create the fleet state and one monitor per configured host"""
+    poll_interval = config.getfloat('AGGREGATOR', 'poll_interval', fallback=5.0)
+    esp32_ip = config.get('ESP32', 'static_ip')
+    fleet = FleetState(config.get('ESP32', 'device_name', fallback='esp32'), esp32_ip)
+    monitors = [ESP32Monitor(fleet, esp32_ip, poll_interval)]
+
+    num_pcs = int(config.get('GENERAL', 'num_pcs'))
+    for pc_num in range(1, num_pcs + 1):
+        pc_section = f'PC{pc_num}'
+        if pc_section in config:
+            name = config.get(pc_section, 'name')
+            ip_address = config.get(pc_section, 'ip_address')
+            fleet.add_pc(name, ip_address)
+            monitors.append(AgentMonitor(fleet, name, ip_address, poll_interval))
+    return fleet, monitors
+
+
+def main():
+    """Main function to run the fleet aggregator"""
+    parser = argparse.ArgumentParser(description="Serve the combined state of all PC agents")
+    parser.add_argument("--config", default="config.ini", help="Configuration file (default: config.ini)")
+    args = parser.parse_args()
+
+    config = load_fleet_config(args.config)
+    host = config.get('AGGREGATOR', 'listen_host', fallback='0.0.0.0')
+    port = config.getint('AGGREGATOR', 'port', fallback=8080)
+
+    fleet, monitors = build_fleet(config)
+    for monitor in monitors:
+        monitor.start()
+
+    server = ThreadingHTTPServer((host, port), make_handler(fleet))
+    server.daemon_threads = True
+    print("ESP32 PC Controller Fleet Aggregator")
+    print("=" * 50)
+    print(f"📡 Monitoring {len(monitors) - 1} PCs and the ESP32")
+    print(f"🌐 Fleet state: http://{host}:{port}/fleet")
+    print(f"🔔 Event stream: http://{host}:{port}/events")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠️ Aggregator stopped by user")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
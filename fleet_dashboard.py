@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Fleet Dashboard Backend
+Polls every PC agent and the ESP32 on an asyncio loop in a background thread
+and sends wake / power commands, for the GUI's Dashboard tab. Results leave
+the loop as one batch per polling round through a thread-safe queue, so the
+GUI applies a whole fleet refresh in a single Tk callback.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import queue
+import socket
+import threading
+import time
+import uuid
+
+from fleet_aggregator import AGENT_PORT, ESP32_PORT
+
+DEFAULT_INTERVAL = 5.0
+DEFAULT_TIMEOUT = 2.0
+# Open connections at once; a round over a hundred hosts still takes one timeout
+MAX_CONCURRENT_REQUESTS = 64
+WOL_PORT = 9
+POLL_ERRORS = (OSError, EOFError, ValueError, asyncio.TimeoutError)
+
+
+async def http_request(host, port, method, path, body=None, timeout=DEFAULT_TIMEOUT):
+    """Minimal HTTP/1.1 exchange on asyncio streams
+
+    Returns (status code, body bytes, latency in ms). The connection is
+    closed after every request, which both the agent and ESPHome expect
+    from polling clients.
+    """
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Connection: close", "Accept: application/json"]
+            if body is not None:
+                lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('ascii') + (body or b''))
+            await writer.drain()
+            status_line = (await reader.readline()).decode('latin-1').split()
+            if len(status_line) < 2 or not status_line[1].isdigit():
+                raise ValueError("Malformed HTTP response")
+            length = None
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            payload = await (reader.readexactly(length) if length is not None else reader.read())
+            return int(status_line[1]), payload
+        finally:
+            writer.close()
+
+    start = time.monotonic()
+    status, payload = await asyncio.wait_for(exchange(), timeout)
+    return status, payload, round((time.monotonic() - start) * 1000, 1)
+
+
+def describe_error(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return "No response"
+    if isinstance(error, ConnectionRefusedError):
+        return "Connection refused"
+    return str(error) or type(error).__name__
+
+
+def sign_command(agent_key, timestamp, command, request_id):
+    """HMAC-SHA256 signature the agents expect over timestamp:command:request_id"""
+    message = f"{timestamp}:{command}:{request_id}".encode('utf-8')
+    return hmac.new(agent_key.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+async def send_power_command(ip_address, command, agent_key=None, timeout=DEFAULT_TIMEOUT):
+    """POST a power command to an agent, signed when it has a key
+
+    Returns (accepted, message from the agent).
+    """
+    request_id = f"gui-{uuid.uuid4().hex[:12]}"
+    data = {'command': command, 'request_id': request_id}
+    if agent_key:
+        timestamp = int(time.time())
+        data['timestamp'] = timestamp
+        data['signature'] = sign_command(agent_key, timestamp, command, request_id)
+    status, body, _ = await http_request(ip_address, AGENT_PORT, 'POST', '/command',
+                                         json.dumps(data).encode('utf-8'), timeout)
+    try:
+        message = json.loads(body or b'{}').get('message') or f"HTTP {status}"
+    except ValueError:
+        message = f"HTTP {status}"
+    return status in (200, 202), message
+
+
+def magic_packet(mac_address):
+    """Wake-on-LAN payload: 6 x 0xFF followed by the MAC address 16 times"""
+    mac = bytes.fromhex(mac_address.replace(':', '').replace('-', ''))
+    if len(mac) != 6:
+        raise ValueError(f"Invalid MAC address {mac_address!r}")
+    return b'\xff' * 6 + mac * 16
+
+
+def send_magic_packet(mac_address, broadcast='255.255.255.255', port=WOL_PORT):
+    packet = magic_packet(mac_address)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.sendto(packet, (broadcast, port))
+
+
+async def wake_pc(esp32_ip, pc_name, mac_address, timeout=DEFAULT_TIMEOUT):
+    """Press the PC's Wake-on-LAN button on the ESP32, which sits on the PCs' LAN
+
+    When the ESP32 cannot be reached the magic packet is broadcast from this
+    computer instead, which only wakes PCs on its own subnet.
+    Returns (sent, message).
+    """
+    path = f"/button/{pc_name.lower()}_wake_on_lan/press"
+    try:
+        status, _, _ = await http_request(esp32_ip, ESP32_PORT, 'POST', path, b'', timeout)
+    except POLL_ERRORS:
+        pass
+    else:
+        # The ESP32 answered, so a local broadcast would not get any further than it did
+        if status == 200:
+            return True, "Wake-on-LAN sent by the ESP32"
+        return False, f"ESP32 answered HTTP {status}"
+    try:
+        send_magic_packet(mac_address)
+    except OSError as e:
+        return False, f"ESP32 unreachable and local broadcast failed: {e}"
+    return True, ("ESP32 unreachable - magic packet broadcast from this computer, "
+                  "which only wakes the PC if it is on this computer's subnet")
+
+
+class DashboardPoller:
+    """Polls the fleet on a private asyncio loop running in a daemon thread
+
+    pcs is a list of {'section', 'name', 'ip_address'} and esp32 a
+    {'name', 'ip_address'} dict. Every round puts ('poll', [result, ...])
+    on results, where each result is a dict keyed by the PC section (or
+    'esp32') with online, latency_ms, state and message. Actions put
+    ('action', label, ok, message). A poller runs once: stop() it and
+    create a new one to poll a different set of hosts.
+    """
+
+    def __init__(self, pcs, esp32=None, interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT):
+        self.pcs = list(pcs)
+        self.esp32 = esp32
+        self.interval = interval
+        self.timeout = timeout
+        self.results = queue.Queue()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, name="dashboard-poller", daemon=True)
+        self.stopping = False
+        self.wakeup = None
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.poll_forever())
+        finally:
+            self.loop.close()
+
+    def stop(self):
+        """Finish the current round and let the thread exit"""
+        self.stopping = True
+        self.refresh()
+
+    def refresh(self):
+        """Start the next round now instead of after the interval"""
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            pass  # Loop already closed
+
+    def _wake(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def poll_forever(self):
+        self.wakeup = asyncio.Event()
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        while not self.stopping:
+            self.results.put(('poll', await self.poll_once()))
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    async def poll_once(self):
+        tasks = [self.poll_agent(pc) for pc in self.pcs]
+        if self.esp32:
+            tasks.append(self.poll_esp32())
+        return await asyncio.gather(*tasks)
+
+    async def poll_agent(self, pc):
+        result = {'key': pc['section'], 'online': False, 'latency_ms': None, 'state': None, 'message': ''}
+        try:
+            async with self.semaphore:
+                status, body, latency_ms = await http_request(pc['ip_address'], AGENT_PORT, 'GET', '/status',
+                                                              timeout=self.timeout)
+            data = json.loads(body or b'{}')
+        except POLL_ERRORS as e:
+            result['message'] = describe_error(e)
+            return result
+        result.update(online=status == 200, latency_ms=latency_ms, state=data.get('state'))
+        if status != 200:
+            result['message'] = f"HTTP {status}"
+        elif data.get('shutdown_remaining'):
+            result['message'] = f"Power action in {data['shutdown_remaining']:.0f}s"
+        return result
+
+    async def poll_esp32(self):
+        """The ESP32 counts as online when its web server answers at all"""
+        result = {'key': 'esp32', 'online': False, 'latency_ms': None, 'state': None, 'message': ''}
+        try:
+            async with self.semaphore:
+                status, _, latency_ms = await http_request(self.esp32['ip_address'], ESP32_PORT, 'GET',
+                                                           '/ping', timeout=self.timeout)
+        except POLL_ERRORS as e:
+            result['message'] = describe_error(e)
+            return result
+        result.update(online=True, latency_ms=latency_ms)
+        return result
+
+    def run_action(self, label, coroutine):
+        """Run a wake / power command on the loop, reporting through results"""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+        def report(done):
+            try:
+                ok, message = done.result()
+            except (POLL_ERRORS + (RuntimeError,)) as e:
+                ok, message = False, describe_error(e)
+            self.results.put(('action', label, ok, message))
+            self.refresh()
+
+        future.add_done_callback(report)
@@ -8,11 +8,49 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import configparser
 import os
+import re
 from pathlib import Path
-import subprocess
-import sys
 import shutil
 import platform
+import queue
+import time
+
+from board_profiles import BOARD_PROFILES, DEFAULT_BOARD
+from config_schema import (CONFIG_VERSION, OS_POWER_ACTIONS, PC_OPERATING_SYSTEMS, POWER_ACTIONS, ConfigSchemaError,
+                           migrate_config)
+from fleet_dashboard import DEFAULT_INTERVAL, DashboardPoller, send_power_command, wake_pc
+from scripts.generate_api_key import read_secrets_file
+
+# Spinbox ceiling; the PC table has no widgets per row, so large fleets stay responsive
+MAX_PCS = 999
+# PC table columns: config key, heading, width
+PC_COLUMNS = (
+    ('name', 'PC Name', 110),
+    ('mac_address', 'MAC Address', 130),
+    ('ip_address', 'IP Address', 110),
+    ('on_button_gpio', 'ON GPIO', 70),
+    ('off_button_gpio', 'OFF GPIO', 70),
+    ('os', 'OS', 70),
+    ('sync_target', 'Sync Target Folder', 160),
+)
+# Dashboard table columns: result key, heading, width
+DASHBOARD_COLUMNS = (
+    ('name', 'PC Name', 110),
+    ('ip_address', 'IP Address', 110),
+    ('online', 'Agent', 70),
+    ('latency', 'Latency', 70),
+    ('state', 'Last Status', 110),
+    ('last_seen', 'Last Seen', 80),
+    ('message', 'Message', 200),
+)
+# How often the Tk thread collects polling results
+DASHBOARD_DRAIN_MS = 250
+
+
+def natural_key(value):
+    """Sort key putting PC2 before PC10 and 192.168.1.9 before 192.168.1.10"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', value)]
+
 
 class ESP32ConfigGUI:
     def __init__(self, root):
@@ -51,6 +89,15 @@ class ESP32ConfigGUI:
         else:
             # Create default config
             self.create_default_config()
+        
+        # Bring older configs up to the current schema; saving writes the upgrade
+        try:
+            applied = migrate_config(self.config)
+        except ConfigSchemaError as e:
+            self.log_status(f"⚠️ {e}")
+        else:
+            if applied:
+                self.log_status(f"⬆️  Upgraded configuration to version {CONFIG_VERSION} (save to keep)")
 
             
     def create_default_config(self):
@@ -61,30 +108,62 @@ class ESP32ConfigGUI:
             'static_ip': '192.168.1.50',
             'gateway': '192.168.1.1',
             'subnet': '255.255.255.0',
-            'dns': '192.168.1.1'
+            'dns': '192.168.1.1',
+            'board': DEFAULT_BOARD
         }
         
         self.config['GENERAL'] = {
+            'config_version': str(CONFIG_VERSION),
             'num_pcs': '2',
             'max_pcs': '8',
+            'shutdown_delay': '5',
+            'agent_rate_limit': '6',
+            'agent_rate_burst': '3',
+            'power_actions': ','.join(POWER_ACTIONS),
+            'agent_auth': 'hmac',
+            'agent_timeout': '2',
+            'agent_retries': '1',
+            'agent_backoff': '2',
+            'agent_backoff_max': '30',
+            'agent_max_pending': '4',
+            'transport': 'http',
+            'agent_idle_exit': '15',
+            'wheelhouse': 'true',
+            'wheelhouse_python': '3.10,3.11,3.12,3.13',
+            'agent_format': 'script',
+            'sync_workers': '4',
+            'wol_relay': '',
             'deployment_path': 'C:\\ESP_PC_Controller'
         }
         
-        # Default PC configurations
-        gpio_pairs = [
-            ('GPIO16', 'GPIO17'), ('GPIO18', 'GPIO19'), ('GPIO21', 'GPIO22'),
-            ('GPIO23', 'GPIO25'), ('GPIO26', 'GPIO27'), ('GPIO32', 'GPIO33'),
-            ('GPIO12', 'GPIO13'), ('GPIO14', 'GPIO15')
-        ]
+        self.config['DISPLAY'] = {
+            'type': 'none'
+        }
+        
+        self.config['MQTT'] = {
+            'broker': '',
+            'port': '1883',
+            'username': '',
+            'topic_prefix': 'pc_controller'
+        }
+        
+        self.config['AGGREGATOR'] = {
+            'listen_host': '0.0.0.0',
+            'port': '8080',
+            'poll_interval': '5'
+        }
         
+        # Default PC configurations; button pins are allocated from the board profile
         for i in range(8):
             pc_num = i + 1
             self.config[f'PC{pc_num}'] = {
                 'name': f'PC{pc_num}',
                 'mac_address': f'AA:BB:CC:DD:EE:{pc_num:02d}',
                 'ip_address': f'192.168.1.{100 + i}',
-                'on_button_gpio': gpio_pairs[i][0],
-                'off_button_gpio': gpio_pairs[i][1]
+                'on_button_gpio': 'auto',
+                'off_button_gpio': 'auto',
+                'os': 'windows',
+                'sync_target': ''
             }
         
         # Don't auto-save default config - let user save when ready
@@ -130,6 +209,12 @@ class ESP32ConfigGUI:
         notebook.add(deploy_frame, text="Deploy")
         self.create_deploy_tab(deploy_frame)
         
+        # Dashboard Tab: polls the fleet only while it is shown
+        self.dashboard_frame = ttk.Frame(notebook)
+        notebook.add(self.dashboard_frame, text="Dashboard")
+        self.create_dashboard_tab(self.dashboard_frame)
+        notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
     def create_esp32_tab(self, parent):
         """Create ESP32 configuration tab"""
         # Scrollable frame
@@ -149,7 +234,7 @@ class ESP32ConfigGUI:
         ttk.Label(scrollable_frame, text="ESP32 Configuration", font=('Arial', 12, 'bold')).grid(row=0, column=0, columnspan=2, pady=10)
         
         # Security notice
-        security_text = "⚠️ SECURITY: WiFi credentials and API keys must be configured in ESPHome Web Dashboard secrets.\nSee docs/SECURITY_SETUP.md for detailed instructions.\n🔑 Generate API key: Run scripts/generate_api_key.py"
+        security_text = "⚠️ SECURITY: WiFi credentials and API keys must be configured in ESPHome Web Dashboard secrets.\nSee docs/SECURITY_SETUP.md for detailed instructions.\n🔑 Generate keys: Deploy tab → Generate Secrets (writes secrets.yaml)"
         security_label = ttk.Label(scrollable_frame, text=security_text, font=('Arial', 9), foreground='red', wraplength=400)
         security_label.grid(row=1, column=0, columnspan=2, pady=5, padx=5)
         
@@ -172,6 +257,14 @@ class ESP32ConfigGUI:
             entry.grid(row=row, column=1, padx=5, pady=2)
             self.esp32_vars[key] = var
             row += 1
+        
+        # Board profile decides which pins 'auto' buttons are given
+        ttk.Label(scrollable_frame, text="Board:").grid(row=row, column=0, sticky='w', padx=5, pady=2)
+        var = tk.StringVar(value=self.config.get('ESP32', 'board', fallback=DEFAULT_BOARD))
+        board_combo = ttk.Combobox(scrollable_frame, textvariable=var, values=list(BOARD_PROFILES),
+                                   state='readonly', width=27)
+        board_combo.grid(row=row, column=1, padx=5, pady=2)
+        self.esp32_vars['board'] = var
             
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -186,7 +279,7 @@ class ESP32ConfigGUI:
         ttk.Label(parent, text="Number of PCs:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
         self.num_pcs_var = tk.StringVar(value=self.config.get('GENERAL', 'num_pcs', fallback='2'))
         self.num_pcs_var.trace('w', self.on_num_pcs_changed)  # Add callback for changes
-        num_pcs_spin = ttk.Spinbox(parent, from_=1, to=8, textvariable=self.num_pcs_var, width=10)
+        num_pcs_spin = ttk.Spinbox(parent, from_=1, to=MAX_PCS, textvariable=self.num_pcs_var, width=10)
         num_pcs_spin.grid(row=1, column=1, sticky='w', padx=5, pady=5)
         
         # Deployment path
@@ -238,15 +331,11 @@ class ESP32ConfigGUI:
             if self.config.has_option('GENERAL', 'deployment_path'):
                 self.deploy_path_var.set(self.config.get('GENERAL', 'deployment_path'))
                 
-            # Update PC fields
-            num_pcs = int(self.num_pcs_var.get())
-            for pc_num in range(1, num_pcs + 1):
-                if pc_num in self.pc_vars and self.config.has_section(f'PC{pc_num}'):
-                    for key, var in self.pc_vars[pc_num].items():
-                        if self.config.has_option(f'PC{pc_num}', key):
-                            var.set(self.config.get(f'PC{pc_num}', key))
-                            
-            self.update_pc_tabs(num_pcs)
+            # Rebuild the PC table from the loaded sections
+            self.finish_pc_edit(save=False)
+            for item in self.pc_tree.get_children():
+                self.pc_tree.delete(item)
+            self.update_pc_rows(int(self.num_pcs_var.get()))
             self.update_active_pcs_label()
         except Exception as e:
             self.log_status(f"⚠️ Warning: Error refreshing GUI: {e}")
@@ -260,69 +349,23 @@ class ESP32ConfigGUI:
             if num_pcs < 1:
                 num_pcs = 1
                 self.num_pcs_var.set("1")
-            elif num_pcs > 8:
-                num_pcs = 8
-                self.num_pcs_var.set("8")
+            elif num_pcs > MAX_PCS:
+                num_pcs = MAX_PCS
+                self.num_pcs_var.set(str(MAX_PCS))
                 
-            self.update_pc_tabs(num_pcs)
+            self.update_pc_rows(num_pcs)
             self.update_active_pcs_label()
         except ValueError:
             pass  # Ignore invalid values during typing
             
-    def update_pc_tabs(self, num_pcs):
-        """Update PC tab visibility based on number of PCs"""
-        # Get total number of tabs
-        total_tabs = self.pc_notebook.index("end")
-        
-        # Hide all tabs first
-        for i in range(total_tabs):
-            try:
-                self.pc_notebook.tab(i, state="hidden")
-            except tk.TclError:
-                pass
-        
-        # Show only the required number of tabs
-        for i in range(min(num_pcs, total_tabs)):
-            try:
-                self.pc_notebook.tab(i, state="normal")
-                # Update tab text to show if it's active
-                pc_num = i + 1
-                pc_name = self.pc_vars[pc_num]['name'].get() if pc_num in self.pc_vars and 'name' in self.pc_vars[pc_num] else f"PC{pc_num}"
-                tab_text = f"PC{pc_num}" if not pc_name or pc_name == f"PC{pc_num}" else f"PC{pc_num} ({pc_name})"
-                self.pc_notebook.tab(i, text=tab_text)
-            except (tk.TclError, KeyError):
-                pass
-                
-        # Select the first visible tab if current selection is hidden
-        try:
-            current_tab = self.pc_notebook.index(self.pc_notebook.select())
-            if current_tab >= num_pcs:
-                self.pc_notebook.select(0)
-        except (tk.TclError, AttributeError):
-            if num_pcs > 0:
-                self.pc_notebook.select(0)
-                
-    def on_pc_name_changed(self, pc_num):
-        """Callback when PC name changes"""
-        try:
-            num_pcs = int(self.num_pcs_var.get())
-            if pc_num <= num_pcs:
-                # Update the tab title for this PC
-                tab_index = pc_num - 1
-                pc_name = self.pc_vars[pc_num]['name'].get()
-                tab_text = f"PC{pc_num}" if not pc_name or pc_name == f"PC{pc_num}" else f"PC{pc_num} ({pc_name})"
-                self.pc_notebook.tab(tab_index, text=tab_text)
-        except (ValueError, KeyError, tk.TclError):
-            pass
-            
     def update_active_pcs_label(self):
         """Update the label showing active PCs"""
         try:
             num_pcs = int(self.num_pcs_var.get())
             if num_pcs == 1:
-                label_text = "ℹ️ 1 PC will be configured (PC1 tab active)"
+                label_text = "ℹ️ 1 PC will be configured (PC1 in the PC Configuration table)"
             else:
-                label_text = f"ℹ️ {num_pcs} PCs will be configured (PC1-PC{num_pcs} tabs active)"
+                label_text = f"ℹ️ {num_pcs} PCs will be configured (PC1-PC{num_pcs} in the PC Configuration table)"
             self.active_pcs_label.config(text=label_text)
         except (ValueError, AttributeError):
             pass
@@ -342,65 +385,185 @@ class ESP32ConfigGUI:
             pass
             
     def create_pc_tab(self, parent):
-        """Create PC configuration tab"""
-        # Create notebook for PC tabs
-        self.pc_notebook = ttk.Notebook(parent)
-        self.pc_notebook.pack(fill='both', expand=True)
+        """Create the PC table: one Treeview row per PC, edited in place
         
-        self.pc_vars = {}
+        Rows are Treeview items rather than widgets and cells are read from
+        and written to the config directly, so a fleet of hundreds of PCs
+        costs no more widgets than two. The only editor widget is created
+        over a cell while it is being edited.
+        """
+        table_frame = ttk.Frame(parent)
+        table_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        self.pc_headings = {'section': 'PC'}
+        self.pc_headings.update((key, label) for key, label, _ in PC_COLUMNS)
+        self.pc_tree = ttk.Treeview(table_frame, columns=list(self.pc_headings), show='headings',
+                                    selectmode='browse')
+        self.pc_tree.column('section', width=50, stretch=False)
+        for key, _, width in PC_COLUMNS:
+            self.pc_tree.column(key, width=width, stretch=key == 'sync_target')
+        for key in self.pc_headings:
+            self.pc_tree.heading(key, command=lambda key=key: self.on_pc_heading_clicked(key))
+        self.pc_sort = ('section', False)
+        self.pc_editor = None
+        
+        # Scrolling or resizing moves the cells, so an open editor is committed first
+        y_scroll = ttk.Scrollbar(table_frame, orient='vertical',
+                                 command=lambda *args: (self.finish_pc_edit(), self.pc_tree.yview(*args)))
+        x_scroll = ttk.Scrollbar(table_frame, orient='horizontal',
+                                 command=lambda *args: (self.finish_pc_edit(), self.pc_tree.xview(*args)))
+        self.pc_tree.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        self.pc_tree.grid(row=0, column=0, sticky='nsew')
+        y_scroll.grid(row=0, column=1, sticky='ns')
+        x_scroll.grid(row=1, column=0, sticky='ew')
+        table_frame.rowconfigure(0, weight=1)
+        table_frame.columnconfigure(0, weight=1)
+        
+        self.pc_tree.bind('<Double-Button-1>', self.on_pc_tree_double_click)
+        self.pc_tree.bind('<Button-1>', lambda e: self.finish_pc_edit())
+        self.pc_tree.bind('<Return>', self.on_pc_tree_return)
+        self.pc_tree.bind('<F2>', self.on_pc_tree_return)
+        self.pc_tree.bind('<Configure>', lambda e: self.finish_pc_edit())
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.pc_tree.bind(sequence, lambda e: self.finish_pc_edit(), add='+')
         
-        # Create tabs for each PC (up to max)
-        for pc_num in range(1, 9):  # Support up to 8 PCs
-            pc_frame = ttk.Frame(self.pc_notebook)
-            self.pc_notebook.add(pc_frame, text=f"PC{pc_num}")
-            self.create_pc_config(pc_frame, pc_num)
-            
-        # Initialize tab visibility based on current number of PCs
+        # Add help text
+        help_text = """Double-click a cell (or select a row and press Enter) to edit it: Enter saves, Tab moves on, Esc cancels.
+Click a column heading to sort. GPIO: auto picks a free boot-safe pin for the board, none means no
+physical button, explicit pins (e.g. GPIO16) are checked against the board.
+MAC Address Format: AA:BB:CC:DD:EE:FF    IP Address Format: 192.168.1.100"""
+        ttk.Label(parent, text=help_text, font=('Arial', 8), foreground='gray', justify='left').pack(padx=5, pady=5, anchor='w')
+        
+        # Initialize rows based on current number of PCs
         try:
-            initial_num_pcs = int(self.num_pcs_var.get())
-            self.update_pc_tabs(initial_num_pcs)
+            self.update_pc_rows(int(self.num_pcs_var.get()))
         except ValueError:
-            self.update_pc_tabs(2)  # Default to 2 PCs
+            self.update_pc_rows(2)  # Default to 2 PCs
             
-    def create_pc_config(self, parent, pc_num):
-        """Create configuration for a specific PC"""
-        ttk.Label(parent, text=f"PC{pc_num} Configuration", font=('Arial', 12, 'bold')).grid(row=0, column=0, columnspan=2, pady=10)
-        
-        self.pc_vars[pc_num] = {}
-        
-        pc_fields = [
-            ('name', 'PC Name'),
-            ('mac_address', 'MAC Address'),
-            ('ip_address', 'IP Address'),
-            ('on_button_gpio', 'ON Button GPIO'),
-            ('off_button_gpio', 'OFF Button GPIO')
-        ]
-        
-        row = 1
-        for key, label in pc_fields:
-            ttk.Label(parent, text=f"{label}:").grid(row=row, column=0, sticky='w', padx=5, pady=5)
-            var = tk.StringVar(value=self.config.get(f'PC{pc_num}', key, fallback=''))
+    def get_pc_row_values(self, section):
+        """Table row for a PC section, in PC_COLUMNS order"""
+        values = [section]
+        for key, _, _ in PC_COLUMNS:
+            values.append(self.config.get(section, key, fallback='windows' if key == 'os' else ''))
+        return values
+        
+    def update_pc_rows(self, num_pcs):
+        """Show rows PC1..PCn; sections beyond num_pcs stay in the config but leave the table"""
+        self.finish_pc_edit()
+        wanted = [f'PC{pc_num}' for pc_num in range(1, num_pcs + 1)]
+        shown = set(self.pc_tree.get_children())
+        for item in shown - set(wanted):
+            self.pc_tree.delete(item)
+        added = False
+        for section in wanted:
+            if section in shown:
+                continue
+            if not self.config.has_section(section):
+                # Addresses are left blank so validation asks for the real ones
+                self.config[section] = {
+                    'name': section,
+                    'mac_address': '',
+                    'ip_address': '',
+                    'on_button_gpio': 'auto',
+                    'off_button_gpio': 'auto',
+                    'os': 'windows',
+                    'sync_target': ''
+                }
+            self.pc_tree.insert('', 'end', iid=section, values=self.get_pc_row_values(section))
+            added = True
+        if added:
+            self.sort_pc_rows()
             
-            # Add callback for name changes to update tab titles
-            if key == 'name':
-                var.trace('w', lambda *args, pc=pc_num: self.on_pc_name_changed(pc))
+    def on_pc_heading_clicked(self, column):
+        """Sort by a column; clicking the sorted column again reverses it"""
+        self.pc_sort = (column, self.pc_sort == (column, False))
+        self.sort_pc_rows()
+        
+    def sort_pc_rows(self):
+        """Reorder the rows by the current sort column (PC2 before PC10)"""
+        self.finish_pc_edit()
+        column, reverse = self.pc_sort
+        if column == 'section':
+            key = lambda item: int(item[2:])
+        else:
+            key = lambda item: natural_key(self.pc_tree.set(item, column))
+        for index, item in enumerate(sorted(self.pc_tree.get_children(), key=key, reverse=reverse)):
+            self.pc_tree.move(item, '', index)
+        for key, label in self.pc_headings.items():
+            arrow = (' ▼' if reverse else ' ▲') if key == column else ''
+            self.pc_tree.heading(key, text=label + arrow)
             
-            entry = ttk.Entry(parent, textvariable=var, width=30)
-            entry.grid(row=row, column=1, padx=5, pady=5)
-            self.pc_vars[pc_num][key] = var
-            row += 1
+    def on_pc_tree_double_click(self, event):
+        """Edit the double-clicked cell"""
+        if self.pc_tree.identify_region(event.x, event.y) != 'cell':
+            return
+        item = self.pc_tree.identify_row(event.y)
+        column = self.pc_tree.column(self.pc_tree.identify_column(event.x), 'id')
+        if item and column != 'section':
+            self.edit_pc_cell(item, column)
             
-        # Add help text
-        help_text = """
-GPIO Pin Guidelines:
-• Safe pins: GPIO12-19, GPIO21-27, GPIO32-33
-• Avoid: GPIO0, 2, 6-11, 15 (boot/flash pins)
-• GPIO34-39 are input-only (no pullup)
-
-MAC Address Format: AA:BB:CC:DD:EE:FF
-IP Address Format: 192.168.1.100
-        """
-        ttk.Label(parent, text=help_text, font=('Arial', 8), foreground='gray').grid(row=row, column=0, columnspan=2, pady=10)
+    def on_pc_tree_return(self, event):
+        """Edit the name of the focused row from the keyboard"""
+        item = self.pc_tree.focus()
+        if item:
+            self.edit_pc_cell(item, PC_COLUMNS[0][0])
+        return 'break'
+        
+    def edit_pc_cell(self, item, column):
+        """Place an editor over one cell; the OS column gets a drop-down"""
+        self.finish_pc_edit()
+        self.pc_tree.see(item)
+        self.pc_tree.update_idletasks()
+        bbox = self.pc_tree.bbox(item, column)
+        if not bbox:
+            return
+        x, y, width, height = bbox
+        value = self.pc_tree.set(item, column)
+        if column == 'os':
+            editor = ttk.Combobox(self.pc_tree, values=list(PC_OPERATING_SYSTEMS), state='readonly')
+            editor.set(value)
+            # The drop-down list takes the focus, so the choice itself commits
+            editor.bind('<<ComboboxSelected>>', lambda e: self.finish_pc_edit())
+        else:
+            editor = ttk.Entry(self.pc_tree)
+            editor.insert(0, value)
+            editor.select_range(0, 'end')
+            editor.bind('<FocusOut>', lambda e: self.finish_pc_edit())
+        editor.bind('<Return>', lambda e: self.finish_pc_edit())
+        editor.bind('<KP_Enter>', lambda e: self.finish_pc_edit())
+        editor.bind('<Escape>', lambda e: self.finish_pc_edit(save=False))
+        editor.bind('<Tab>', lambda e: self.move_pc_edit())
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_set()
+        self.pc_editor = (editor, item, column)
+        
+    def finish_pc_edit(self, save=True):
+        """Close the cell editor, writing its value to the config unless cancelled"""
+        if getattr(self, 'pc_editor', None) is None:
+            return
+        editor, item, column = self.pc_editor
+        self.pc_editor = None
+        if save:
+            value = editor.get().strip()
+            if value != self.pc_tree.set(item, column):
+                self.config.set(item, column, value)
+                self.pc_tree.set(item, column, value)
+        editor.destroy()
+        self.pc_tree.focus_set()
+        
+    def move_pc_edit(self):
+        """Tab: commit and edit the next cell, wrapping to the next row"""
+        _, item, column = self.pc_editor
+        columns = [key for key, _, _ in PC_COLUMNS]
+        self.finish_pc_edit()
+        index = columns.index(column) + 1
+        if index == len(columns):
+            item, index = self.pc_tree.next(item), 0
+        if item:
+            self.pc_tree.selection_set(item)
+            self.pc_tree.focus(item)
+            self.edit_pc_cell(item, columns[index])
+        return 'break'
         
     def create_deploy_tab(self, parent):
         """Create deployment tab"""
@@ -425,7 +588,7 @@ Note: Configuration is saved to the deployment directory, keeping the root confi
         button_frame.pack(pady=20)
         
         ttk.Button(button_frame, text="Save Configuration", command=self.save_configuration).pack(side='left', padx=5)
-        ttk.Button(button_frame, text="Generate API Key", command=self.generate_api_key).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Generate Secrets", command=self.generate_api_key).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Generate Templates", command=self.generate_templates).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Backup Config", command=self.backup_config).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Open Deployment Folder", command=self.open_deploy_folder).pack(side='left', padx=5)
@@ -443,6 +606,187 @@ Note: Configuration is saved to the deployment directory, keeping the root confi
         status_scroll = ttk.Scrollbar(parent, command=self.status_text.yview)
         self.status_text.config(yscrollcommand=status_scroll.set)
         
+    def create_dashboard_tab(self, parent):
+        """Create the live fleet dashboard: agent and ESP32 state with wake / shutdown"""
+        header = ttk.Frame(parent)
+        header.pack(fill='x', padx=5, pady=5)
+        self.esp32_dashboard_label = ttk.Label(header, text="ESP32: not polled yet", font=('Arial', 10, 'bold'))
+        self.esp32_dashboard_label.pack(side='left')
+        self.fleet_summary_label = ttk.Label(header, text="", foreground='blue')
+        self.fleet_summary_label.pack(side='right')
+        
+        table_frame = ttk.Frame(parent)
+        table_frame.pack(fill='both', expand=True, padx=5)
+        self.dashboard_tree = ttk.Treeview(table_frame, columns=['section'] + [key for key, _, _ in DASHBOARD_COLUMNS],
+                                           show='headings', selectmode='extended')
+        self.dashboard_tree.heading('section', text='PC')
+        self.dashboard_tree.column('section', width=50, stretch=False)
+        for key, label, width in DASHBOARD_COLUMNS:
+            self.dashboard_tree.heading(key, text=label)
+            self.dashboard_tree.column(key, width=width, stretch=key == 'message')
+        self.dashboard_tree.tag_configure('online', foreground='green')
+        self.dashboard_tree.tag_configure('offline', foreground='gray')
+        y_scroll = ttk.Scrollbar(table_frame, orient='vertical', command=self.dashboard_tree.yview)
+        self.dashboard_tree.configure(yscrollcommand=y_scroll.set)
+        self.dashboard_tree.pack(side='left', fill='both', expand=True)
+        y_scroll.pack(side='right', fill='y')
+        
+        button_frame = ttk.Frame(parent)
+        button_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Button(button_frame, text="Wake Selected", command=self.wake_selected).pack(side='left', padx=5)
+        actions = [action.strip() for action in
+                   self.config.get('GENERAL', 'power_actions', fallback=','.join(POWER_ACTIONS)).split(',')
+                   if action.strip() in POWER_ACTIONS]
+        default_action = 'shutdown' if 'shutdown' in actions or not actions else actions[0]
+        self.dashboard_action_var = tk.StringVar(value=default_action)
+        ttk.Combobox(button_frame, textvariable=self.dashboard_action_var, values=actions,
+                     state='readonly', width=10).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Send to Selected", command=self.send_power_action).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Refresh Now", command=self.refresh_dashboard).pack(side='left', padx=5)
+        ttk.Label(button_frame, text="Hosts are polled while this tab is open", font=('Arial', 8),
+                  foreground='gray').pack(side='right')
+        
+        self.poller = None
+        self.dashboard_rows = {}
+        self.dashboard_hosts = {}
+        
+    def on_tab_changed(self, event):
+        """Poll the fleet only while the Dashboard tab is visible"""
+        if event.widget.select() == str(self.dashboard_frame):
+            self.start_dashboard()
+        else:
+            self.stop_dashboard()
+            
+    def get_dashboard_hosts(self):
+        """PC entries from the current configuration, keyed by section"""
+        hosts = {}
+        try:
+            num_pcs = int(self.num_pcs_var.get())
+        except ValueError:
+            num_pcs = 0
+        default_auth = self.config.get('GENERAL', 'agent_auth', fallback='none')
+        for pc_num in range(1, num_pcs + 1):
+            section = f'PC{pc_num}'
+            if not self.config.has_section(section):
+                continue
+            pc = self.config[section]
+            hosts[section] = {
+                'section': section,
+                'name': pc.get('name', section),
+                'ip_address': pc.get('ip_address', ''),
+                'mac_address': pc.get('mac_address', ''),
+                'agent_auth': pc.get('agent_auth', default_auth).strip().lower(),
+                'os': pc.get('os', 'windows').strip().lower(),
+            }
+        return hosts
+        
+    def start_dashboard(self):
+        """Rebuild the table from the configuration and start background polling"""
+        self.stop_dashboard()
+        self.dashboard_hosts = self.get_dashboard_hosts()
+        for item in self.dashboard_tree.get_children():
+            self.dashboard_tree.delete(item)
+        self.dashboard_rows = {}
+        for section, host in self.dashboard_hosts.items():
+            values = (section, host['name'], host['ip_address'], '…', '', '', '', '')
+            self.dashboard_tree.insert('', 'end', iid=section, values=values)
+            self.dashboard_rows[section] = values
+        
+        esp32 = {'name': self.esp32_vars['device_name'].get(), 'ip_address': self.esp32_vars['static_ip'].get()}
+        interval = self.config.getfloat('AGGREGATOR', 'poll_interval', fallback=DEFAULT_INTERVAL)
+        timeout = self.config.getfloat('GENERAL', 'agent_timeout', fallback=2.0)
+        pcs = [host for host in self.dashboard_hosts.values() if host['ip_address']]
+        self.poller = DashboardPoller(pcs, esp32 if esp32['ip_address'] else None, interval, timeout).start()
+        self.root.after(DASHBOARD_DRAIN_MS, self.drain_dashboard, self.poller)
+        
+    def stop_dashboard(self):
+        if self.poller is not None:
+            self.poller.stop()
+            self.poller = None
+            
+    def refresh_dashboard(self):
+        if self.poller is not None:
+            self.poller.refresh()
+            
+    def drain_dashboard(self, poller):
+        """Apply every batch the poller finished since the last call (Tk thread only)"""
+        batches = []
+        while True:
+            try:
+                item = poller.results.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == 'poll':
+                batches.append(item[1])
+            else:
+                _, label, ok, message = item
+                self.log_status(f"{'✅' if ok else '❌'} {label}: {message}")
+        # Only the newest round matters when several piled up
+        if batches:
+            self.apply_dashboard_results(batches[-1])
+        if poller is self.poller:
+            self.root.after(DASHBOARD_DRAIN_MS, self.drain_dashboard, poller)
+            
+    def apply_dashboard_results(self, results):
+        """Update only the rows whose displayed values changed"""
+        now = time.strftime('%H:%M:%S')
+        for result in results:
+            latency = f"{result['latency_ms']:.0f} ms" if result['latency_ms'] is not None else ''
+            if result['key'] == 'esp32':
+                state = f"online, {latency}" if result['online'] else f"offline ({result['message']})"
+                self.esp32_dashboard_label.config(text=f"ESP32 {self.esp32_vars['static_ip'].get()}: {state}")
+                continue
+            section = result['key']
+            previous = self.dashboard_rows.get(section)
+            if previous is None:
+                continue
+            last_seen = now if result['online'] else previous[6]
+            values = (section, previous[1], previous[2], 'Online' if result['online'] else 'Offline', latency,
+                      result['state'] or previous[5], last_seen, result['message'])
+            if values != previous:
+                self.dashboard_tree.item(section, values=values, tags=('online' if result['online'] else 'offline',))
+                self.dashboard_rows[section] = values
+        online = sum(1 for values in self.dashboard_rows.values() if values[3] == 'Online')
+        self.fleet_summary_label.config(text=f"{online}/{len(self.dashboard_rows)} agents online, updated {now}")
+        
+    def get_selected_hosts(self):
+        sections = self.dashboard_tree.selection()
+        if not sections:
+            messagebox.showinfo("Dashboard", "Select one or more PCs first")
+        return [self.dashboard_hosts[section] for section in sections if section in self.dashboard_hosts]
+        
+    def wake_selected(self):
+        """Wake the selected PCs through the ESP32 (or a local broadcast)"""
+        if self.poller is None:
+            return
+        esp32_ip = self.esp32_vars['static_ip'].get()
+        for host in self.get_selected_hosts():
+            self.poller.run_action(f"Wake {host['name']}",
+                                   wake_pc(esp32_ip, host['name'], host['mac_address'], self.poller.timeout))
+            
+    def send_power_action(self):
+        """Send the chosen power command to the selected agents, signed with their keys"""
+        if self.poller is None:
+            return
+        hosts = self.get_selected_hosts()
+        command = self.dashboard_action_var.get()
+        if not hosts or command not in POWER_ACTIONS or not messagebox.askyesno(
+                "Confirm", f"Send '{command}' to {len(hosts)} PC(s): {', '.join(host['name'] for host in hosts)}?"):
+            return
+        secrets = read_secrets_file(Path(self.deploy_path_var.get()) / 'secrets.yaml')
+        for host in hosts:
+            if command not in OS_POWER_ACTIONS.get(host['os'], ()):
+                self.log_status(f"⚠️ {command} {host['name']}: not available on {host['os']} - skipped")
+                continue
+            agent_key = None
+            if host['agent_auth'] == 'hmac':
+                agent_key = secrets.get(f"{host['name'].lower()}_agent_key")
+                if not agent_key:
+                    self.log_status(f"❌ {command} {host['name']}: no agent key in secrets.yaml - generate secrets first")
+                    continue
+            self.poller.run_action(f"{command.capitalize()} {host['name']}",
+                                   send_power_command(host['ip_address'], command, agent_key, self.poller.timeout))
+            
     def save_configuration(self):
         """Save current configuration"""
         try:
@@ -457,12 +801,8 @@ Note: Configuration is saved to the deployment directory, keeping the root confi
             # Update deployment config file path
             self.deployment_config_file = os.path.join(self.deploy_path_var.get(), "config.ini")
             
-            # Update PC configs
-            num_pcs = int(self.num_pcs_var.get())
-            for pc_num in range(1, num_pcs + 1):
-                if pc_num in self.pc_vars:
-                    for key, var in self.pc_vars[pc_num].items():
-                        self.config.set(f'PC{pc_num}', key, var.get())
+            # PC cells are written to the config as they are edited; commit an open editor
+            self.finish_pc_edit()
                         
             self.save_config()
             self.update_config_status_label()
@@ -497,33 +837,24 @@ Note: Configuration is saved to the deployment directory, keeping the root confi
             messagebox.showerror("Error", error_msg)
             
     def generate_api_key(self):
-        """Generate API key using the script"""
+        """Generate all missing deployment secrets in-process"""
         try:
-            script_path = Path("scripts/generate_api_key.py")
-            if script_path.exists():
-                # Run the API key generator
-                result = subprocess.run([sys.executable, str(script_path)], 
-                                      capture_output=True, text=True, cwd=".")
-                if result.returncode == 0:
-                    self.log_status("🔑 API key generated successfully!")
-                    self.log_status("Check the console output or api_key.txt file")
-                    
-                    # Try to read the generated key file
-                    key_file = Path("api_key.txt")
-                    if key_file.exists():
-                        with open(key_file, 'r') as f:
-                            key_content = f.read().strip()
-                        self.log_status(f"Generated: {key_content}")
-                        messagebox.showinfo("Success", f"API key generated!\n{key_content}\n\nAdd this to your ESPHome secrets file.")
-                    else:
-                        messagebox.showinfo("Success", "API key generated! Check the console output.")
-                else:
-                    self.log_status(f"❌ API key generation failed: {result.stderr}")
-                    messagebox.showerror("Error", f"Failed to generate API key: {result.stderr}")
+            self.save_configuration()
+            
+            from template_generator import TemplateGenerator
+            
+            config_to_use = self.deployment_config_file if self.deployment_config_file and os.path.exists(self.deployment_config_file) else self.template_config_file
+            generator = TemplateGenerator(config_to_use)
+            secrets_path, created = generator.generate_secrets(self.deploy_path_var.get())
+            
+            if created:
+                self.log_status(f"🔑 Generated {len(created)} secret(s): {', '.join(created)}")
             else:
-                messagebox.showerror("Error", "API key generator script not found: scripts/generate_api_key.py")
+                self.log_status("🔑 All secrets already present - existing keys kept")
+            self.log_status(f"Secrets file: {secrets_path}")
+            messagebox.showinfo("Success", f"Secrets written to:\n{secrets_path}\n\nAdd wifi_ssid and wifi_password, then use this file as your ESPHome secrets.")
         except Exception as e:
-            error_msg = f"Failed to run API key generator: {e}"
+            error_msg = f"Failed to generate secrets: {e}"
             self.log_status(f"❌ {error_msg}")
             messagebox.showerror("Error", error_msg)
 
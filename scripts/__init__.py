@@ -0,0 +1,3 @@
+"""
+ESP32 PC Controller - Utility scripts
+"""
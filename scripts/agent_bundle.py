@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Agent Bundles
+Packs a generated PC agent and its pure Python dependencies into a single
+.pyz zipapp with precompiled bytecode, so a PC starts the agent from one
+file without compiling it or searching site-packages.
+
+Dependencies are installed once per deployment and shared by every bundle.
+Extension modules are dropped; the agent's dependencies all ship pure
+Python fallbacks for them (markupsafe, charset_normalizer).
+"""
+
+import argparse
+import compileall
+import json
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+BUNDLE_SUFFIX = '.pyz'
+BUNDLE_INTERPRETER = '/usr/bin/env python3'
+MANIFEST_FILE = 'bundle_manifest.json'
+# click imports colorama on Windows behind a marker pip skips on other hosts
+EXTRA_PACKAGES = ('colorama',)
+# Import names that differ from the pip package name
+PACKAGE_IMPORTS = {'paho-mqtt': 'paho.mqtt.client'}
+# Native code that cannot be imported from a zip archive
+EXTENSION_SUFFIXES = ('.so', '.pyd', '.dll', '.dylib')
+# Fixed entry timestamp so unchanged agents rebuild to identical archives
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class AgentBundleError(RuntimeError):
+    """Raised when the dependencies cannot be installed or imported"""
+
+
+def bytecode_tag():
+    """Python version the bundled bytecode is compiled for, e.g. 3.12"""
+    return f"{sys.version_info.major}.{sys.version_info.minor}"
+
+
+def run_pip(args):
+    command = [sys.executable, '-m', 'pip', '--disable-pip-version-check', '--quiet'] + args
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        detail = (result.stderr or result.stdout).strip().splitlines()
+        raise AgentBundleError(f"pip failed: {detail[-1] if detail else 'exit code ' + str(result.returncode)}")
+
+
+def prepare_dependencies(dependencies_dir, packages, imports, find_links=None):
+    """Install the agent's dependencies into a shared, precompiled folder
+
+    The folder is reused while the packages and the generator's Python
+    version are unchanged. A finished install is checked by importing
+    every dependency with site-packages disabled, so a missing pure Python
+    fallback fails here rather than on the PC.
+    Returns True when the dependencies were installed, False when reused.
+    """
+    dependencies_dir = Path(dependencies_dir)
+    manifest = {
+        'packages': sorted(set(packages) | set(EXTRA_PACKAGES)),
+        'python': bytecode_tag(),
+    }
+    manifest_path = dependencies_dir / MANIFEST_FILE
+    if manifest_path.exists():
+        try:
+            if json.loads(manifest_path.read_text(encoding='utf-8')) == manifest:
+                return False
+        except ValueError:
+            pass
+
+    if dependencies_dir.exists():
+        shutil.rmtree(dependencies_dir)
+    pip_args = ['install', '--no-compile', '--target', str(dependencies_dir)]
+    if find_links:
+        pip_args += ['--find-links', str(find_links)]
+    run_pip(pip_args + manifest['packages'])
+
+    for path in list(dependencies_dir.rglob('*')):
+        if path.is_file() and path.suffix in EXTENSION_SUFFIXES:
+            path.unlink()
+    shutil.rmtree(dependencies_dir / 'bin', ignore_errors=True)
+    compile_tree(dependencies_dir)
+
+    check = f"import sys; sys.path.insert(0, {str(dependencies_dir)!r}); import {', '.join(imports)}"
+    result = subprocess.run([sys.executable, '-I', '-S', '-c', check], capture_output=True, text=True)
+    if result.returncode != 0:
+        detail = result.stderr.strip().splitlines()
+        raise AgentBundleError(f"bundled dependencies do not import without native code: "
+                               f"{detail[-1] if detail else 'exit code ' + str(result.returncode)}")
+
+    manifest_path.write_text(json.dumps(manifest, indent=2) + '\n', encoding='utf-8')
+    return True
+
+
+def compile_tree(directory):
+    """Compile every module to a .pyc beside its source, the layout zipimport reads
+
+    Unchecked hash-based pycs skip the source comparison on import. Another
+    Python version rejects their magic number and imports the bundled source.
+    """
+    compileall.compile_dir(str(directory), quiet=2, legacy=True, ddir='',
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+
+
+def iter_bundle_files(dependencies_dir):
+    """(archive name, path) of the dependency files and folders that go into a bundle
+
+    Folders get entries of their own: zipimport only finds namespace
+    packages without __init__.py (such as flask.sansio) through them.
+    """
+    dependencies_dir = Path(dependencies_dir)
+    for path in sorted(dependencies_dir.rglob('*')):
+        relative = path.relative_to(dependencies_dir)
+        if '__pycache__' in relative.parts or relative.name == MANIFEST_FILE:
+            continue
+        yield relative.as_posix() + ('/' if path.is_dir() else ''), path
+
+
+def build_bundle(agent_source, dependencies_dir, output_path, interpreter=BUNDLE_INTERPRETER):
+    """Write a .pyz running agent_source as __main__ with the shared dependencies"""
+    output_path = Path(output_path)
+    with tempfile.TemporaryDirectory() as staging:
+        main_file = Path(staging) / '__main__.py'
+        main_file.write_text(agent_source, encoding='utf-8')
+        compile_tree(staging)
+        members = [(path.name, path) for path in sorted(Path(staging).iterdir())]
+        members += list(iter_bundle_files(dependencies_dir))
+
+        temp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(b'#!' + interpreter.encode('utf-8') + b'\n')
+            with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for name, path in members:
+                    info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+                    if name.endswith('/'):
+                        info.external_attr = (0o40755 << 16) | 0x10
+                        archive.writestr(info, b'')
+                    else:
+                        info.compress_type = zipfile.ZIP_DEFLATED
+                        info.external_attr = 0o644 << 16
+                        archive.writestr(info, path.read_bytes())
+    temp_path.replace(output_path)
+    output_path.chmod(0o755)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle a generated PC agent into a single .pyz")
+    parser.add_argument("agent", help="Generated agent script, e.g. kusanagi/kusanagi_shutdown.py")
+    parser.add_argument("--deps", default="agent_bundle",
+                        help="Shared dependency folder (default: agent_bundle)")
+    parser.add_argument("--packages", default="flask,requests",
+                        help="Comma separated pip packages (default: flask,requests)")
+    parser.add_argument("--find-links", help="Local wheel folder to install from, e.g. a wheelhouse")
+    parser.add_argument("-o", "--output", help="Bundle path (default: the agent path with .pyz)")
+    args = parser.parse_args()
+
+    agent = Path(args.agent)
+    packages = [package.strip() for package in args.packages.split(',') if package.strip()]
+    imports = [PACKAGE_IMPORTS.get(package, package) for package in packages]
+    try:
+        prepare_dependencies(args.deps, packages, imports, args.find_links)
+        output = build_bundle(agent.read_text(encoding='utf-8'), args.deps,
+                              args.output or agent.with_suffix(BUNDLE_SUFFIX))
+    except (AgentBundleError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Created: {output} (bytecode for Python {bytecode_tag()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Firmware Builds
+Compiles one or more controller YAMLs with ESPHome, several at a time, and
+skips every controller whose inputs (the YAML, secrets.yaml and the headers
+it includes) are unchanged since its last successful build. Build durations
+are recorded per controller and longer builds are started first.
+
+The ESPHome command is configurable (--esphome or ESPHOME_COMMAND), so
+scripts/esphome_stub.py can stand in for ESPHome in local tests.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+FIRMWARE_YAML = 'pc_controller.yaml'
+STATE_FILE = '.firmware_builds.json'
+COMMAND_ENV = 'ESPHOME_COMMAND'
+DEFAULT_COMMAND = 'esphome'
+# Each ESPHome build already uses several cores
+DEFAULT_JOBS = 2
+# Files next to the YAML that ESPHome reads besides the YAML itself
+INPUT_PATTERNS = ('secrets.yaml', '*.h', '*.cpp')
+FIRMWARE_PATTERN = '.esphome/build/*/.pioenvs/*/firmware.bin'
+DURATION_HISTORY = 10
+LOG_TAIL_LINES = 5
+
+
+def esphome_command(command=None):
+    """ESPHome invocation as an argument list, e.g. ['esphome'] or ['python', 'stub.py']"""
+    return shlex.split(command or os.environ.get(COMMAND_ENV) or DEFAULT_COMMAND, posix=os.name != 'nt')
+
+
+def input_hash(yaml_path, command):
+    """SHA-256 over the controller's build inputs and the command building it"""
+    yaml_path = Path(yaml_path)
+    digest = hashlib.sha256(' '.join(command).encode('utf-8') + b'\0')
+    inputs = {yaml_path}
+    for pattern in INPUT_PATTERNS:
+        inputs.update(path for path in yaml_path.parent.glob(pattern) if path.is_file())
+    for path in sorted(inputs):
+        digest.update(path.name.encode('utf-8') + b'\0' + path.read_bytes() + b'\0')
+    return digest.hexdigest()
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def load_state(state_file):
+    try:
+        return json.loads(Path(state_file).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state_file, state):
+    Path(state_file).write_text(json.dumps(state, indent=2) + '\n', encoding='utf-8')
+
+
+class FirmwareBuild:
+    """One controller YAML: whether it needs a build and how the last ones went"""
+
+    def __init__(self, yaml_path, command):
+        self.yaml_path = Path(yaml_path)
+        self.command = command
+        self.state_file = self.yaml_path.parent / STATE_FILE
+        self.log_file = self.yaml_path.with_suffix('.build.log')
+        self.record = load_state(self.state_file).get(self.yaml_path.name, {})
+        self.input_hash = input_hash(self.yaml_path, command)
+        self.duration = None
+        self.returncode = None
+
+    @property
+    def up_to_date(self):
+        firmware = self.record.get('firmware')
+        return (self.record.get('status') == 'ok' and self.record.get('input_hash') == self.input_hash
+                and (firmware is None or (self.yaml_path.parent / firmware).exists()))
+
+    @property
+    def expected_seconds(self):
+        durations = self.record.get('durations', [])
+        return sum(durations) / len(durations) if durations else None
+
+    def run(self):
+        """Compile the YAML, logging ESPHome's output next to it"""
+        started = time.monotonic()
+        with open(self.log_file, 'w', encoding='utf-8') as log:
+            result = subprocess.run(self.command + ['compile', self.yaml_path.name], cwd=self.yaml_path.parent,
+                                    stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        self.duration = time.monotonic() - started
+        self.returncode = result.returncode
+        return self
+
+    def log_tail(self):
+        try:
+            lines = self.log_file.read_text(encoding='utf-8', errors='replace').strip().splitlines()
+        except OSError:
+            return []
+        return lines[-LOG_TAIL_LINES:]
+
+    def save(self):
+        """Record the build; the state file is only written from the main thread"""
+        state = load_state(self.state_file)
+        record = state.get(self.yaml_path.name, {})
+        record['status'] = 'ok' if self.returncode == 0 else 'failed'
+        record['input_hash'] = self.input_hash
+        record['built_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        record['last_duration'] = round(self.duration, 1)
+        if self.returncode == 0:
+            record['durations'] = (record.get('durations', []) + [record['last_duration']])[-DURATION_HISTORY:]
+            firmware = max(self.yaml_path.parent.glob(FIRMWARE_PATTERN), key=lambda path: path.stat().st_mtime,
+                           default=None)
+            record['firmware'] = firmware.relative_to(self.yaml_path.parent).as_posix() if firmware else None
+        state[self.yaml_path.name] = record
+        save_state(self.state_file, state)
+        self.record = record
+
+
+def build_all(yaml_paths, jobs=DEFAULT_JOBS, command=None, force=False, log=print):
+    """Build the controllers whose inputs changed, up to jobs at a time
+
+    Returns (built, skipped, failed) lists of FirmwareBuild.
+    """
+    command = esphome_command(command)
+    builds = [FirmwareBuild(yaml_path, command) for yaml_path in yaml_paths]
+    skipped = [build for build in builds if build.up_to_date and not force]
+    for build in skipped:
+        log(f"♻️  {build.yaml_path}: up to date (built {build.record['built_at']} "
+            f"in {format_duration(build.record['last_duration'])})")
+    # Longest builds first so a slow controller does not start last; unknown ones count as longest
+    pending = sorted((build for build in builds if build not in skipped),
+                     key=lambda build: -(build.expected_seconds or float('inf')))
+    built, failed = [], []
+    if not pending:
+        return built, skipped, failed
+
+    jobs = max(1, min(jobs, len(pending)))
+    log(f"🔨 Building {len(pending)} firmware(s) with {' '.join(command)}, {jobs} at a time...")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(build.run) for build in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                build = future.result()
+            except OSError as e:
+                build = pending[futures.index(future)]
+                log(f"   ❌ [{done}/{len(pending)}] {build.yaml_path}: cannot run {' '.join(command)}: {e}")
+                failed.append(build)
+                continue
+            build.save()
+            if build.returncode == 0:
+                built.append(build)
+                log(f"   ✅ [{done}/{len(pending)}] {build.yaml_path} built in {format_duration(build.duration)}")
+            else:
+                failed.append(build)
+                log(f"   ❌ [{done}/{len(pending)}] {build.yaml_path} failed after "
+                    f"{format_duration(build.duration)} (exit code {build.returncode}, see {build.log_file})")
+                for line in build.log_tail():
+                    log(f"      {line}")
+
+    log(f"📊 {len(built)} built, {len(skipped)} up to date, {len(failed)} failed "
+        f"in {format_duration(time.monotonic() - started)}")
+    return built, skipped, failed
+
+
+def resolve_targets(targets):
+    """YAML files given directly or as deployment folders holding pc_controller.yaml"""
+    yaml_paths = []
+    for target in targets:
+        path = Path(target)
+        yaml_path = path / FIRMWARE_YAML if path.is_dir() else path
+        if not yaml_path.is_file():
+            raise FileNotFoundError(f"no controller YAML at {yaml_path}")
+        yaml_paths.append(yaml_path)
+    return yaml_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile controller YAMLs with ESPHome, skipping unchanged ones")
+    parser.add_argument("targets", nargs="+", help=f"Controller YAMLs or deployment folders (holding {FIRMWARE_YAML})")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Builds run at once (default: {DEFAULT_JOBS})")
+    parser.add_argument("--esphome", help=f"ESPHome command (default: ${COMMAND_ENV} or {DEFAULT_COMMAND}), "
+                                          "e.g. \"python scripts/esphome_stub.py\"")
+    parser.add_argument("--force", action="store_true", help="Build even when the inputs are unchanged")
+    args = parser.parse_args()
+
+    try:
+        yaml_paths = resolve_targets(args.targets)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    _, _, failed = build_all(yaml_paths, args.jobs, args.esphome, args.force)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
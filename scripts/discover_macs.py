@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - MAC Address Discovery
+Resolves each configured ip_address to its MAC through the local neighbor
+(ARP) table and proposes corrections to config.ini
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import re
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+# Run as a script, only scripts/ is on the path; the project root is one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scripts.import_inventory import load_deployment_config, normalize_mac  # noqa: E402
+
+AGENT_PORT = 5000
+# UDP discard port; the datagram only exists to trigger ARP resolution
+PROBE_PORT = 9
+PROBE_CONCURRENCY = 256
+NEIGHBOR_PATTERN = re.compile(
+    r'(?P<ip>\d{1,3}(?:\.\d{1,3}){3}).*?(?P<mac>[0-9A-Fa-f]{1,2}(?:[:-][0-9A-Fa-f]{1,2}){5})'
+)
+
+
+def read_proc_arp(path="/proc/net/arp"):
+    """Parse the Linux kernel ARP table"""
+    table = {}
+    with open(path, 'r') as f:
+        next(f, None)  # Header
+        for line in f:
+            fields = line.split()
+            # Flags 0x0 mark incomplete entries
+            if len(fields) >= 4 and fields[2] != '0x0':
+                mac = normalize_mac(fields[3])
+                if mac and mac != '00:00:00:00:00:00':
+                    table[fields[0]] = mac
+    return table
+
+
+def read_command_neighbors(command):
+    """Parse `ip neigh` / `arp -a` style output into {ip: mac}"""
+    output = subprocess.run(command, capture_output=True, text=True, timeout=10).stdout
+    table = {}
+    for line in output.splitlines():
+        match = NEIGHBOR_PATTERN.search(line)
+        if match:
+            # arp -a on macOS prints single-digit octets (a:b:...), pad them
+            octets = re.split(r'[:-]', match.group('mac'))
+            mac = normalize_mac(':'.join(octet.zfill(2) for octet in octets))
+            if mac and mac not in ('00:00:00:00:00:00', 'FF:FF:FF:FF:FF:FF'):
+                table[match.group('ip')] = mac
+    return table
+
+
+def read_neighbor_table():
+    """Read the neighbor table using the best source for this platform"""
+    if Path("/proc/net/arp").exists():
+        return read_proc_arp()
+    for command in (["ip", "neigh", "show"], ["arp", "-a"]):
+        try:
+            return read_command_neighbors(command)
+        except (OSError, subprocess.SubprocessError):
+            continue
+    return {}
+
+
+async def probe_host(ip_address, udp_socket, semaphore, timeout):
+    """Nudge the kernel into resolving ip_address and check for a PC agent"""
+    async with semaphore:
+        try:
+            udp_socket.sendto(b'', (ip_address, PROBE_PORT))
+        except OSError:
+            pass
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip_address, AGENT_PORT), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return ip_address, False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return ip_address, True
+
+
+async def sweep(addresses, timeout, concurrency=PROBE_CONCURRENCY):
+    """Probe every address concurrently; returns {ip: agent_reachable}"""
+    semaphore = asyncio.Semaphore(concurrency)
+    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp_socket.setblocking(False)
+    try:
+        results = await asyncio.gather(*(probe_host(ip, udp_socket, semaphore, timeout) for ip in addresses))
+    finally:
+        udp_socket.close()
+    return dict(results)
+
+
+def configured_pcs(config):
+    """Yield (section, pc_config) for every active PC"""
+    num_pcs = int(config.get('GENERAL', 'num_pcs', fallback='0'))
+    for pc_num in range(1, num_pcs + 1):
+        section = f'PC{pc_num}'
+        if section in config:
+            yield section, config[section]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve configured PC IPs to MAC addresses via the ARP table")
+    parser.add_argument("--config", default="config.ini", help="Configuration file (default: config.ini)")
+    parser.add_argument("--sweep", metavar="CIDR", action='append', default=[],
+                        help="Also probe every host in this subnet, e.g. 192.168.1.0/24 (repeatable)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Per-host probe timeout in seconds (default: 1)")
+    parser.add_argument("--no-probe", action="store_true", help="Only read the current neighbor table")
+    parser.add_argument("--apply", action="store_true", help="Write MAC corrections to the config file")
+    args = parser.parse_args()
+
+    print("🔎 ESP32 PC Controller MAC Discovery")
+    print("═" * 60)
+
+    config, config_path = load_deployment_config(args.config)
+    pcs = list(configured_pcs(config))
+
+    addresses = {pc['ip_address'] for _, pc in pcs if pc.get('ip_address')}
+    try:
+        for cidr in args.sweep:
+            addresses.update(str(host) for host in ipaddress.IPv4Network(cidr, strict=False).hosts())
+    except ValueError as e:
+        print(f"❌ Invalid subnet: {e}")
+        return 1
+
+    agents = {}
+    if not args.no_probe and addresses:
+        print(f"📡 Probing {len(addresses)} hosts...")
+        agents = asyncio.run(sweep(sorted(addresses), args.timeout))
+    table = read_neighbor_table()
+    print(f"📋 Neighbor table: {len(table)} entries")
+    print()
+
+    corrections = 0
+    for section, pc in pcs:
+        ip_address = pc.get('ip_address', '')
+        configured = normalize_mac(pc.get('mac_address')) or pc.get('mac_address', '')
+        discovered = table.get(ip_address)
+        agent = ''
+        if agents:
+            agent = " (agent up)" if agents.get(ip_address) else " (no agent)"
+        if discovered is None:
+            print(f"   ❔ {section} {pc['name']:<16} {ip_address:<15} not in neighbor table{agent}")
+        elif discovered == configured:
+            print(f"   ✅ {section} {pc['name']:<16} {ip_address:<15} {discovered}{agent}")
+        else:
+            corrections += 1
+            print(f"   ⚠️  {section} {pc['name']:<16} {ip_address:<15} {configured or '(none)'} → {discovered}{agent}")
+            if args.apply:
+                pc['mac_address'] = discovered
+
+    if args.sweep:
+        known = {pc.get('ip_address') for _, pc in pcs}
+        unknown = sorted((ip for ip in table if ip not in known and ip in addresses), key=ipaddress.IPv4Address)
+        if unknown:
+            print()
+            print("🆕 Hosts found in the sweep but not configured:")
+            for ip_address in unknown:
+                agent = " (agent up)" if agents.get(ip_address) else ""
+                print(f"   {ip_address:<15} {table[ip_address]}{agent}")
+
+    print()
+    if corrections and args.apply:
+        with open(config_path, 'w') as f:
+            config.write(f)
+        print(f"💾 Applied {corrections} MAC correction(s) to: {config_path}")
+    elif corrections:
+        print(f"ℹ️  {corrections} correction(s) proposed - rerun with --apply to write them")
+    else:
+        print("✅ No MAC corrections needed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
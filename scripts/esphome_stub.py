@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - ESPHome Stub
+Stands in for the esphome command when trying build_firmware.py on a bench
+or in local tests: "compile" waits a moment and writes a fake firmware.bin
+where ESPHome would put it. Nothing is compiled, so never flash its output.
+
+    python scripts/build_firmware.py my_deployment --esphome "python scripts/esphome_stub.py --delay 2"
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+import time
+from pathlib import Path
+
+STUB_VERSION = 'Version: 0.0.0 (stub)'
+# esphome: name: may be a substitution such as ${device_name}
+NAME_PATTERN = re.compile(r'^esphome:\s*\n(?:[ \t]+.*\n)*?[ \t]+name:\s*["\']?([^"\'\s]+)', re.MULTILINE)
+SUBSTITUTION_PATTERN = re.compile(r'^\s+{}:\s*["\']?([^"\'\s]+)', re.MULTILINE)
+
+
+def node_name(text):
+    """Device name from the YAML, resolving one level of substitution"""
+    match = NAME_PATTERN.search(text)
+    if not match:
+        return 'firmware'
+    name = match.group(1)
+    if name.startswith('${') and name.endswith('}'):
+        substitution = re.search(SUBSTITUTION_PATTERN.pattern.format(re.escape(name[2:-1])), text, re.MULTILINE)
+        return substitution.group(1) if substitution else 'firmware'
+    return name
+
+
+def compile_yaml(yaml_path, delay, fail):
+    text = Path(yaml_path).read_text(encoding='utf-8')
+    name = node_name(text)
+    print(f"INFO Reading configuration {yaml_path}...")
+    print(f"INFO Compiling {name} (stub, {delay:g}s)...")
+    time.sleep(delay)
+    if fail:
+        print("ERROR Stub build failed as requested (--fail)")
+        return 1
+    firmware = Path(yaml_path).parent / '.esphome' / 'build' / name / '.pioenvs' / name / 'firmware.bin'
+    firmware.parent.mkdir(parents=True, exist_ok=True)
+    firmware.write_bytes(b'ESPHOME-STUB\n' + hashlib.sha256(text.encode('utf-8')).digest())
+    print(f"INFO Successfully compiled program: {firmware}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake esphome command for local build tests")
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds a compile takes (default: 1)")
+    parser.add_argument("--fail", action="store_true", help="Make every compile fail")
+    parser.add_argument("command", choices=("compile", "version"))
+    parser.add_argument("configuration", nargs="?", help="Controller YAML to compile")
+    args = parser.parse_args()
+
+    if args.command == 'version':
+        print(STUB_VERSION)
+        return 0
+    if not args.configuration:
+        parser.error("compile needs a configuration YAML")
+    return compile_yaml(args.configuration, args.delay, args.fail)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,10 +4,13 @@ ESP32 PC Controller - API Key Generator
 Generates a secure base64-encoded 32-byte API encryption key for ESPHome
 """
 
+import argparse
 import secrets
 import base64
+import json
 import os
 import sys
+from pathlib import Path
 
 def generate_api_key():
     """Generate a secure base64-encoded 32-byte API key"""
@@ -23,6 +26,68 @@ def generate_api_key():
         print(f"❌ Error generating API key: {e}")
         return None
 
+def generate_agent_key():
+    """Generate a hex-encoded 32-byte key for signing PC agent requests"""
+    return secrets.token_hex(32)
+
+def generate_fallback_password():
+    """Generate a random password for the ESP32 fallback hotspot"""
+    return secrets.token_urlsafe(18)
+
+def read_secrets_file(secrets_path):
+    """Read the flat key: value entries of an ESPHome secrets.yaml"""
+    values = {}
+    path = Path(secrets_path)
+    if not path.exists():
+        return values
+    with open(path, 'r') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#') or ':' not in stripped:
+                continue
+            key, value = stripped.split(':', 1)
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+                value = value[1:-1]
+            values[key.strip()] = value
+    return values
+
+def ensure_secrets(secrets_path, required):
+    """Add every missing secret to secrets.yaml in one pass
+
+    required maps secret names to a zero-argument factory (or a fixed value).
+    Existing entries, comments and formatting are left untouched and new
+    entries are appended, so regenerating never rotates a key already flashed.
+    The file is created owner-readable only. Returns the names that were added.
+    """
+    path = Path(secrets_path)
+    existing = read_secrets_file(path)
+    new_lines = []
+    created = []
+    for name, factory in required.items():
+        if name in existing:
+            continue
+        value = factory() if callable(factory) else factory
+        new_lines.append(f'{name}: {json.dumps(value)}\n')
+        created.append(name)
+
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write("# ESPHome secrets - generated by ESP32 PC Controller\n")
+            f.write("# Keep this file private; add wifi_ssid and wifi_password yourself\n")
+            f.writelines(new_lines)
+    elif new_lines:
+        with open(path, 'r') as f:
+            needs_newline = not f.read().endswith('\n')
+        with open(path, 'a') as f:
+            if needs_newline:
+                f.write('\n')
+            f.writelines(new_lines)
+    os.chmod(path, 0o600)
+    return created
+
 def save_key_to_file(api_key):
     """Save the API key to a text file"""
     try:
@@ -33,7 +98,30 @@ def save_key_to_file(api_key):
         print(f"⚠️ Warning: Could not save to file: {e}")
         return False
 
+def generate_fleet_secrets(config_file):
+    """Bulk mode: write every secret a deployment needs to its secrets.yaml"""
+    # The generator knows which PCs need agent keys; it lives one level up
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from template_generator import TemplateGenerator
+
+    generator = TemplateGenerator(config_file)
+    secrets_path, created = generator.generate_secrets()
+    print(f"🔐 Secrets file: {secrets_path}")
+    if created:
+        for name in created:
+            print(f"   ✅ Generated: {name}")
+    else:
+        print("   ℹ️  All secrets already present - nothing to do")
+    return 0
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate ESPHome API keys and deployment secrets")
+    parser.add_argument("--fleet", metavar="CONFIG",
+                        help="Generate every missing secret for the deployment described by CONFIG")
+    args = parser.parse_args()
+    if args.fleet:
+        return generate_fleet_secrets(args.fleet)
+
     print("🔐 ESP32 API Key Generator")
     print("═" * 60)
     print()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Fleet Inventory Importer
+Streams PCs from CSV, JSON or DHCP lease files and merges them into the
+deployment config.ini as [PCn] sections
+"""
+
+import argparse
+import configparser
+import csv
+import ipaddress
+import json
+import re
+import sys
+from pathlib import Path
+
+MAC_PATTERN = re.compile(r'^[0-9A-F]{12}$')
+NAME_PATTERN = re.compile(r'[^A-Za-z0-9_]+')
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Accepted column/field names for each config key
+FIELD_ALIASES = {
+    'name': ('name', 'hostname', 'host', 'pc_name'),
+    'mac_address': ('mac_address', 'mac', 'hwaddr', 'hardware_address'),
+    'ip_address': ('ip_address', 'ip', 'ipv4', 'address'),
+}
+# Optional per-PC keys copied through unchanged when present
+PASSTHROUGH_KEYS = (
+    'on_button_gpio', 'off_button_gpio', 'shutdown_delay', 'power_actions',
+    'agent_auth', 'agent_rate_limit', 'agent_rate_burst', 'os', 'sync_target', 'wol_relay',
+)
+
+
+class InventoryError(Exception):
+    """Raised for an inventory record that cannot be imported"""
+
+
+def normalize_mac(value):
+    """Return a MAC as AA:BB:CC:DD:EE:FF, or None if it is not a valid MAC"""
+    digits = re.sub(r'[^0-9A-Fa-f]', '', value or '').upper()
+    separators = re.sub(r'[0-9A-Fa-f]', '', value or '')
+    if not MAC_PATTERN.match(digits) or set(separators) - set(':-.'):
+        return None
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def normalize_ip(value):
+    """Return a dotted IPv4 address, or None if it is not valid"""
+    try:
+        return str(ipaddress.IPv4Address((value or '').strip()))
+    except ipaddress.AddressValueError:
+        return None
+
+
+def normalize_name(value):
+    """Make a host name safe for folder names and ESPHome ids"""
+    name = NAME_PATTERN.sub('_', (value or '').strip()).strip('_')
+    return name or None
+
+
+def iter_csv_records(stream):
+    """Yield one dict per CSV row"""
+    for row in csv.DictReader(stream):
+        yield {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+
+def iter_json_records(stream):
+    """Yield objects from a JSON array or JSON Lines file without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        # Skip array brackets, separators and whitespace between objects
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if not buffer:
+            if eof:
+                return
+            chunk = stream.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                return
+            buffer = chunk
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                eof = True
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        if isinstance(record, dict):
+            yield {str(key).lower(): str(value) for key, value in record.items() if value is not None}
+
+
+def iter_dnsmasq_records(stream):
+    """Yield leases from a dnsmasq.leases file (expiry mac ip hostname clientid)"""
+    for line in stream:
+        fields = line.split()
+        if len(fields) >= 4 and not fields[0].startswith('duid'):
+            hostname = fields[3] if fields[3] != '*' else ''
+            yield {'mac_address': fields[1], 'ip_address': fields[2], 'name': hostname}
+
+
+def iter_isc_records(stream):
+    """Yield active leases from an ISC dhcpd.leases file"""
+    lease = None
+    for line in stream:
+        line = line.strip()
+        if line.startswith('lease ') and line.endswith('{'):
+            lease = {'ip_address': line.split()[1], 'state': 'active'}
+        elif lease is None:
+            continue
+        elif line == '}':
+            if lease.get('state') == 'active' and lease.get('mac_address'):
+                yield lease
+            lease = None
+        elif line.startswith('hardware ethernet '):
+            lease['mac_address'] = line.split()[2].rstrip(';')
+        elif line.startswith('client-hostname '):
+            lease['name'] = line.split(None, 1)[1].rstrip(';').strip('"')
+        elif line.startswith('binding state '):
+            lease['state'] = line.split()[2].rstrip(';')
+
+
+READERS = {
+    'csv': iter_csv_records,
+    'json': iter_json_records,
+    'dnsmasq': iter_dnsmasq_records,
+    'isc': iter_isc_records,
+}
+# Lease files list the same host many times; the most recent entry wins
+LEASE_FORMATS = ('dnsmasq', 'isc')
+
+
+def detect_format(path):
+    """Guess the inventory format from the file name"""
+    name = Path(path).name.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.json', '.jsonl', '.ndjson')):
+        return 'json'
+    if 'dhcpd' in name:
+        return 'isc'
+    if name.endswith('.leases'):
+        return 'dnsmasq'
+    raise InventoryError(f"Cannot detect format of {path}; use --format")
+
+
+def clean_record(raw):
+    """Map aliases to config keys and validate MAC, IP and name"""
+    record = {}
+    for key, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if raw.get(alias):
+                record[key] = raw[alias]
+                break
+
+    mac_address = normalize_mac(record.get('mac_address'))
+    if not mac_address:
+        raise InventoryError(f"invalid MAC address {record.get('mac_address')!r}")
+    ip_address = normalize_ip(record.get('ip_address'))
+    if not ip_address:
+        raise InventoryError(f"invalid IP address {record.get('ip_address')!r}")
+    name = normalize_name(record.get('name')) or f"PC_{mac_address.replace(':', '')[-6:]}"
+
+    cleaned = {'name': name, 'mac_address': mac_address, 'ip_address': ip_address}
+    for key in PASSTHROUGH_KEYS:
+        if raw.get(key):
+            cleaned[key] = raw[key]
+    return cleaned
+
+
+def load_deployment_config(config_file):
+    """Load config.ini, switching to the deployment copy when it exists"""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    config_path = Path(config_file)
+    deployment_path = config.get('GENERAL', 'deployment_path', fallback=None)
+    if deployment_path and (Path(deployment_path) / "config.ini").exists():
+        config_path = Path(deployment_path) / "config.ini"
+        config = configparser.ConfigParser()
+        config.read(config_path)
+    return config, config_path
+
+
+class InventoryMerger:
+    """Merge validated records into [PCn] sections using MAC/IP/name indexes"""
+
+    def __init__(self, config):
+        self.config = config
+        self.num_pcs = int(config.get('GENERAL', 'num_pcs', fallback='0'))
+        self.by_mac = {}
+        self.by_ip = {}
+        self.by_name = {}
+        for pc_num in range(1, self.num_pcs + 1):
+            section = f'PC{pc_num}'
+            if section in config:
+                self._index(section)
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+
+    def _index(self, section):
+        pc = self.config[section]
+        if pc.get('mac_address'):
+            self.by_mac[normalize_mac(pc['mac_address']) or pc['mac_address']] = section
+        if pc.get('ip_address'):
+            self.by_ip[pc['ip_address']] = section
+        if pc.get('name'):
+            self.by_name[pc['name'].lower()] = section
+
+    def _unindex(self, section):
+        pc = self.config[section]
+        for index, key in ((self.by_mac, normalize_mac(pc.get('mac_address')) or pc.get('mac_address')),
+                           (self.by_ip, pc.get('ip_address')),
+                           (self.by_name, (pc.get('name') or '').lower())):
+            if index.get(key) == section:
+                del index[key]
+
+    def merge(self, record):
+        """Add or update one record; raises InventoryError on conflicts"""
+        section = self.by_mac.get(record['mac_address']) or self.by_name.get(record['name'].lower())
+
+        ip_owner = self.by_ip.get(record['ip_address'])
+        if ip_owner and ip_owner != section:
+            raise InventoryError(f"IP {record['ip_address']} already used by {self.config[ip_owner]['name']}")
+        name_owner = self.by_name.get(record['name'].lower())
+        if name_owner and name_owner != section:
+            raise InventoryError(f"name {record['name']} already used by {name_owner}")
+
+        if section is None:
+            self.num_pcs += 1
+            section = f'PC{self.num_pcs}'
+            if section in self.config:
+                # Reuse an inactive slot, keeping its pre-assigned button pins
+                for key, value in record.items():
+                    self.config[section][key] = value
+            else:
+                self.config[section] = record
+            self.added += 1
+        else:
+            current = self.config[section]
+            if all(current.get(key) == value for key, value in record.items()):
+                self.unchanged += 1
+                return section
+            self._unindex(section)
+            for key, value in record.items():
+                current[key] = value
+            self.updated += 1
+        self._index(section)
+        return section
+
+    def finish(self):
+        """Record the new PC count in [GENERAL]"""
+        self.config['GENERAL']['num_pcs'] = str(self.num_pcs)
+        max_pcs = int(self.config.get('GENERAL', 'max_pcs', fallback='0'))
+        if self.num_pcs > max_pcs:
+            self.config['GENERAL']['max_pcs'] = str(self.num_pcs)
+
+
+def import_inventory(config, source, input_format, merger=None):
+    """Stream one inventory file into the config; returns (merger, errors)"""
+    merger = merger or InventoryMerger(config)
+    errors = []
+    seen = {}
+    last_wins = input_format in LEASE_FORMATS
+    pending = {}
+
+    with open(source, 'r', newline='', encoding='utf-8') as stream:
+        for number, raw in enumerate(READERS[input_format](stream), start=1):
+            try:
+                record = clean_record(raw)
+            except InventoryError as e:
+                errors.append(f"{source}:{number}: {e}")
+                continue
+            if last_wins:
+                # Hold lease records until the file is read so renewals replace
+                # older entries; memory is bounded by the number of hosts
+                pending.pop(record['mac_address'], None)
+                pending[record['mac_address']] = (number, record)
+                continue
+            if record['mac_address'] in seen:
+                errors.append(f"{source}:{number}: duplicate MAC {record['mac_address']} (first seen on record {seen[record['mac_address']]})")
+                continue
+            seen[record['mac_address']] = number
+            try:
+                merger.merge(record)
+            except InventoryError as e:
+                errors.append(f"{source}:{number}: {e}")
+
+    for number, record in pending.values():
+        try:
+            merger.merge(record)
+        except InventoryError as e:
+            errors.append(f"{source}:{number}: {e}")
+    return merger, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import PCs from CSV, JSON or DHCP leases into config.ini")
+    parser.add_argument("sources", nargs='+', help="Inventory files to import")
+    parser.add_argument("--config", default="config.ini", help="Configuration file (default: config.ini)")
+    parser.add_argument("--format", choices=sorted(READERS), help="Input format (default: detect from file name)")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing the config")
+    args = parser.parse_args()
+
+    print("📥 ESP32 PC Controller Inventory Import")
+    print("═" * 60)
+
+    config, config_path = load_deployment_config(args.config)
+    if 'GENERAL' not in config:
+        print(f"❌ No [GENERAL] section found in {config_path}")
+        return 1
+
+    merger = InventoryMerger(config)
+    all_errors = []
+    for source in args.sources:
+        try:
+            input_format = args.format or detect_format(source)
+            print(f"📄 Reading {source} ({input_format})...")
+            _, errors = import_inventory(config, source, input_format, merger)
+        except (OSError, InventoryError, ValueError) as e:
+            print(f"❌ Could not import {source}: {e}")
+            return 1
+        all_errors.extend(errors)
+    merger.finish()
+
+    for error in all_errors:
+        print(f"   ⚠️  {error}")
+    print(f"✅ Added: {merger.added}  Updated: {merger.updated}  Unchanged: {merger.unchanged}  Skipped: {len(all_errors)}")
+    print(f"📋 Fleet size: {merger.num_pcs} PCs")
+
+    if args.dry_run:
+        print("ℹ️  Dry run - configuration not written")
+    else:
+        with open(config_path, 'w') as f:
+            config.write(f)
+        print(f"💾 Configuration saved to: {config_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Minimal MQTT Broker
+A small MQTT 3.1.1 broker for trying the MQTT transport on a bench or in
+local tests without installing Mosquitto. It keeps everything in memory and
+accepts any credentials, so use a real broker for deployments.
+
+Supported: QoS 0/1 (QoS 2 is acknowledged and delivered at QoS 1), retained
+messages, + and # wildcards, last will messages and keep-alive timeouts.
+"""
+
+import argparse
+import asyncio
+import logging
+import struct
+
+# MQTT control packet types
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+PROTOCOL_LEVEL = 4  # MQTT 3.1.1
+CONNACK_UNACCEPTABLE_PROTOCOL = 1
+
+logger = logging.getLogger("mqtt_broker")
+
+
+def topic_matches(topic_filter, topic):
+    """Whether a topic matches a subscription filter with + and # wildcards"""
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    # Wildcards never match topics starting with $ (broker internals)
+    if topic.startswith('$') and filter_levels[0] in ('+', '#'):
+        return False
+    for index, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if index >= len(topic_levels) or (level != '+' and level != topic_levels[index]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def encode_string(value):
+    data = value.encode('utf-8') if isinstance(value, str) else value
+    return struct.pack('!H', len(data)) + data
+
+
+def encode_packet(packet_type, flags, body):
+    """Fixed header (type, flags, variable length) followed by the body"""
+    length = len(body)
+    header = bytearray([(packet_type << 4) | flags])
+    while True:
+        byte, length = length % 128, length // 128
+        header.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(header) + body
+
+
+class PacketReader:
+    """Sequential reader over the variable header and payload of a packet"""
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def remaining(self):
+        return len(self.data) - self.offset
+
+    def byte(self):
+        self.offset += 1
+        return self.data[self.offset - 1]
+
+    def uint16(self):
+        self.offset += 2
+        return struct.unpack_from('!H', self.data, self.offset - 2)[0]
+
+    def binary(self):
+        length = self.uint16()
+        self.offset += length
+        return self.data[self.offset - length:self.offset]
+
+    def string(self):
+        return self.binary().decode('utf-8')
+
+    def rest(self):
+        rest = self.data[self.offset:]
+        self.offset = len(self.data)
+        return rest
+
+
+class Session:
+    """One connected client"""
+
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.client_id = None
+        self.keepalive = 0
+        self.will = None
+        self.subscriptions = {}
+        self.next_packet_id = 0
+
+    def send(self, packet_type, flags=0, body=b''):
+        if not self.writer.is_closing():
+            self.writer.write(encode_packet(packet_type, flags, body))
+
+    def deliver(self, topic, payload, qos, retain=False):
+        """Forward a message at the given QoS (capped at 1)"""
+        qos = min(qos, 1)
+        body = encode_string(topic)
+        if qos:
+            self.next_packet_id = self.next_packet_id % 0xFFFF + 1
+            body += struct.pack('!H', self.next_packet_id)
+        self.send(PUBLISH, (qos << 1) | int(retain), body + payload)
+
+    async def read_packet(self):
+        """Return (type, flags, body) of the next packet"""
+        timeout = self.keepalive * 1.5 if self.keepalive else None
+        first = await asyncio.wait_for(self.reader.readexactly(1), timeout)
+        length, multiplier = 0, 1
+        while True:
+            byte = (await self.reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        body = await self.reader.readexactly(length) if length else b''
+        return first[0] >> 4, first[0] & 0x0F, body
+
+    async def run(self):
+        clean_exit = False
+        try:
+            packet_type, _, body = await asyncio.wait_for(self.read_packet(), 10)
+            if packet_type != CONNECT or not self.handle_connect(PacketReader(body)):
+                return
+            while True:
+                packet_type, flags, body = await self.read_packet()
+                if packet_type == DISCONNECT:
+                    clean_exit = True
+                    return
+                self.handle(packet_type, flags, PacketReader(body))
+                await self.writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, struct.error,
+                IndexError, UnicodeDecodeError):
+            pass
+        finally:
+            self.broker.disconnect(self, publish_will=not clean_exit)
+            self.writer.close()
+
+    def handle_connect(self, packet):
+        protocol, level = packet.string(), packet.byte()
+        if protocol != 'MQTT' or level != PROTOCOL_LEVEL:
+            self.send(CONNACK, body=bytes([0, CONNACK_UNACCEPTABLE_PROTOCOL]))
+            return False
+        flags = packet.byte()
+        self.keepalive = packet.uint16()
+        self.client_id = packet.string() or f"anonymous-{id(self):x}"
+        if flags & 0x04:
+            will_topic, will_payload = packet.string(), packet.binary()
+            self.will = (will_topic, will_payload, (flags >> 3) & 0x03, bool(flags & 0x20))
+        # Username and password (flags 0x80 / 0x40) are accepted unchecked
+        self.broker.connect(self)
+        self.send(CONNACK, body=bytes([0, 0]))
+        logger.info(f"Client {self.client_id} connected")
+        return True
+
+    def handle(self, packet_type, flags, packet):
+        if packet_type == PUBLISH:
+            qos, retain = (flags >> 1) & 0x03, bool(flags & 0x01)
+            topic = packet.string()
+            packet_id = packet.uint16() if qos else None
+            self.broker.publish(topic, packet.rest(), qos, retain)
+            if qos == 1:
+                self.send(PUBACK, body=struct.pack('!H', packet_id))
+            elif qos == 2:
+                self.send(PUBREC, body=struct.pack('!H', packet_id))
+        elif packet_type == PUBREL:
+            self.send(PUBCOMP, body=struct.pack('!H', packet.uint16()))
+        elif packet_type == SUBSCRIBE:
+            packet_id = packet.uint16()
+            filters = []
+            while packet.remaining():
+                topic_filter, qos = packet.string(), packet.byte() & 0x03
+                self.subscriptions[topic_filter] = min(qos, 1)
+                filters.append(topic_filter)
+            granted = bytes(self.subscriptions[topic_filter] for topic_filter in filters)
+            self.send(SUBACK, body=struct.pack('!H', packet_id) + granted)
+            for topic_filter in filters:
+                self.broker.send_retained(self, topic_filter)
+        elif packet_type == UNSUBSCRIBE:
+            packet_id = packet.uint16()
+            while packet.remaining():
+                self.subscriptions.pop(packet.string(), None)
+            self.send(UNSUBACK, body=struct.pack('!H', packet_id))
+        elif packet_type == PINGREQ:
+            self.send(PINGRESP)
+        # PUBACK / PUBREC / PUBCOMP for messages we sent need no bookkeeping
+
+
+class Broker:
+    """Routes messages between sessions and keeps retained messages"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.retained = {}
+
+    def connect(self, session):
+        # A second connection with the same client id takes over the session
+        previous = self.sessions.get(session.client_id)
+        if previous is not None:
+            previous.will = None
+            previous.writer.close()
+        self.sessions[session.client_id] = session
+
+    def disconnect(self, session, publish_will):
+        if self.sessions.get(session.client_id) is session:
+            del self.sessions[session.client_id]
+            logger.info(f"Client {session.client_id} disconnected")
+        if publish_will and session.will:
+            self.publish(*session.will)
+
+    def publish(self, topic, payload, qos, retain):
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                self.retained.pop(topic, None)
+        for session in list(self.sessions.values()):
+            granted = [sub_qos for topic_filter, sub_qos in session.subscriptions.items()
+                       if topic_matches(topic_filter, topic)]
+            if granted:
+                session.deliver(topic, payload, min(qos, max(granted)))
+
+    def send_retained(self, session, topic_filter):
+        for topic, (payload, qos) in self.retained.items():
+            if topic_matches(topic_filter, topic):
+                session.deliver(topic, payload, min(qos, session.subscriptions[topic_filter]), retain=True)
+
+    async def handle_client(self, reader, writer):
+        await Session(self, reader, writer).run()
+
+
+async def serve(host, port):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle_client, host, port)
+    logger.info(f"MQTT broker listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimal MQTT broker for local testing")
+    parser.add_argument("--host", default="0.0.0.0", help="Listen address (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=1883, help="Listen port (default: 1883)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Broker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - PC Folder Sync
+Pushes every generated PC folder to the target directory configured for it
+([PCn] sync_target: a mounted share or a local staging folder per host).
+Changed files are sent as rsync-style deltas against block checksums of
+the previous copy, so redeploying a small template fix moves kilobytes.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+# Let "python scripts/sync_pcs.py" resolve the scripts package from the project root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scripts.import_inventory import load_deployment_config  # noqa: E402
+
+ADLER_MOD = 65521
+MIN_BLOCK_SIZE = 512
+MAX_BLOCK_SIZE = 16384
+# Bytes a block reference costs on the wire (index and length), as in rsync
+COPY_TOKEN_SIZE = 8
+# Per-deployment record of what was last pushed to each host
+STATE_DIR = '.sync'
+DEFAULT_WORKERS = 4
+
+
+def block_size_for(length):
+    """rsync's heuristic: blocks of about sqrt(length) bytes, clamped"""
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, int(math.sqrt(length)) // 8 * 8))
+
+
+def strong_checksum(block):
+    return hashlib.blake2b(block, digest_size=16).hexdigest()
+
+
+def block_signatures(data, block_size):
+    """[(weak, strong)] per block; the weak sum is Adler-32 so it can be rolled"""
+    return [(zlib.adler32(data[offset:offset + block_size]), strong_checksum(data[offset:offset + block_size]))
+            for offset in range(0, len(data), block_size)]
+
+
+def compute_delta(data, signatures, block_size, old_size):
+    """Instructions rebuilding data from the old file
+
+    Returns a list of ('copy', block index) and ('data', literal bytes).
+    A window of block_size bytes rolls through data one byte at a time;
+    whenever its weak and then strong checksum match an old block, the
+    block is referenced instead of sent and the window jumps past it.
+    """
+    full_blocks = old_size // block_size
+    index = {}
+    for number, (weak, strong) in enumerate(signatures[:full_blocks]):
+        index.setdefault(weak, []).append((strong, number))
+
+    ops = []
+    length = len(data)
+    literal_start = pos = 0
+    weak = None
+    while pos + block_size <= length:
+        if weak is None:
+            weak = zlib.adler32(data[pos:pos + block_size])
+            a, b = weak & 0xFFFF, weak >> 16
+        candidates = index.get(weak)
+        if candidates:
+            strong = strong_checksum(data[pos:pos + block_size])
+            match = next((number for block_strong, number in candidates if block_strong == strong), None)
+            if match is not None:
+                if literal_start < pos:
+                    ops.append(('data', data[literal_start:pos]))
+                ops.append(('copy', match))
+                pos += block_size
+                literal_start = pos
+                weak = None
+                continue
+        if pos + block_size < length:
+            # Roll the window one byte: drop data[pos], take in data[pos + block_size]
+            out_byte, in_byte = data[pos], data[pos + block_size]
+            a = (a - out_byte + in_byte) % ADLER_MOD
+            b = (b - block_size * out_byte + a - 1) % ADLER_MOD
+            weak = (b << 16) | a
+        pos += 1
+
+    # The old file's short last block can only match the very end
+    tail_size = old_size - full_blocks * block_size
+    tail_start = length - tail_size
+    if tail_size and tail_start >= literal_start and signatures[-1] == (
+            zlib.adler32(data[tail_start:]), strong_checksum(data[tail_start:])):
+        if literal_start < tail_start:
+            ops.append(('data', data[literal_start:tail_start]))
+        ops.append(('copy', len(signatures) - 1))
+    elif literal_start < length:
+        ops.append(('data', data[literal_start:]))
+    return ops
+
+
+def apply_delta(old_data, ops, block_size):
+    """Rebuild the new file from the old one and the delta instructions"""
+    return b''.join(old_data[value * block_size:(value + 1) * block_size] if op == 'copy' else value
+                    for op, value in ops)
+
+
+def delta_size(ops):
+    """Bytes the delta moves: literal data plus one token per block reference"""
+    return sum(COPY_TOKEN_SIZE if op == 'copy' else len(value) for op, value in ops)
+
+
+def format_bytes(count):
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+class SyncReport:
+    """What one folder sync changed and how many bytes it moved"""
+
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self.files = 0
+        self.changed = 0
+        self.deleted = 0
+        self.total_bytes = 0
+        self.sent_bytes = 0
+        self.seconds = 0.0
+
+    def summary(self):
+        saved = 100 - 100 * self.sent_bytes / self.total_bytes if self.total_bytes else 100
+        return (f"{self.changed}/{self.files} files changed, {self.deleted} deleted, "
+                f"{format_bytes(self.sent_bytes)} sent of {format_bytes(self.total_bytes)} "
+                f"({saved:.1f}% saved) in {self.seconds:.1f}s")
+
+
+def write_file(path, data, mode):
+    """Replace path atomically so a PC never sees a half-written file"""
+    temp_path = path.with_name(f".{path.name}.sync-tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.chmod(temp_path, mode)
+    os.replace(temp_path, path)
+
+
+def sync_folder(source_dir, target_dir, state_file, name=None):
+    """Push source_dir into target_dir, sending only changed blocks
+
+    state_file records the size, mtime and block signatures of every file
+    last written to the target. A target file that still matches its
+    record is trusted, so unchanged files are skipped without reading the
+    target and changed ones reuse the stored signatures. Files this sync
+    wrote earlier are deleted when they disappear from the source; other
+    files in the target are left alone.
+    """
+    started = time.monotonic()
+    source_dir, target_dir, state_file = Path(source_dir), Path(target_dir), Path(state_file)
+    report = SyncReport(name or source_dir.name, str(target_dir))
+    try:
+        state = json.loads(state_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        state = {}
+    if state.get('target') != str(target_dir):
+        state = {'target': str(target_dir), 'files': {}}
+    records = state['files']
+
+    sources = sorted(path for path in source_dir.rglob('*') if path.is_file())
+    for source in sources:
+        relative = source.relative_to(source_dir).as_posix()
+        target = target_dir / relative
+        data = source.read_bytes()
+        mode = source.stat().st_mode & 0o777
+        digest = hashlib.sha256(data).hexdigest()
+        report.files += 1
+        report.total_bytes += len(data)
+
+        record = records.get(relative)
+        try:
+            target_stat = target.stat()
+        except FileNotFoundError:
+            target_stat = None
+        trusted = (record is not None and target_stat is not None
+                   and [target_stat.st_size, target_stat.st_mtime_ns] == [record['size'], record['mtime_ns']])
+        if trusted and record['sha256'] == digest:
+            if target_stat.st_mode & 0o777 != mode:
+                os.chmod(target, mode)
+            continue
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target_stat is None:
+            write_file(target, data, mode)
+            report.changed += 1
+            report.sent_bytes += len(data)
+        else:
+            old_data = target.read_bytes()
+            if hashlib.sha256(old_data).hexdigest() == digest:
+                # Already identical (e.g. copied by hand): only record it
+                if target_stat.st_mode & 0o777 != mode:
+                    os.chmod(target, mode)
+            else:
+                if trusted:
+                    block_size = record['block_size']
+                    signatures = [tuple(signature) for signature in record['blocks']]
+                else:
+                    block_size = block_size_for(len(old_data))
+                    signatures = block_signatures(old_data, block_size)
+                ops = compute_delta(data, signatures, block_size, len(old_data))
+                rebuilt = apply_delta(old_data, ops, block_size)
+                if hashlib.sha256(rebuilt).hexdigest() != digest:
+                    # Stale record or checksum collision: fall back to the full file
+                    rebuilt, ops = data, [('data', data)]
+                write_file(target, rebuilt, mode)
+                report.changed += 1
+                report.sent_bytes += delta_size(ops)
+
+        block_size = block_size_for(len(data))
+        target_stat = target.stat()
+        records[relative] = {
+            'size': target_stat.st_size,
+            'mtime_ns': target_stat.st_mtime_ns,
+            'sha256': digest,
+            'block_size': block_size,
+            'blocks': block_signatures(data, block_size),
+        }
+
+    current = {source.relative_to(source_dir).as_posix() for source in sources}
+    for relative in sorted(set(records) - current):
+        try:
+            (target_dir / relative).unlink()
+            report.deleted += 1
+        except FileNotFoundError:
+            pass
+        del records[relative]
+
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state_file.write_text(json.dumps(state), encoding='utf-8')
+    report.seconds = time.monotonic() - started
+    return report
+
+
+def get_sync_jobs(config, deploy_dir, pc_nums=None):
+    """(name, source folder, target folder, state file) for PCs with a sync_target"""
+    deploy_dir = Path(deploy_dir)
+    num_pcs = int(config.get('GENERAL', 'num_pcs', fallback='0'))
+    jobs = []
+    for pc_num in pc_nums if pc_nums is not None else range(1, num_pcs + 1):
+        section = f'PC{pc_num}'
+        if section not in config or not config[section].get('sync_target', '').strip():
+            continue
+        name = config[section]['name'].lower()
+        jobs.append((name, deploy_dir / name, Path(config[section]['sync_target'].strip()),
+                     deploy_dir / STATE_DIR / f"{name}.json"))
+    return jobs
+
+
+def sync_all(jobs, workers=DEFAULT_WORKERS, log=print):
+    """Run the sync jobs concurrently, logging each host as it finishes
+
+    Returns (reports, failures) where failures maps a host to its error.
+    """
+    reports, failures = [], {}
+    if not jobs:
+        return reports, failures
+    log(f"🔄 Syncing {len(jobs)} PC folder(s) with {min(workers, len(jobs))} worker(s)...")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(sync_folder, source, target, state, name): (name, target)
+                   for name, source, target, state in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            name, target = futures[future]
+            try:
+                report = future.result()
+            except OSError as e:
+                failures[name] = str(e)
+                log(f"   ❌ [{done}/{len(jobs)}] {name} → {target}: {e}")
+                continue
+            reports.append(report)
+            log(f"   ✅ [{done}/{len(jobs)}] {name} → {target}: {report.summary()}")
+
+    sent = sum(report.sent_bytes for report in reports)
+    total = sum(report.total_bytes for report in reports)
+    changed = sum(report.changed for report in reports)
+    log(f"📊 Synced {len(reports)}/{len(jobs)} PCs: {changed} files changed, "
+        f"{format_bytes(sent)} sent of {format_bytes(total)}")
+    return reports, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push generated PC folders to their sync_target folders")
+    parser.add_argument("--config", default="config.ini", help="Configuration file (default: config.ini)")
+    parser.add_argument("--only", help="Comma separated PC sections to sync, e.g. PC3,PC7")
+    parser.add_argument("--workers", type=int, help="Hosts synced at once (default: [GENERAL] sync_workers)")
+    args = parser.parse_args()
+
+    config, config_path = load_deployment_config(args.config)
+    deploy_dir = Path(config.get('GENERAL', 'deployment_path'))
+    pc_nums = None
+    if args.only:
+        sections = [section.strip().upper() for section in args.only.split(',') if section.strip()]
+        if not all(section.startswith('PC') and section[2:].isdigit() for section in sections):
+            parser.error("--only expects PC sections such as PC3,PC7")
+        pc_nums = [int(section[2:]) for section in sections]
+    jobs = get_sync_jobs(config, deploy_dir, pc_nums)
+    if not jobs:
+        print(f"ℹ️  No PC in {config_path} has a sync_target - nothing to sync")
+        return 0
+    workers = args.workers or int(config.get('GENERAL', 'sync_workers', fallback=str(DEFAULT_WORKERS)))
+    _, failures = sync_all(jobs, workers)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
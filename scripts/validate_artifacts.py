@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Artifact Validation
+Checks the files the template generator wrote before they reach a PC or the
+ESP32: the firmware YAML must parse, every agent must compile and the batch
+launchers must not contain text cmd.exe would misread. Checks run in a
+process pool and results are cached by content hash, so only artifacts that
+changed since the last run are checked again.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import yaml
+except ImportError:  # PyYAML ships with ESPHome; without it the YAML check is skipped
+    yaml = None
+
+# Bump when a check changes so cached results are not trusted any more
+VALIDATOR_VERSION = 1
+CACHE_FILE = '.validation_cache.json'
+ARTIFACT_KINDS = {'.yaml': 'yaml', '.py': 'python', '.pyz': 'pyz', '.bat': 'batch'}
+# Deployment files that are inputs rather than generated artifacts
+SKIPPED_FILES = ('secrets.yaml',)
+# Every PC folder holds <name>_shutdown.py or .pyz; shared folders such as wheelhouse/ do not
+AGENT_FILE_PATTERN = '*_shutdown.py*'
+
+# Template fields an f-string left unrendered, e.g. {pc_name} or {{
+PLACEHOLDER_PATTERN = re.compile(r"\{\{|\}\}|\{[A-Za-z_][\w.\[\]'\"]*\}")
+# %% %1 %* %~dp0 %VAR% %VAR:a=b%: every other % is eaten by cmd.exe
+BATCH_VARIABLE_PATTERN = re.compile(r'%%|%\d|%\*|%~[a-zA-Z$:]*\d|%[A-Za-z_][\w#$\'()*+,\-.?@\[\]`{}~]*(?::[^%]*)?%')
+BATCH_QUOTED_PATTERN = re.compile(r'"[^"]*"')
+BATCH_REDIRECT_PATTERN = re.compile(r'\d?>&\d|\d?>>?\s*(?:"[^"]*"|[^\s"&|<>()]+)|<\s*(?:"[^"]*"|[^\s"&|<>()]+)')
+BATCH_TEXT_COMMANDS = ('echo', 'echo.', 'title')
+
+
+class ArtifactValidationError(RuntimeError):
+    """Raised when generated artifacts fail validation"""
+
+
+if yaml is not None:
+    class ESPHomeLoader(yaml.SafeLoader):
+        """SafeLoader that accepts ESPHome's tags and rejects duplicate keys like ESPHome does"""
+
+        def construct_mapping(self, node, deep=False):
+            seen = set()
+            for key_node, _ in node.value:
+                key = self.construct_object(key_node, deep=deep)
+                if isinstance(key, str) and key in seen:
+                    raise yaml.constructor.ConstructorError(
+                        None, None, f"duplicate key {key!r}", key_node.start_mark)
+                seen.add(key)
+            return super().construct_mapping(node, deep=deep)
+
+    def construct_esphome_tag(loader, suffix, node):
+        """!secret, !lambda, !include, ... carry plain scalars, lists or mappings"""
+        if isinstance(node, yaml.MappingNode):
+            return loader.construct_mapping(node)
+        if isinstance(node, yaml.SequenceNode):
+            return loader.construct_sequence(node)
+        return loader.construct_scalar(node)
+
+    ESPHomeLoader.add_multi_constructor('!', construct_esphome_tag)
+
+
+def artifact_kind(path):
+    """Check applied to a generated file, or None when it is not checked"""
+    path = Path(path)
+    if path.name in SKIPPED_FILES:
+        return None
+    return ARTIFACT_KINDS.get(path.suffix)
+
+
+def check_yaml(text):
+    try:
+        document = yaml.load(text, Loader=ESPHomeLoader)
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        problem = getattr(e, 'problem', None) or str(e)
+        return [f"line {mark.line + 1}: {problem}" if mark else problem]
+    if not isinstance(document, dict):
+        return ["top level is not a mapping of ESPHome components"]
+    return []
+
+
+def check_python(source, filename):
+    try:
+        compile(source, filename, 'exec', dont_inherit=True)
+    except SyntaxError as e:
+        return [f"line {e.lineno}: {e.msg}"]
+    except ValueError as e:
+        return [str(e)]
+    return []
+
+
+def check_pyz(data, filename):
+    """A bundle must be a zip archive whose __main__.py compiles"""
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            source = archive.read('__main__.py')
+    except KeyError:
+        return ["no __main__.py in the bundle"]
+    except zipfile.BadZipFile as e:
+        return [f"not a zip archive: {e}"]
+    return check_python(source, f"{filename}/__main__.py")
+
+
+def check_batch(text):
+    """Lint a batch file for generated text cmd.exe would misread
+
+    Outside double quotes, & | < > in echo / title text start a new command
+    or a redirection, ) in such text closes the surrounding if ( ) block and
+    a % that is not a variable reference is silently dropped. Names and
+    other values substituted into the templates must be quoted or escaped
+    with ^ (%% for percent signs).
+    """
+    problems = []
+    depth = 0
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if PLACEHOLDER_PATTERN.search(line):
+            problems.append(f"line {number}: unrendered template field {PLACEHOLDER_PATTERN.search(line).group()}")
+        lowered = stripped.lower()
+        if not stripped or lowered == 'rem' or lowered.startswith(('rem ', '::', ':')):
+            continue
+
+        if stripped.count('"') % 2:
+            problems.append(f"line {number}: unbalanced double quote")
+        unquoted = re.sub(r'\^.', '', BATCH_QUOTED_PATTERN.sub('', stripped))
+        if '%' in BATCH_VARIABLE_PATTERN.sub('', unquoted):
+            problems.append(f"line {number}: stray % is dropped by cmd (write %% for a percent sign)")
+
+        command = lowered.split(None, 1)[0] if lowered.split() else ''
+        if command.lstrip('@') in BATCH_TEXT_COMMANDS:
+            text_part = BATCH_REDIRECT_PATTERN.sub('', unquoted)
+            special = sorted(set(re.findall(r'[&|<>]', text_part)))
+            if special:
+                problems.append(f"line {number}: unescaped {' '.join(special)} in {command} text (escape with ^)")
+            if depth and ')' in text_part:
+                problems.append(f"line {number}: unescaped ) in {command} text closes the enclosing block")
+
+        if stripped.startswith(')'):
+            depth = max(0, depth - 1)
+        if stripped.endswith('('):
+            depth += 1
+    return problems
+
+
+def check_artifact(kind, name, data):
+    """Problems found in one artifact; runs in a worker process"""
+    if kind == 'pyz':
+        return check_pyz(data, name)
+    text = data.decode('utf-8', errors='replace')
+    if kind == 'yaml':
+        return check_yaml(text)
+    if kind == 'python':
+        return check_python(data, name)
+    return check_batch(text)
+
+
+class ValidationReport:
+    """Which artifacts were checked, taken from the cache or skipped, and their problems"""
+
+    def __init__(self):
+        self.checked = 0
+        self.cached = 0
+        self.skipped = []
+        self.problems = {}
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def summary(self):
+        total = self.checked + self.cached
+        result = (f"{len(self.problems)} of {total} artifacts have problems" if self.problems
+                  else f"all {total} artifacts passed")
+        return f"{result} ({self.checked} checked, {self.cached} cached) in {self.seconds:.1f}s"
+
+
+def collect_artifacts(deploy_dir, pc_folders=None, include_yaml=True):
+    """Relative paths of the checkable files in the deployment
+
+    pc_folders limits the PC folders searched (all of them by default);
+    the firmware YAML at the top level is included unless include_yaml is off.
+    """
+    deploy_dir = Path(deploy_dir)
+    paths = []
+    if include_yaml:
+        paths += [path for path in sorted(deploy_dir.glob('*.yaml')) if artifact_kind(path)]
+    if pc_folders is None:
+        pc_folders = [path.name for path in sorted(deploy_dir.iterdir())
+                      if path.is_dir() and any(path.glob(AGENT_FILE_PATTERN))]
+    for folder in pc_folders:
+        folder = deploy_dir / folder
+        if folder.is_dir():
+            paths += [path for path in sorted(folder.iterdir()) if path.is_file() and artifact_kind(path)]
+    return [path.relative_to(deploy_dir).as_posix() for path in paths]
+
+
+def load_cache(cache_file):
+    try:
+        cache = json.loads(Path(cache_file).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    expected = {'version': VALIDATOR_VERSION, 'python': f"{sys.version_info.major}.{sys.version_info.minor}"}
+    if {key: cache.get(key) for key in expected} != expected:
+        return {}
+    return cache.get('artifacts', {})
+
+
+def validate_artifacts(deploy_dir, paths, workers=None, cache_file=None):
+    """Check the given deployment files, reusing cached results of unchanged ones
+
+    Results are stored per file with the SHA-256 of the content they were
+    computed from. Python syntax depends on the interpreter, so the cache
+    is also tied to the running Python version.
+    """
+    started = time.monotonic()
+    deploy_dir = Path(deploy_dir)
+    cache_file = Path(cache_file) if cache_file else deploy_dir / CACHE_FILE
+    cache = load_cache(cache_file)
+    report = ValidationReport()
+
+    pending = []
+    for relative in paths:
+        kind = artifact_kind(relative)
+        if kind == 'yaml' and yaml is None:
+            report.skipped.append(relative)
+            continue
+        data = (deploy_dir / relative).read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        entry = cache.get(relative)
+        if entry and entry['sha256'] == digest:
+            report.cached += 1
+            if entry['problems']:
+                report.problems[relative] = entry['problems']
+            continue
+        pending.append((relative, kind, data, digest))
+
+    if pending:
+        kinds = [kind for _, kind, _, _ in pending]
+        names = [relative for relative, _, _, _ in pending]
+        contents = [data for _, _, data, _ in pending]
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(check_artifact, kinds, names, contents))
+        else:
+            results = list(map(check_artifact, kinds, names, contents))
+        for (relative, kind, _, digest), problems in zip(pending, results):
+            report.checked += 1
+            cache[relative] = {'sha256': digest, 'problems': problems}
+            if problems:
+                report.problems[relative] = problems
+
+    # Forget files that no longer exist so the cache does not grow forever
+    cache = {relative: entry for relative, entry in cache.items() if (deploy_dir / relative).exists()}
+    cache_file.write_text(json.dumps({
+        'version': VALIDATOR_VERSION,
+        'python': f"{sys.version_info.major}.{sys.version_info.minor}",
+        'artifacts': cache,
+    }, indent=1) + '\n', encoding='utf-8')
+    report.seconds = time.monotonic() - started
+    return report
+
+
+def print_report(report, log=print):
+    for relative in report.skipped:
+        log(f"   ⚠️  Skipped {relative}: install PyYAML (pip install pyyaml) to check the firmware YAML")
+    for relative, problems in sorted(report.problems.items()):
+        for problem in problems:
+            log(f"   ❌ {relative}: {problem}")
+    log(f"   {'✅' if report.ok else '❌'} Validation: {report.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the generated firmware YAML, agents and batch files")
+    parser.add_argument("deployment", help="Deployment folder written by template_generator.py")
+    parser.add_argument("--pcs", help="Comma separated PC folders to check (default: all)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="Check every artifact again")
+    args = parser.parse_args()
+
+    deploy_dir = Path(args.deployment)
+    if not deploy_dir.is_dir():
+        parser.error(f"not a folder: {deploy_dir}")
+    if args.no_cache:
+        (deploy_dir / CACHE_FILE).unlink(missing_ok=True)
+    pc_folders = [folder.strip() for folder in args.pcs.split(',') if folder.strip()] if args.pcs else None
+    paths = collect_artifacts(deploy_dir, pc_folders)
+    print(f"🔍 Validating {len(paths)} artifacts in {deploy_dir}...")
+    report = validate_artifacts(deploy_dir, paths, args.workers)
+    print_report(report)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+ESP32 PC Controller - Offline Wheelhouse
+Downloads the PC agent's dependencies once per deployment into a shared
+wheelhouse and gives every PC folder the wheels for its operating system,
+so the launchers can install offline and only when the bundled set changes.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+# pip --platform tags per agent OS; pip also accepts the older compatible tags
+WHEEL_PLATFORMS = {
+    'windows': ('win_amd64',),
+    'linux': ('manylinux2014_x86_64', 'manylinux2014_aarch64'),
+    'macos': ('macosx_11_0_arm64', 'macosx_11_0_x86_64'),
+}
+# Dependencies behind environment markers that pip cannot evaluate for a
+# foreign platform (click needs colorama on Windows)
+PLATFORM_PACKAGES = {'windows': ('colorama',)}
+DEFAULT_PYTHON_VERSIONS = ('3.10', '3.11', '3.12', '3.13')
+
+MANIFEST_FILE = 'manifest.json'
+REQUIREMENTS_FILE = 'requirements.txt'
+MARKER_FILE = 'wheelhouse.marker'
+PYTHON_VERSION_PATTERN = re.compile(r'^3\.\d+$')
+
+
+class WheelhouseError(RuntimeError):
+    """Raised when the wheels cannot be downloaded"""
+
+
+def wheel_os(filename):
+    """Agent OS a wheel is built for, or None for a pure Python wheel"""
+    platform = filename[:-len('.whl')].split('-')[-1]
+    if platform == 'any':
+        return None
+    if platform.startswith('win'):
+        return 'windows'
+    if platform.startswith('macosx'):
+        return 'macos'
+    return 'linux' if 'linux' in platform else platform
+
+
+def list_wheels(wheelhouse_dir):
+    return sorted(path.name for path in Path(wheelhouse_dir).glob('*.whl'))
+
+
+def select_wheels(wheelhouse_dir, pc_os):
+    """Wheels a PC running pc_os needs: pure Python ones plus its platform's"""
+    return [name for name in list_wheels(wheelhouse_dir) if wheel_os(name) in (None, pc_os)]
+
+
+def build_wheelhouse(wheelhouse_dir, packages, os_names, python_versions):
+    """Download wheels for every OS / Python version into one shared folder
+
+    Wheels land in a single directory so a wheel shared by several platforms
+    or Python versions is stored once. A manifest of the inputs lets repeat
+    generations reuse the folder without touching the network.
+    Returns True when the wheels were downloaded, False when reused.
+    """
+    wheelhouse_dir = Path(wheelhouse_dir)
+    manifest = {
+        'packages': sorted(packages),
+        'os': sorted(os_names),
+        'python': sorted(python_versions),
+    }
+    manifest_path = wheelhouse_dir / MANIFEST_FILE
+    if manifest_path.exists():
+        try:
+            cached = json.loads(manifest_path.read_text(encoding='utf-8'))
+        except ValueError:
+            cached = {}
+        wheels = cached.pop('wheels', [])
+        if cached == manifest and wheels and all((wheelhouse_dir / name).exists() for name in wheels):
+            return False
+
+    wheelhouse_dir.mkdir(parents=True, exist_ok=True)
+    for pc_os in manifest['os']:
+        requested = manifest['packages'] + list(PLATFORM_PACKAGES.get(pc_os, ()))
+        # One run per platform: pip picks a single wheel per package for each run
+        for platform in WHEEL_PLATFORMS[pc_os]:
+            for python_version in manifest['python']:
+                command = [sys.executable, '-m', 'pip', 'download', '--quiet', '--disable-pip-version-check',
+                           '--only-binary=:all:', '--implementation', 'cp', '--platform', platform,
+                           '--python-version', python_version, '--dest', str(wheelhouse_dir)]
+                result = subprocess.run(command + requested, capture_output=True, text=True)
+                if result.returncode != 0:
+                    detail = (result.stderr or result.stdout).strip().splitlines()
+                    raise WheelhouseError(f"pip download failed for {platform} / Python {python_version}: "
+                                          f"{detail[-1] if detail else 'exit code ' + str(result.returncode)}")
+
+    manifest['wheels'] = list_wheels(wheelhouse_dir)
+    manifest_path.write_text(json.dumps(manifest, indent=2) + '\n', encoding='utf-8')
+    return True
+
+
+def get_marker(wheels, packages):
+    """Version marker for a PC's wheel set; launchers reinstall when it changes"""
+    digest = hashlib.sha256()
+    for line in sorted(packages) + sorted(wheels):
+        digest.update(line.encode('utf-8') + b'\n')
+    return digest.hexdigest()[:16]
+
+
+def populate_pc_wheels(wheelhouse_dir, pc_wheels_dir, pc_os, packages):
+    """Link a PC's wheels from the shared wheelhouse and write its marker
+
+    Wheels are hard-linked so every PC folder shares one copy on disk, with
+    a plain copy where links are not supported. Returns the marker.
+    """
+    wheelhouse_dir = Path(wheelhouse_dir)
+    pc_wheels_dir = Path(pc_wheels_dir)
+    pc_wheels_dir.mkdir(parents=True, exist_ok=True)
+    wheels = select_wheels(wheelhouse_dir, pc_os)
+
+    for stale in pc_wheels_dir.glob('*.whl'):
+        if stale.name not in wheels:
+            stale.unlink()
+    for name in wheels:
+        source, target = wheelhouse_dir / name, pc_wheels_dir / name
+        if target.exists():
+            if os.path.samefile(source, target):
+                continue
+            target.unlink()
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+    requirements = sorted(packages) + sorted(PLATFORM_PACKAGES.get(pc_os, ()))
+    (pc_wheels_dir / REQUIREMENTS_FILE).write_text('\n'.join(requirements) + '\n', encoding='utf-8')
+    marker = get_marker(wheels, requirements)
+    (pc_wheels_dir / MARKER_FILE).write_text(marker + '\n', encoding='utf-8')
+    return marker
+
+
+def parse_python_versions(value):
+    """Split a comma separated list of Python versions such as 3.11,3.12"""
+    return [version.strip() for version in value.split(',') if version.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the PC agent's wheels for offline installs")
+    parser.add_argument("dest", help="Wheelhouse folder to fill")
+    parser.add_argument("packages", nargs="*", default=['flask', 'requests'],
+                        help="Packages to download (default: flask requests)")
+    parser.add_argument("--os", dest="os_names", default=','.join(WHEEL_PLATFORMS),
+                        help="Comma separated agent operating systems (default: all)")
+    parser.add_argument("--python", default=','.join(DEFAULT_PYTHON_VERSIONS),
+                        help=f"Comma separated Python versions (default: {','.join(DEFAULT_PYTHON_VERSIONS)})")
+    args = parser.parse_args()
+
+    os_names = [name.strip() for name in args.os_names.split(',') if name.strip()]
+    unknown = [name for name in os_names if name not in WHEEL_PLATFORMS]
+    if unknown:
+        parser.error(f"unknown OS {', '.join(unknown)} (known: {', '.join(WHEEL_PLATFORMS)})")
+    python_versions = parse_python_versions(args.python)
+    if not all(PYTHON_VERSION_PATTERN.match(version) for version in python_versions):
+        parser.error("--python expects versions like 3.12")
+
+    try:
+        downloaded = build_wheelhouse(args.dest, args.packages, os_names, python_versions)
+    except WheelhouseError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    wheels = list_wheels(args.dest)
+    print(f"{'✅ Downloaded' if downloaded else '♻️  Reused'} {len(wheels)} wheels in {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,100 @@ Creates organized deployment folders for each PC with all necessary files
 """
 
 import os
+import argparse
 import configparser
 import shutil
+import sys
+import time
 from pathlib import Path
 
+from board_profiles import DEFAULT_BOARD, allocate_button_pins, get_board_profile
+from button_banks import SHIFT_CONTROL_PINS, i2c_frequency, load_banks, parse_bank_pin, uses_i2c
+from config_schema import (
+    CONFIG_VERSION,
+    POWER_ACTIONS,
+    OLED_MODELS,
+    OS_POWER_ACTIONS,
+    PC_OPERATING_SYSTEMS,
+    ConfigSchemaError,
+    get_esp32_network,
+    is_remote_subnet,
+    migrate_config,
+    validate_config,
+)
+from scripts.agent_bundle import (
+    BUNDLE_SUFFIX,
+    AgentBundleError,
+    build_bundle,
+    bytecode_tag,
+    prepare_dependencies,
+)
+from scripts.generate_api_key import (
+    ensure_secrets,
+    generate_agent_key,
+    generate_api_key,
+    generate_fallback_password,
+    read_secrets_file,
+)
+from scripts.import_inventory import normalize_mac
+from scripts.build_firmware import FIRMWARE_YAML, build_all
+from scripts.sync_pcs import DEFAULT_WORKERS, get_sync_jobs, sync_all
+from scripts.validate_artifacts import (
+    ArtifactValidationError,
+    collect_artifacts,
+    print_report,
+    validate_artifacts,
+)
+from scripts.wheelhouse import (
+    WheelhouseError,
+    build_wheelhouse,
+    parse_python_versions,
+    populate_pc_wheels,
+)
+
+BUTTON_KEYS = ('on_button_gpio', 'off_button_gpio')
+DISPLAY_ROW_HEIGHT = 10
+# Where the Linux/macOS service installers copy each PC's agent folder
+AGENT_INSTALL_DIRS = {'linux': '/opt/pc-controller', 'macos': '/usr/local/pc-controller'}
+# pip package -> import name for the PC agent's dependencies
+AGENT_PACKAGES = {'flask': 'flask', 'requests': 'requests', 'paho-mqtt': 'paho.mqtt.client'}
+# Artifact types that can be regenerated on their own; the YAML always covers every PC
+ARTIFACTS = ('yaml', 'agent', 'launcher', 'readme')
+# Exit codes of the command line interface (argparse usage errors exit with 2)
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INVALID_CONFIG = 3
+EXIT_SYNC_FAILED = 4
+EXIT_INVALID_ARTIFACTS = 5
+EXIT_BUILD_FAILED = 6
+
+
+class PCSelectionError(ValueError):
+    """Raised when --only / --exclude name a PC that is not configured"""
+
+
 class TemplateGenerator:
     def __init__(self, config_file="config.ini"):
         self.config = configparser.ConfigParser()
         self.config.read(config_file)
+        if 'GENERAL' in self.config:
+            # Older base configs are upgraded in memory; the template is never rewritten
+            migrate_config(self.config)
         self.script_dir = Path(__file__).parent
         self.base_config_file = config_file
+        self.wheelhouse_dir = None
+        self.agent_bundle_dir = None
+        
+    def generate_all(self, only=None, exclude=None, artifacts=ARTIFACTS, validate=True):
+        """Generate deployment files
         
-    def generate_all(self):
-        """Generate all deployment files"""
+        only / exclude select PCs by section (PC3) or name, and artifacts
+        limits which files are written, so changing one PC only regenerates
+        that PC. Without them the whole deployment is generated. The written
+        artifacts are validated afterwards unless validate is off.
+        Returns the numbers of the regenerated PCs.
+        """
         print("ESP32 PC Controller Template Generator")
         print("=" * 50)
         
@@ -29,14 +110,31 @@ class TemplateGenerator:
         deploy_config_path = Path(deployment_path) / "config.ini"
         if deploy_config_path.exists():
             print(f"📋 Using existing config from: {deploy_config_path}")
+            self.upgrade_config_file(deploy_config_path)
             self.config.read(deploy_config_path)
-            # Re-read values from deployment config
+            # Re-read values from deployment config, keeping the folder being generated
+            # (e.g. set by --output) for the build and sync steps that follow
+            self.config['GENERAL']['deployment_path'] = deployment_path
             num_pcs = int(self.config.get('GENERAL', 'num_pcs'))
         else:
             print(f"📋 Using base config from: {self.base_config_file}")
         
+        # Validate everything up front so a bad PC entry fails before any file is written
+        warnings = []
+        errors = validate_config(self.config, warnings)
+        if errors:
+            raise ConfigSchemaError(errors)
+        for warning in warnings:
+            print(f"⚠️  {warning}")
+        self.assign_button_pins(num_pcs)
+        pc_nums = self.select_pcs(num_pcs, only, exclude)
+        selective = only is not None or exclude is not None or set(artifacts) != set(ARTIFACTS)
+        
         print(f"Number of PCs: {num_pcs}")
         print(f"Deployment path: {deployment_path}")
+        if selective:
+            print(f"Regenerating: {', '.join(f'PC{pc_num}' for pc_num in pc_nums) or 'no PCs'} "
+                  f"({', '.join(artifact for artifact in ARTIFACTS if artifact in artifacts)})")
         print()
         
         # Create main deployment directory
@@ -44,33 +142,143 @@ class TemplateGenerator:
         
         # Backup existing deployment if it exists
         if deploy_dir.exists() and any(deploy_dir.iterdir()):
-            import time
             backup_dir = Path(f"{deployment_path}_backup_{int(time.time())}")
             print(f"📦 Backing up existing deployment to: {backup_dir}")
-            shutil.copytree(deploy_dir, backup_dir)
+            if selective:
+                self.backup_selection(deploy_dir, backup_dir, pc_nums, artifacts)
+            else:
+                shutil.copytree(deploy_dir, backup_dir)
         
         deploy_dir.mkdir(parents=True, exist_ok=True)
         
         # Copy config file to deployment folder for user editing
         self.copy_config_to_deployment(deploy_dir)
         
+        # Generate every missing secret in one pass
+        print("🔑 Checking deployment secrets...")
+        secrets_path, created = self.generate_secrets(deploy_dir)
+        for name in created:
+            print(f"   ✅ Generated secret: {name}")
+        print(f"   ✅ Secrets file: {secrets_path}")
+        
         # Generate ESP32 YAML file
-        self.generate_esp32_yaml(deploy_dir)
+        if 'yaml' in artifacts:
+            self.generate_esp32_yaml(deploy_dir)
         
-        # Generate PC folders and files
-        for pc_num in range(1, num_pcs + 1):
-            self.generate_pc_folder(deploy_dir, pc_num)
+        pc_artifacts = [artifact for artifact in artifacts if artifact != 'yaml']
+        if pc_nums and pc_artifacts:
+            # Install the agent's dependencies or wheels once for every PC folder to share
+            self.prepare_agent_bundle(deploy_dir)
+            self.prepare_wheelhouse(deploy_dir, num_pcs)
+        
+            # Generate PC folders and files
+            for pc_num in pc_nums:
+                self.generate_pc_folder(deploy_dir, pc_num, pc_artifacts)
             
+        if validate:
+            self.validate_deployment(deploy_dir, pc_nums if pc_artifacts else [], 'yaml' in artifacts)
+        
         success_msg = "Deployment complete!"
         config_tip = f"Edit {deployment_path}/config.ini for further customization"
         print(f"\n✅ {success_msg}")
         print(f"📁 Files created in: {deployment_path}")
         print(f"🔧 {config_tip}")
         print("� The oriiginal config.ini in development/ remains as a clean template")
+        return pc_nums
+        
+    def select_pcs(self, num_pcs, only=None, exclude=None):
+        """PC numbers picked by --only / --exclude, matched by section or PC name"""
+        sections = {}
+        for pc_num in range(1, num_pcs + 1):
+            pc_section = f'PC{pc_num}'
+            if pc_section in self.config:
+                sections[pc_section.lower()] = pc_num
+                sections[self.config[pc_section]['name'].lower()] = pc_num
+        
+        def resolve(selectors):
+            unknown = [selector for selector in selectors if selector.lower() not in sections]
+            if unknown:
+                raise PCSelectionError(f"Unknown PC(s): {', '.join(unknown)} "
+                                       f"(configured: PC1-PC{num_pcs} or their names)")
+            return {sections[selector.lower()] for selector in selectors}
+        
+        selected = resolve(only) if only is not None else set(sections.values())
+        if exclude:
+            selected -= resolve(exclude)
+        return sorted(selected)
+        
+    def validate_deployment(self, deploy_dir, pc_nums, include_yaml):
+        """Check the regenerated artifacts; unchanged ones are answered from the cache"""
+        pc_folders = [self.config[f'PC{pc_num}']['name'].lower() for pc_num in pc_nums]
+        paths = collect_artifacts(deploy_dir, pc_folders, include_yaml)
+        print(f"\n🔍 Validating {len(paths)} generated artifacts...")
+        report = validate_artifacts(deploy_dir, paths)
+        print_report(report)
+        if not report.ok:
+            raise ArtifactValidationError(f"{len(report.problems)} generated artifact(s) failed validation")
+        
+    def backup_selection(self, deploy_dir, backup_dir, pc_nums, artifacts):
+        """Back up only what a selective run overwrites: the YAML and the chosen PC folders"""
+        backup_dir.mkdir(parents=True)
+        yaml_file = deploy_dir / "pc_controller.yaml"
+        if 'yaml' in artifacts and yaml_file.exists():
+            shutil.copy2(yaml_file, backup_dir / yaml_file.name)
+        if any(artifact != 'yaml' for artifact in artifacts):
+            for pc_num in pc_nums:
+                pc_folder = deploy_dir / self.config[f'PC{pc_num}']['name'].lower()
+                if pc_folder.exists():
+                    shutil.copytree(pc_folder, backup_dir / pc_folder.name)
+        
+    def prepare_wheelhouse(self, deploy_dir, num_pcs):
+        """Build the shared offline wheelhouse when [GENERAL] wheelhouse is on
+        
+        A failed download only costs the offline install: the launchers fall
+        back to installing from the internet when a PC folder has no wheels.
+        """
+        self.wheelhouse_dir = None
+        if self.agent_bundle_dir or not self.config.getboolean('GENERAL', 'wheelhouse', fallback=False):
+            # .pyz bundles already carry their dependencies
+            return
+        os_names = {self.get_pc_os(dict(self.config[f'PC{pc_num}']))
+                    for pc_num in range(1, num_pcs + 1) if f'PC{pc_num}' in self.config}
+        python_versions = parse_python_versions(self.config.get('GENERAL', 'wheelhouse_python', fallback='3.12'))
+        wheelhouse_dir = deploy_dir / "wheelhouse"
+        print("📦 Preparing offline wheelhouse...")
+        try:
+            downloaded = build_wheelhouse(wheelhouse_dir, self.get_agent_packages(), os_names, python_versions)
+        except (WheelhouseError, OSError) as e:
+            print(f"   ⚠️  {e}")
+            print("   ⚠️  PC launchers will install their dependencies online instead")
+            return
+        action = "Downloaded wheels for" if downloaded else "Reusing wheels for"
+        print(f"   ✅ {action} {', '.join(sorted(os_names))} (Python {', '.join(python_versions)}): {wheelhouse_dir}")
+        self.wheelhouse_dir = wheelhouse_dir
+        
+    def prepare_agent_bundle(self, deploy_dir):
+        """Install the shared dependencies for .pyz agents when agent_format = pyz
+        
+        If they cannot be installed the PCs get the loose script instead, so
+        a generation without internet access still produces working folders.
+        """
+        self.agent_bundle_dir = None
+        if self.config.get('GENERAL', 'agent_format', fallback='script').strip().lower() != 'pyz':
+            return
+        bundle_dir = deploy_dir / "agent_bundle"
+        packages = self.get_agent_packages()
+        print("📦 Preparing agent bundle dependencies...")
+        try:
+            installed = prepare_dependencies(bundle_dir, packages, [AGENT_PACKAGES[package] for package in packages])
+        except (AgentBundleError, OSError) as e:
+            print(f"   ⚠️  {e}")
+            print("   ⚠️  PC folders will contain the agent script instead of a .pyz bundle")
+            return
+        action = "Installed" if installed else "Reusing"
+        print(f"   ✅ {action} {', '.join(packages)} with bytecode for Python {bytecode_tag()}: {bundle_dir}")
+        self.agent_bundle_dir = bundle_dir
         
     def copy_config_to_deployment(self, deploy_dir):
         """Copy config.ini to deployment folder for user editing (only if it doesn't exist)"""
-        source_config = Path("config.ini")
+        source_config = Path(self.base_config_file)
         dest_config = deploy_dir / "config.ini"
         
         if dest_config.exists():
@@ -88,6 +296,69 @@ class TemplateGenerator:
         # Always create/update deployment README
         self.create_deployment_readme(deploy_dir)
             
+    def generate_secrets(self, deploy_dir=None):
+        """Create every missing deployment secret in <deployment>/secrets.yaml
+        
+        Covers the ESPHome API key, the fallback hotspot password, one agent
+        key per PC using request signing and the MQTT password if needed. Existing entries are never replaced.
+        Returns the secrets file path and the names that were added.
+        """
+        if deploy_dir is None:
+            deploy_dir = self.resolve_deployment_dir()
+        deploy_dir = Path(deploy_dir)
+        
+        required = {
+            'api_key': generate_api_key,
+            'fallback_password': generate_fallback_password,
+        }
+        num_pcs = int(self.config.get('GENERAL', 'num_pcs'))
+        for pc_num in range(1, num_pcs + 1):
+            pc_section = f'PC{pc_num}'
+            if pc_section in self.config:
+                pc_config = dict(self.config[pc_section])
+                if self.get_agent_auth(pc_config) == 'hmac':
+                    # Adopt keys already deployed to PCs by earlier generator runs
+                    key_file = deploy_dir / pc_config['name'].lower() / "agent_key.txt"
+                    if key_file.exists():
+                        required[self.get_agent_key_secret(pc_config)] = key_file.read_text().strip()
+                    else:
+                        required[self.get_agent_key_secret(pc_config)] = generate_agent_key
+        mqtt = self.get_mqtt_config()
+        if mqtt and mqtt['username']:
+            required['mqtt_password'] = generate_fallback_password
+        
+        secrets_path = deploy_dir / "secrets.yaml"
+        created = ensure_secrets(secrets_path, required)
+        self.secrets = read_secrets_file(secrets_path)
+        return secrets_path, created
+        
+    def resolve_deployment_dir(self):
+        """Return the deployment folder, switching to its config.ini if present"""
+        deployment_path = self.config.get('GENERAL', 'deployment_path')
+        deploy_config_path = Path(deployment_path) / "config.ini"
+        if deploy_config_path.exists():
+            self.upgrade_config_file(deploy_config_path)
+            self.config.read(deploy_config_path)
+        return Path(deployment_path)
+        
+    def upgrade_config_file(self, config_path):
+        """Migrate a config.ini on disk to the current schema version
+        
+        The previous file is kept as config.ini.v<old>.bak since configparser
+        does not preserve comments. Returns the versions migrated from.
+        """
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        applied = migrate_config(config)
+        if applied:
+            config_path = Path(config_path)
+            backup_path = config_path.with_name(f"{config_path.name}.v{applied[0]}.bak")
+            shutil.copy2(config_path, backup_path)
+            with open(config_path, 'w') as f:
+                config.write(f)
+            print(f"⬆️  Upgraded {config_path} to config version {CONFIG_VERSION} (previous copy: {backup_path.name})")
+        return applied
+        
     def create_deployment_readme(self, deploy_dir):
         """Create README for the deployment folder"""
         readme_content = '''# ESP32 PC Controller - Deployment Package
@@ -98,12 +369,14 @@ This folder contains your customized ESP32 PC controller deployment.
 
 - config.ini - Your configuration file (EDIT THIS for customization)
 - pc_controller.yaml - ESP32 firmware configuration  
+- secrets.yaml - Generated ESPHome secrets (KEEP PRIVATE, add WiFi credentials)
 - pc1/, pc2/, etc. - Individual PC folders with scripts
 
 ## Customization
 
 1. Edit config.ini in this folder to customize:
    - PC names, MAC addresses, IP addresses
+   - ESP32 board (button pins set to auto are allocated for it)
    - ESP32 network settings
    - GPIO pin assignments
 
@@ -160,8 +433,12 @@ Generated by ESP32 PC Controller Template Generator
                 substitutions.append(f'  pc{pc_num}_name: "{pc_config["name"]}"')
                 substitutions.append(f'  pc{pc_num}_mac: "{pc_config["mac_address"]}"')
                 substitutions.append(f'  pc{pc_num}_ip: "{pc_config["ip_address"]}"')
-                substitutions.append(f'  pc{pc_num}_on_button_gpio: "{pc_config["on_button_gpio"]}"')
-                substitutions.append(f'  pc{pc_num}_off_button_gpio: "{pc_config["off_button_gpio"]}"')
+                if self.has_buttons(pc_config):
+                    for key in BUTTON_KEYS:
+                        if parse_bank_pin(pc_config[key]) is None:
+                            substitutions.append(f'  pc{pc_num}_{key}: "{pc_config[key]}"')
+                if self.get_agent_auth(pc_config) == 'hmac':
+                    substitutions.append(f'  pc{pc_num}_agent_key: !secret {self.get_agent_key_secret(pc_config)}')
                 substitutions.append('')
         
         # Generate YAML content
@@ -176,8 +453,29 @@ Generated by ESP32 PC Controller Template Generator
         os.chmod(yaml_file, 0o644)
         print(f"   ✅ Created: {yaml_file}")
         
-    def generate_pc_folder(self, deploy_dir, pc_num):
-        """Generate folder and files for a specific PC"""
+        # Request signing helper included by the YAML lambdas
+        if self.uses_agent_auth(num_pcs):
+            header_file = deploy_dir / "agent_auth.h"
+            with open(header_file, 'w') as f:
+                f.write(self.get_agent_auth_header_template())
+            os.chmod(header_file, 0o644)
+            print(f"   ✅ Created: {header_file}")
+        
+        # Status LED colour helper
+        display = self.get_display_config()
+        if display and display['type'] == 'ws2812':
+            header_file = deploy_dir / "status_leds.h"
+            with open(header_file, 'w') as f:
+                f.write(self.get_status_leds_header_template())
+            os.chmod(header_file, 0o644)
+            print(f"   ✅ Created: {header_file}")
+        
+    def generate_pc_folder(self, deploy_dir, pc_num, artifacts=ARTIFACTS):
+        """Generate folder and files for a specific PC
+        
+        artifacts picks the agent (script or bundle and its key files), the
+        launcher (service files and wheels) and/or the README.
+        """
         pc_section = f'PC{pc_num}'
         if pc_section not in self.config:
             print(f"   ⚠️  No configuration found for PC{pc_num}, skipping...")
@@ -192,113 +490,884 @@ Generated by ESP32 PC Controller Template Generator
         pc_folder = deploy_dir / pc_config['name'].lower()
         pc_folder.mkdir(exist_ok=True)
         
-        # Generate Python shutdown script
-        python_script = self.get_python_script_template(pc_num, pc_config, esp32_ip)
-        python_file = pc_folder / f"{pc_config['name'].lower()}_shutdown.py"
-        with open(python_file, 'w') as f:
-            f.write(python_script)
-        print(f"   ✅ Created: {python_file}")
-        
-        # Generate run batch file
-        run_batch = self.get_run_batch_template(pc_num, pc_config, esp32_ip)
-        run_file = pc_folder / f"run_{pc_config['name'].lower()}.bat"
-        with open(run_file, 'w') as f:
-            f.write(run_batch)
-        os.chmod(run_file, 0o755)  # Make executable
-        print(f"   ✅ Created: {run_file}")
-        
-        # Generate service installer batch file
-        service_batch = self.get_service_batch_template(pc_num, pc_config)
-        service_file = pc_folder / f"install_{pc_config['name'].lower()}_service.bat"
-        with open(service_file, 'w') as f:
-            f.write(service_batch)
-        os.chmod(service_file, 0o755)  # Make executable
-        print(f"   ✅ Created: {service_file}")
+        # The agent reads its signing key from the same secrets.yaml entry
+        if 'agent' in artifacts and self.get_agent_auth(pc_config) == 'hmac':
+            key_file = pc_folder / "agent_key.txt"
+            fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.secrets[self.get_agent_key_secret(pc_config)] + '\n')
+            os.chmod(key_file, 0o600)
+            print(f"   ✅ Created: {key_file}")
+        
+        mqtt = self.get_mqtt_config()
+        if 'agent' in artifacts and mqtt and mqtt['username']:
+            password_file = pc_folder / "mqtt_password.txt"
+            fd = os.open(password_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.secrets['mqtt_password'] + '\n')
+            os.chmod(password_file, 0o600)
+            print(f"   ✅ Created: {password_file}")
+        
+        # Offline dependencies for the launchers, linked from the shared wheelhouse
+        pc_wheels_dir = pc_folder / "wheels"
+        if 'launcher' in artifacts and self.wheelhouse_dir and not self.agent_bundle_dir:
+            marker = populate_pc_wheels(self.wheelhouse_dir, pc_wheels_dir, self.get_pc_os(pc_config),
+                                        self.get_agent_packages())
+            print(f"   ✅ Linked wheels: {pc_wheels_dir} (marker {marker})")
+        elif 'launcher' in artifacts and pc_wheels_dir.exists():
+            # Stale wheels would otherwise pin the launcher to an old dependency set
+            shutil.rmtree(pc_wheels_dir)
+        
+        # Generate Python shutdown script, bundled with its dependencies for pyz
+        if 'agent' in artifacts:
+            python_script = self.get_python_script_template(pc_num, pc_config, esp32_ip)
+            python_file = pc_folder / self.get_agent_file(pc_config)
+            if self.agent_bundle_dir:
+                build_bundle(python_script, self.agent_bundle_dir, python_file)
+            else:
+                with open(python_file, 'w') as f:
+                    f.write(python_script)
+            # Drop the agent left over from the other format so launchers stay unambiguous
+            for stale in (python_file.with_suffix('.py'), python_file.with_suffix(BUNDLE_SUFFIX)):
+                if stale != python_file and stale.exists():
+                    stale.unlink()
+            print(f"   ✅ Created: {python_file}")
+        
+        # Launcher and auto-start files for the PC's operating system
+        if 'launcher' in artifacts:
+            for filename, content, mode in self.get_service_files(pc_num, pc_config, esp32_ip):
+                service_file = pc_folder / filename
+                # Shell scripts and unit files must keep LF endings when generated on Windows
+                with open(service_file, 'w', newline=None if filename.endswith('.bat') else '\n') as f:
+                    f.write(content)
+                os.chmod(service_file, mode)
+                print(f"   ✅ Created: {service_file}")
         
         # Generate README for this PC
-        readme_content = self.get_pc_readme_template(pc_num, pc_config, esp32_ip)
-        readme_file = pc_folder / "README.txt"
-        with open(readme_file, 'w') as f:
-            f.write(readme_content)
-        print(f"   ✅ Created: {readme_file}")
+        if 'readme' in artifacts:
+            readme_content = self.get_pc_readme_template(pc_num, pc_config, esp32_ip)
+            readme_file = pc_folder / "README.txt"
+            with open(readme_file, 'w') as f:
+                f.write(readme_content)
+            print(f"   ✅ Created: {readme_file}")
+        
+    def get_board_profile(self):
+        """Board profile for the configured [ESP32] board"""
+        board = self.config.get('ESP32', 'board', fallback=DEFAULT_BOARD)
+        profile = get_board_profile(board)
+        if profile is None:
+            raise ValueError(f"Unknown ESP32 board: {board}")
+        return profile
+
+    def assign_button_pins(self, num_pcs):
+        """Replace 'auto' pins with free, boot-safe pins for the board
+        
+        Bus pins for button banks are resolved first. PC buttons then fill
+        the expander inputs before native GPIOs; explicit pins are kept, and
+        PCs left over once everything is taken fall back to web control only.
+        """
+        profile = self.get_board_profile()
+        banks = load_banks(self.config)
+        
+        # Collect every pin already spoken for
+        auto_keys = {}
+        used = []
+        for pc_num in range(1, num_pcs + 1):
+            pc_section = f'PC{pc_num}'
+            if pc_section not in self.config:
+                continue
+            for key in BUTTON_KEYS:
+                pin = self.config[pc_section].get(key, '').strip()
+                if pin.lower() == 'auto':
+                    auto_keys.setdefault(pc_section, []).append(key)
+                else:
+                    used.append(pin.upper())
+        
+        bus_pins = []
+        display = self.get_display_config()
+        if self.needs_i2c(banks):
+            for key, default in zip(('i2c_sda', 'i2c_scl'), profile['i2c_pins']):
+                bus_pins.append(('ESP32', key, f'GPIO{default}'))
+        for section, bank in banks.items():
+            if bank['spec']['bus'] == 'shift':
+                bus_pins.extend((section, key, None) for key in SHIFT_CONTROL_PINS)
+        for section, key, default in bus_pins:
+            pin = self.config[section].get(key, 'auto').strip()
+            if pin.lower() != 'auto':
+                used.append(pin.upper())
+        if display and display['type'] == 'ws2812':
+            used.append(display['pin'].upper())
+        for section, key, default in bus_pins:
+            if self.config[section].get(key, 'auto').strip().lower() != 'auto':
+                continue
+            if default is None or default in used:
+                free = allocate_button_pins(profile, 1, used)
+                if not free:
+                    raise ValueError(f"No free GPIO left for {section} {key} on {profile['title']}")
+                default = free[0]
+            self.config[section][key] = default
+            used.append(default)
+        
+        # Expander inputs first, then whatever native pins remain
+        pins = [f'{section}:{index}' for section, bank in banks.items()
+                for index in range(bank['inputs']) if f'{section}:{index}' not in used]
+        needed = sum(len(keys) for keys in auto_keys.values())
+        pins += allocate_button_pins(profile, max(needed - len(pins), 0), used)
+        for pc_section, keys in auto_keys.items():
+            if len(pins) < len(keys):
+                # A PC needs both buttons; never leave one half wired
+                for key in keys:
+                    self.config[pc_section][key] = 'none'
+                print(f"⚠️  No free button pins left for {pc_section} on {profile['title']} - web control only")
+                continue
+            for key in keys:
+                used.append(pins[0])
+                self.config[pc_section][key] = pins.pop(0)
+        
+        # The LED strip takes a pin last so adding it never moves button wiring
+        if display and display['type'] == 'ws2812' and display['pin'].lower() == 'auto':
+            free = allocate_button_pins(profile, 1, used)
+            if not free:
+                raise ValueError(f"No free GPIO left for the status LEDs on {profile['title']}; set [DISPLAY] pin")
+            self.config['DISPLAY']['pin'] = free[0]
+
+    def get_button_pin_yaml(self, pc_num, key, pin, banks):
+        """The pin: block of a button binary sensor and its debounce time"""
+        bank_pin = parse_bank_pin(pin)
+        if bank_pin is None:
+            debounce = self.config.get('GENERAL', 'button_debounce', fallback='50ms')
+            return f'''      number: ${{pc{pc_num}_{key}}}
+      mode:
+        input: true
+        pullup: true
+      inverted: true''', debounce
+        
+        bank = banks[bank_pin[0]]
+        spec = bank['spec']
+        lines = [f"      {spec['pin_key']}: {bank['id']}", f"      number: {bank_pin[1]}"]
+        if spec['pin_key'] != 'sn74hc165':
+            lines += ["      mode:", "        input: true"]
+            if spec['pullup']:
+                lines.append("        pullup: true")
+        lines.append("      inverted: true")
+        return '\n'.join(lines), bank['debounce']
+
+    def needs_i2c(self, banks):
+        """Whether button banks or an OLED display use the I2C bus"""
+        display = self.get_display_config()
+        return uses_i2c(banks) or bool(display and display['type'] == 'ssd1306')
+
+    def get_display_config(self):
+        """The [DISPLAY] settings, or None when no status display is fitted"""
+        display_type = self.config.get('DISPLAY', 'type', fallback='none').strip().lower()
+        if display_type == 'none':
+            return None
+        display = dict(self.config['DISPLAY'])
+        model = display.get('model', 'SSD1306 128x64')
+        return {
+            'type': display_type,
+            'model': model,
+            'rows': OLED_MODELS.get(model, 64) // DISPLAY_ROW_HEIGHT,
+            'address': display.get('address', '0x3C'),
+            'pin': display.get('pin', 'auto'),
+            'brightness': display.get('brightness', '50%'),
+            'page_interval': display.get('page_interval', '5s'),
+        }
+
+    def get_status_display_hook(self, index, display):
+        """on_value actions that redraw only this PC's part of the display"""
+        if display is None:
+            return ''
+        if display['type'] == 'ws2812':
+            return f'''
+    on_value:
+      - lambda: |-
+          auto *leds = (light::AddressableLight *) id(status_leds).get_output();
+          (*leds)[{index}] = status_led_color(x);
+          leds->schedule_show();'''
+        rows = display['rows']
+        return f'''
+    on_value:
+      - lambda: |-
+          if (id(display_page) == {index // rows}) {{
+            id(display_dirty) |= 1u << {index % rows};
+            id(status_display).update();
+          }}'''
+
+    def get_status_display_yaml(self, display, pc_sections):
+        """Display, light and paging sections for the optional status display"""
+        if display is None:
+            return ''
+        count = len(pc_sections)
+        if display['type'] == 'ws2812':
+            # neopixelbus needs the Arduino framework; esp-idf boards use the RMT driver
+            if self.get_board_profile()['framework'] == 'arduino':
+                driver = '''  - platform: neopixelbus
+    type: GRB
+    variant: WS2812'''
+            else:
+                driver = '''  - platform: esp32_rmt_led_strip
+    chipset: ws2812
+    rgb_order: GRB'''
+            return f'''# One status LED per PC, written only when that PC's status changes
+light:
+{driver}
+    id: status_leds
+    name: "Status LEDs"
+    pin: {display['pin']}
+    num_leds: {count}
+    default_transition_length: 0s
+    restore_mode: ALWAYS_ON
+    color_correct: [{display['brightness']}, {display['brightness']}, {display['brightness']}]
+
+'''
         
+        rows = display['rows']
+        sensors = ', '.join(f"id({self.config.get(section, 'name').lower()}_status)" for section in pc_sections)
+        names = ', '.join(f'"${{pc{section[2:]}_name}}"' for section in pc_sections)
+        paging = ''
+        if count > rows:
+            paging = f'''
+# Rotate pages when there are more PCs than display rows
+interval:
+  - interval: {display['page_interval']}
+    then:
+      - lambda: |-
+          id(display_page) = (id(display_page) + 1) % {(count + rows - 1) // rows};
+          id(display_dirty) = 0xFFFFFFFF;
+          id(status_display).update();
+'''
+        return f'''# Status display: redrawn only when a PC status changes, and only the
+# rows marked dirty by that change are cleared and drawn again
+font:
+  - file: "gfonts://Roboto Mono"
+    id: status_font
+    size: {DISPLAY_ROW_HEIGHT - 1}
+
+display:
+  - platform: ssd1306_i2c
+    id: status_display
+    model: "{display['model']}"
+    address: {display['address']}
+    update_interval: never
+    auto_clear_enabled: false
+    lambda: |-
+      text_sensor::TextSensor *const sensors[] = {{{sensors}}};
+      const char *const names[] = {{{names}}};
+      const int first = id(display_page) * {rows};
+      for (int row = 0; row < {rows}; row++) {{
+        if (!(id(display_dirty) & (1u << row)))
+          continue;
+        it.filled_rectangle(0, row * {DISPLAY_ROW_HEIGHT}, it.get_width(), {DISPLAY_ROW_HEIGHT}, COLOR_OFF);
+        const int index = first + row;
+        if (index < {count}) {{
+          it.print(0, row * {DISPLAY_ROW_HEIGHT}, id(status_font), names[index]);
+          it.print(it.get_width(), row * {DISPLAY_ROW_HEIGHT}, id(status_font), TextAlign::TOP_RIGHT,
+                   sensors[index]->state.c_str());
+        }}
+      }}
+      id(display_dirty) = 0;
+{paging}
+'''
+
+    def get_status_leds_header_template(self):
+        """Generate the C++ helper mapping PC status text to an LED colour"""
+        return '''// Status LED colours for ESPHome lambdas
+// Generated by ESP32 PC Controller Template Generator
+#pragma once
+
+#include <string>
+#include "esphome/core/color.h"
+
+// Green when online, red on failures, amber while an action is pending
+inline esphome::Color status_led_color(const std::string &state) {
+  if (state == "Online")
+    return esphome::Color(0, 255, 0);
+  if (state.find("failed") != std::string::npos || state.find("error") != std::string::npos ||
+      state.find("stopped") != std::string::npos)
+    return esphome::Color(255, 0, 0);
+  if (state.find("...") != std::string::npos || state.find("in progress") != std::string::npos ||
+      state.find("sent") != std::string::npos)
+    return esphome::Color(255, 140, 0);
+  if (state.find("cancelled") != std::string::npos || state == "Cancelled")
+    return esphome::Color(0, 0, 255);
+  return esphome::Color(32, 32, 32);
+}
+'''
+
+    def get_button_banks_yaml(self, banks):
+        """I2C bus and expander / shift register hub sections for button banks"""
+        if not banks and not self.needs_i2c(banks):
+            return ''
+        sections = []
+        if self.needs_i2c(banks):
+            sections.append(f'''# I2C bus shared by the button expanders and display
+i2c:
+  sda: {self.config.get('ESP32', 'i2c_sda')}
+  scl: {self.config.get('ESP32', 'i2c_scl')}
+  frequency: {i2c_frequency(banks)}
+  scan: false''')
+        
+        hubs = {}
+        for bank in banks.values():
+            spec = bank['spec']
+            entry = [f"  - id: {bank['id']}"]
+            if spec['bus'] == 'i2c':
+                entry.append(f"    address: {bank['address']}")
+                if spec['component'] == 'pcf8574':
+                    entry.append(f"    pcf8575: {'true' if bank['type'] == 'pcf8575' else 'false'}")
+            else:
+                entry += [f"    {key}: {bank['pins'][key]}" for key in SHIFT_CONTROL_PINS]
+                entry.append(f"    sr_count: {bank['chips']}")
+            hubs.setdefault(spec['component'], []).append('\n'.join(entry))
+        for component, entries in hubs.items():
+            sections.append(f"# Button bank{'s' if len(entries) > 1 else ''}\n{component}:\n" + '\n'.join(entries))
+        return '\n\n'.join(sections) + '\n\n'
+
+    def get_pc_setting(self, pc_config, key, default):
+        """Read a per-PC setting, falling back to [GENERAL] and then the default"""
+        return pc_config.get(key, self.config.get('GENERAL', key, fallback=default))
+
+    def has_buttons(self, pc_config):
+        """Whether a PC has physical ON/OFF buttons wired to the ESP32"""
+        return all(pc_config.get(key, '').strip().lower() not in ('', 'none')
+                   for key in BUTTON_KEYS)
+
+    def get_shutdown_delay(self, pc_config):
+        """Countdown seconds for a PC, falling back to the GENERAL default"""
+        delay = int(self.get_pc_setting(pc_config, 'shutdown_delay', '5'))
+        if delay < 0:
+            raise ValueError(f"shutdown_delay for {pc_config['name']} must not be negative")
+        return delay
+
+    def get_power_actions(self, pc_config):
+        """Enabled power actions for a PC, always including shutdown"""
+        value = self.get_pc_setting(pc_config, 'power_actions', ','.join(POWER_ACTIONS))
+        actions = [action.strip().lower() for action in value.split(',') if action.strip()]
+        unknown = [action for action in actions if action not in POWER_ACTIONS]
+        if unknown:
+            raise ValueError(f"Unknown power_actions for {pc_config['name']}: {', '.join(unknown)}")
+        # Actions the PC's OS has no command for get neither a button nor an agent command
+        supported = OS_POWER_ACTIONS[self.get_pc_os(pc_config)]
+        actions = [action for action in actions if action in supported]
+        if 'shutdown' not in actions:
+            actions.insert(0, 'shutdown')
+        return actions
+
+    def get_rate_limit(self, pc_config):
+        """Token bucket (requests per minute, burst) for a PC agent"""
+        per_minute = float(self.get_pc_setting(pc_config, 'agent_rate_limit', '6'))
+        burst = int(self.get_pc_setting(pc_config, 'agent_rate_burst', '3'))
+        if per_minute <= 0 or burst < 1:
+            raise ValueError(f"agent_rate_limit/agent_rate_burst for {pc_config['name']} must be positive")
+        return per_minute, burst
+
+    def get_agent_auth(self, pc_config):
+        """Request authentication mode for a PC agent ('hmac' or 'none')"""
+        mode = self.get_pc_setting(pc_config, 'agent_auth', 'none').strip().lower()
+        if mode not in ('hmac', 'none'):
+            raise ValueError(f"agent_auth for {pc_config['name']} must be 'hmac' or 'none'")
+        return mode
+
+    def get_agent_key_secret(self, pc_config):
+        """ESPHome secret name holding a PC's agent signing key"""
+        return f"{pc_config['name'].lower()}_agent_key"
+
+    def get_mqtt_config(self):
+        """MQTT broker settings, or None when the HTTP transport is used"""
+        if self.config.get('GENERAL', 'transport', fallback='http').strip().lower() != 'mqtt':
+            return None
+        mqtt = self.config['MQTT']
+        return {
+            'broker': mqtt.get('broker', '').strip(),
+            'port': int(mqtt.get('port', '1883')),
+            'username': mqtt.get('username', '').strip(),
+            'topic_prefix': mqtt.get('topic_prefix', 'pc_controller').strip(),
+        }
+
+    def get_mqtt_topic(self, mqtt, pc_config, kind):
+        """Per-PC topic: <prefix>/<pc name>/<command|result|status|availability>"""
+        return f"{mqtt['topic_prefix']}/{pc_config['name'].lower()}/{kind}"
+
+    def get_wol_relay(self, pc_num, pc_config):
+        """(number, config) of the PC relaying this PC's wakes, or None to wake it directly
+
+        Only PCs outside the ESP32's subnet go through their wol_relay: the
+        ESP32's own broadcast reaches every PC on its subnet, and a relay
+        never wakes itself.
+        """
+        relay = self.get_pc_setting(pc_config, 'wol_relay', '').strip().lower()
+        if relay in ('', 'none') or not is_remote_subnet(get_esp32_network(self.config), pc_config['ip_address']):
+            return None
+        for relay_num in range(1, int(self.config.get('GENERAL', 'num_pcs')) + 1):
+            relay_section = f'PC{relay_num}'
+            if relay_section in self.config and self.config[relay_section]['name'].lower() == relay:
+                return None if relay_num == pc_num else (relay_num, dict(self.config[relay_section]))
+        raise ValueError(f"wol_relay for {pc_config['name']} is not the name of a configured PC")
+
+    def get_relayed_pcs(self, relay_num):
+        """[(number, config)] of the PCs whose wakes the given PC relays"""
+        relayed = []
+        for pc_num in range(1, int(self.config.get('GENERAL', 'num_pcs')) + 1):
+            pc_section = f'PC{pc_num}'
+            if pc_section in self.config:
+                pc_config = dict(self.config[pc_section])
+                relay = self.get_wol_relay(pc_num, pc_config)
+                if relay and relay[0] == relay_num:
+                    relayed.append((pc_num, pc_config))
+        return relayed
+
+    def get_agent_file(self, pc_config):
+        """File name of a PC's agent: the script, or its .pyz bundle"""
+        suffix = BUNDLE_SUFFIX if self.agent_bundle_dir else '.py'
+        return f"{pc_config['name'].lower()}_shutdown{suffix}"
+
+    def get_agent_packages(self):
+        """pip packages the PC agent needs for the configured transport"""
+        packages = ['flask', 'requests']
+        if self.get_mqtt_config():
+            packages.append('paho-mqtt')
+        return packages
+
+    def uses_agent_auth(self, num_pcs):
+        """Whether any configured PC requires signed requests"""
+        for pc_num in range(1, num_pcs + 1):
+            pc_section = f'PC{pc_num}'
+            if pc_section in self.config and self.get_agent_auth(dict(self.config[pc_section])) == 'hmac':
+                return True
+        return False
+
+    def get_agent_request_yaml(self, pc_num, pc_name_lower, path, command, success_state, failure_state,
+                               busy_state=None):
+        """Generate the action that sends one request to a PC agent"""
+        return f'''      - script.execute:
+          id: {pc_name_lower}_request
+          path: "{path}"
+          command: "{command}"
+          success_state: "{success_state}"
+          failure_state: "{failure_state}"
+          busy_state: "{busy_state or ''}"'''
+
+    def get_request_policy(self, pc_config):
+        """Agent request timeout, retries and backoff for a PC, in milliseconds"""
+        timeout = float(self.get_pc_setting(pc_config, 'agent_timeout', '2'))
+        retries = int(self.get_pc_setting(pc_config, 'agent_retries', '1'))
+        backoff = float(self.get_pc_setting(pc_config, 'agent_backoff', '2'))
+        backoff_max = float(self.get_pc_setting(pc_config, 'agent_backoff_max', '30'))
+        if timeout <= 0 or retries < 0 or backoff <= 0 or backoff_max < backoff:
+            raise ValueError(f"agent_timeout/agent_retries/agent_backoff for {pc_config['name']} are out of range")
+        return int(timeout * 1000), retries, int(backoff * 1000), int(backoff_max * 1000)
+
+    def get_agent_script_yaml(self, pc_num, pc_config):
+        """Per-PC script sending agent requests with timeout, retries and backoff
+        
+        ESPHome performs HTTP requests synchronously on the main loop, so an
+        unreachable PC would stall every other PC for the full timeout on each
+        press. Each PC gets its own timeout, a few retries with exponential
+        backoff, and a circuit breaker that answers immediately while the PC is
+        known to be down. At most agent_max_pending PCs may be mid-request or
+        waiting to retry at any time.
+        """
+        mqtt = self.get_mqtt_config()
+        if mqtt:
+            return self.get_agent_mqtt_script_yaml(pc_num, pc_config, mqtt)
+        pc = pc_config['name'].lower()
+        timeout_ms, retries, backoff_ms, backoff_max_ms = self.get_request_policy(pc_config)
+        max_pending = self.config.getint('GENERAL', 'agent_max_pending', fallback=4)
+        if self.get_agent_auth(pc_config) == 'hmac':
+            # Retries reuse the request id (so the agent can answer from its
+            # cache) but sign a fresh timestamp to stay inside the replay window
+            request_id = 'id(sntp_time).now().timestamp'
+            timestamp = '''
+                            id(agent_auth_ts) = id(sntp_time).now().timestamp;'''
+            auth_fields = f'''
+                              timestamp: !lambda "return to_string(id(agent_auth_ts));"
+                              signature: !lambda |-
+                                return agent_signature("${{pc{pc_num}_agent_key}}",
+                                                       to_string(id(agent_auth_ts)) + ":" + command + ":" +
+                                                       to_string(id({pc}_request_id)));'''
+        else:
+            # Presses within the same second share a request id so the agent
+            # answers repeats (bounces, both buttons, HA retries) from its cache
+            request_id = 'millis() / 1000'
+            timestamp = ''
+            auth_fields = ''
+        return f'''  # PC{pc_num} agent requests
+  - id: {pc}_request
+    mode: queued
+    max_runs: 3
+    parameters:
+      path: string
+      command: string
+      success_state: string
+      failure_state: string
+      busy_state: string
+    then:
+      # The breaker is open while a failure's deadline lies ahead: in unsigned
+      # millis() arithmetic a passed deadline is far beyond the longest backoff
+      - if:
+          condition:
+            lambda: "return id({pc}_failures) > 0 && id({pc}_retry_at) - millis() <= {backoff_max_ms}u;"
+          then:
+            - lambda: |-
+                id({pc}_status).publish_state("Unreachable - retry in " +
+                    to_string((id({pc}_retry_at) - millis()) / 1000 + 1) + "s");
+          else:
+            - if:
+                condition:
+                  lambda: "return id(agent_pending) >= {max_pending};"
+                then:
+                  - lambda: 'id({pc}_status).publish_state("Controller busy - try again");'
+                else:
+                  - lambda: |-
+                      id(agent_pending) += 1;
+                      id({pc}_attempt) = 0;
+                      id({pc}_done) = false;
+                      id({pc}_request_id) = {request_id};
+                  - while:
+                      condition:
+                        lambda: "return !id({pc}_done);"
+                      then:
+                        - lambda: |-
+                            id(agent_http).set_timeout({timeout_ms});{timestamp}
+                        - http_request.post:
+                            url: !lambda 'return std::string("http://${{pc{pc_num}_ip}}:5000/") + path;'
+                            request_headers:
+                              Content-Type: "application/json"
+                            json:
+                              command: !lambda "return command;"
+                              request_id: !lambda "return to_string(id({pc}_request_id));"{auth_fields}
+                            on_response:
+                              then:
+                                - lambda: |-
+                                    id({pc}_done) = true;
+                                    id({pc}_failures) = 0;
+                                    id({pc}_retry_at) = 0;
+                                    if (response->status_code == 200 || response->status_code == 202) {{
+                                      id({pc}_status).publish_state(success_state);
+                                    }} else if (response->status_code == 409 && !busy_state.empty()) {{
+                                      id({pc}_status).publish_state(busy_state);
+                                    }} else {{
+                                      id({pc}_status).publish_state(failure_state);
+                                    }}
+                            on_error:
+                              then:
+                                - lambda: |-
+                                    id({pc}_attempt) += 1;
+                                    if (id({pc}_attempt) > {retries}) {{
+                                      // Open the breaker; each consecutive failure doubles the wait
+                                      id({pc}_done) = true;
+                                      id({pc}_failures) += 1;
+                                      id({pc}_retry_at) = millis() +
+                                          std::min<uint32_t>({backoff_ms}u << std::min(id({pc}_failures) - 1, 16), {backoff_max_ms}u);
+                                      id({pc}_status).publish_state("Connection error");
+                                    }} else {{
+                                      id({pc}_status).publish_state("Retrying (" + to_string(id({pc}_attempt)) + "/{retries})...");
+                                    }}
+                        - if:
+                            condition:
+                              lambda: "return !id({pc}_done);"
+                            then:
+                              - delay: !lambda "return std::min<uint32_t>({backoff_ms}u << (id({pc}_attempt) - 1), {backoff_max_ms}u);"
+                  - lambda: "id(agent_pending) -= 1;"'''
+
+    def get_agent_mqtt_script_yaml(self, pc_num, pc_config, mqtt):
+        """Per-PC script publishing agent requests to the PC's MQTT command topic
+        
+        The broker holds the connection, so there is nothing to time out or
+        retry on the ESP32: the agent's availability topic says whether it is
+        reachable, and its answer arrives on the result topic (see
+        get_mqtt_yaml), which maps it to the state strings saved here.
+        """
+        pc = pc_config['name'].lower()
+        if self.get_agent_auth(pc_config) == 'hmac':
+            request_id = 'id(sntp_time).now().timestamp'
+            timestamp = '''
+                      id(agent_auth_ts) = id(sntp_time).now().timestamp;'''
+            auth_fields = f'''
+                        root["timestamp"] = to_string(id(agent_auth_ts));
+                        root["signature"] = agent_signature("${{pc{pc_num}_agent_key}}",
+                                                            to_string(id(agent_auth_ts)) + ":" + command + ":" +
+                                                            to_string(id({pc}_request_id)));'''
+        else:
+            request_id = 'millis() / 1000'
+            timestamp = ''
+            auth_fields = ''
+        return f'''  # PC{pc_num} agent requests (MQTT)
+  - id: {pc}_request
+    mode: queued
+    max_runs: 3
+    parameters:
+      path: string
+      command: string
+      success_state: string
+      failure_state: string
+      busy_state: string
+    then:
+      - if:
+          condition:
+            not:
+              mqtt.connected:
+          then:
+            - lambda: 'id({pc}_status).publish_state("Connection error");'
+          else:
+            - if:
+                condition:
+                  lambda: "return !id({pc}_online);"
+                then:
+                  - lambda: 'id({pc}_status).publish_state("Agent offline");'
+                else:
+                  - lambda: |-
+                      id({pc}_success_state) = success_state;
+                      id({pc}_failure_state) = failure_state;
+                      id({pc}_busy_state) = busy_state;
+                      id({pc}_request_id) = {request_id};{timestamp}
+                  - mqtt.publish_json:
+                      topic: {self.get_mqtt_topic(mqtt, pc_config, 'command')}
+                      qos: 1
+                      payload: |-
+                        root["command"] = command;
+                        root["request_id"] = to_string(id({pc}_request_id));{auth_fields}'''
+
+    def get_wol_relay_request_yaml(self, relay_num, relay_config, targets):
+        """Actions asking a relay PC's agent to wake the target PCs in one request
+        
+        The MAC list is part of the signed message, so a captured request
+        cannot be replayed to wake other machines. Wake-on-LAN is fire and
+        forget, so a failed request is reported rather than retried.
+        """
+        macs = ','.join(normalize_mac(pc_config['mac_address']) for _, pc_config in targets)
+        timeout_ms = self.get_request_policy(relay_config)[0]
+        if self.get_agent_auth(relay_config) == 'hmac':
+            timestamp = """
+          id(agent_auth_ts) = id(sntp_time).now().timestamp;"""
+            request_id = 'id(agent_auth_ts)'
+            auth_fields = f"""
+            timestamp: !lambda "return to_string(id(agent_auth_ts));"
+            signature: !lambda |-
+              return agent_signature("${{pc{relay_num}_agent_key}}",
+                                     to_string(id(agent_auth_ts)) + ":wake:" +
+                                     to_string(id(agent_auth_ts)) + ":{macs}");"""
+        else:
+            timestamp = ''
+            request_id = 'millis() / 1000'
+            auth_fields = ''
+
+        def publish(state, indent=20):
+            return ''.join(f"""
+{' ' * indent}id({pc_config['name'].lower()}_status).publish_state("{state}");""" for _, pc_config in targets)
+
+        return f"""      - lambda: |-
+          id(agent_http).set_timeout({timeout_ms});{timestamp}
+      - http_request.post:
+          url: "http://${{pc{relay_num}_ip}}:5000/wake"
+          request_headers:
+            Content-Type: "application/json"
+          json:
+            command: "wake"
+            macs: "{macs}"
+            request_id: !lambda "return to_string({request_id});"{auth_fields}
+          on_response:
+            then:
+              - lambda: |-
+                  if (response->status_code == 200 || response->status_code == 202) {{{publish(f"WOL sent via {relay_config['name']}")}
+                  }} else {{{publish("WOL relay refused")}
+                  }}
+          on_error:
+            then:
+              - lambda: |-{publish(f"WOL relay {relay_config['name']} unreachable", indent=18)}"""
+
+    def get_mqtt_yaml(self, pc_sections, mqtt):
+        """ESPHome mqtt: section routing each agent's topics to its status sensor"""
+        on_message = []
+        on_json_message = []
+        for pc_section in pc_sections:
+            pc_config = dict(self.config[pc_section])
+            pc = pc_config['name'].lower()
+            on_message.append(f'''    # {pc_config['name']} status pushed by its agent (retained)
+    - topic: {self.get_mqtt_topic(mqtt, pc_config, 'status')}
+      qos: 1
+      then:
+        - text_sensor.template.publish:
+            id: {pc}_status
+            state: !lambda "return x;"
+    - topic: {self.get_mqtt_topic(mqtt, pc_config, 'availability')}
+      qos: 1
+      then:
+        - lambda: |-
+            id({pc}_online) = x == "online";
+            if (!id({pc}_online)) {{
+              id({pc}_status).publish_state("Agent offline");
+            }}''')
+            on_json_message.append(f'''    - topic: {self.get_mqtt_topic(mqtt, pc_config, 'result')}
+      qos: 1
+      then:
+        - lambda: |-
+            int code = x["code"] | 0;
+            if (code == 200 || code == 202) {{
+              id({pc}_status).publish_state(id({pc}_success_state));
+            }} else if (code == 409 && !id({pc}_busy_state).empty()) {{
+              id({pc}_status).publish_state(id({pc}_busy_state));
+            }} else {{
+              id({pc}_status).publish_state(id({pc}_failure_state));
+            }}''')
+        credentials = ''
+        if mqtt['username']:
+            credentials = f"""
+  username: {mqtt['username']}
+  password: !secret mqtt_password"""
+        return f'''# MQTT transport: commands, results and status on <prefix>/<pc>/...
+mqtt:
+  broker: {mqtt['broker']}
+  port: {mqtt['port']}{credentials}
+  client_id: ${{device_name}}
+  topic_prefix: {mqtt['topic_prefix']}/${{device_name}}
+  discovery: false
+  on_message:
+{chr(10).join(on_message)}
+  on_json_message:
+{chr(10).join(on_json_message)}
+'''
+
+    def get_agent_script_globals(self, pc_config):
+        """Retry and circuit breaker state kept for one PC's agent requests"""
+        pc = pc_config['name'].lower()
+        if self.get_mqtt_config():
+            return f"""  # {pc_config['name']} agent availability and the states for its pending result
+  - id: {pc}_online
+    type: bool
+    restore_value: no
+    initial_value: 'false'
+  - id: {pc}_request_id
+    type: uint32_t
+    restore_value: no
+    initial_value: '0'""" + ''.join(f"""
+  - id: {pc}_{kind}_state
+    type: std::string
+    restore_value: no""" for kind in ('success', 'failure', 'busy'))
+        return f"""  # {pc_config['name']} request state
+  - id: {pc}_retry_at
+    type: uint32_t
+    restore_value: no
+    initial_value: '0'
+  - id: {pc}_failures
+    type: int
+    restore_value: no
+    initial_value: '0'
+  - id: {pc}_attempt
+    type: int
+    restore_value: no
+    initial_value: '0'
+  - id: {pc}_done
+    type: bool
+    restore_value: no
+    initial_value: 'true'
+  - id: {pc}_request_id
+    type: uint32_t
+    restore_value: no
+    initial_value: '0'"""
+
     def get_yaml_template(self, substitutions, esp32_config, num_pcs):
         """Generate the ESP32 YAML template"""
         substitutions_str = '\n'.join(substitutions)
+        board = self.config.get('ESP32', 'board', fallback=DEFAULT_BOARD)
+        board_profile = self.get_board_profile()
         
         # Generate text sensors
+        display = self.get_display_config()
+        pc_sections = [f'PC{pc_num}' for pc_num in range(1, num_pcs + 1) if f'PC{pc_num}' in self.config]
         text_sensors = []
-        for pc_num in range(1, num_pcs + 1):
-            pc_section = f'PC{pc_num}'
-            if pc_section in self.config:
-                pc_name_lower = self.config.get(pc_section, 'name').lower()
-                text_sensors.append(f'''  - platform: template
+        for index, pc_section in enumerate(pc_sections):
+            pc_num = int(pc_section[2:])
+            pc_name_lower = self.config.get(pc_section, 'name').lower()
+            display_hook = self.get_status_display_hook(index, display)
+            text_sensors.append(f'''  - platform: template
     name: "${{pc{pc_num}_name}} Status"
     id: {pc_name_lower}_status
-    icon: "mdi:desktop-tower"''')
+    icon: "mdi:desktop-tower"{display_hook}''')
         
         # Generate binary sensors (buttons)
+        banks = load_banks(self.config)
         binary_sensors = []
         for pc_num in range(1, num_pcs + 1):
             pc_section = f'PC{pc_num}'
-            if pc_section in self.config:
-                pc_name_lower = self.config.get(pc_section, 'name').lower()
+            if pc_section in self.config and self.has_buttons(dict(self.config[pc_section])):
+                pc_config = dict(self.config[pc_section])
+                pc_name_lower = pc_config['name'].lower()
+                on_pin, on_debounce = self.get_button_pin_yaml(pc_num, 'on_button_gpio', pc_config['on_button_gpio'], banks)
+                off_pin, off_debounce = self.get_button_pin_yaml(pc_num, 'off_button_gpio', pc_config['off_button_gpio'], banks)
+                shutdown_request = self.get_agent_request_yaml(
+                    pc_num, pc_name_lower, 'shutdown', 'shutdown', 'Shutdown command sent', 'Shutdown failed',
+                    'Shutdown in progress')
                 binary_sensors.append(f'''  # PC{pc_num} ON button
   - platform: gpio
     pin:
-      number: ${{pc{pc_num}_on_button_gpio}}
-      mode:
-        input: true
-        pullup: true
-      inverted: true
+{on_pin}
     name: "${{pc{pc_num}_name}} ON Button"
     id: {pc_name_lower}_on_btn
     filters:
-      - delayed_on: 50ms
-      - delayed_off: 50ms
+      - delayed_on: {on_debounce}
+      - delayed_off: {on_debounce}
     on_press:
       - button.press: {pc_name_lower}_wol_button
 
   # PC{pc_num} OFF button
   - platform: gpio
     pin:
-      number: ${{pc{pc_num}_off_button_gpio}}
-      mode:
-        input: true
-        pullup: true
-      inverted: true
+{off_pin}
     name: "${{pc{pc_num}_name}} OFF Button"
     id: {pc_name_lower}_off_btn
     filters:
-      - delayed_on: 50ms
-      - delayed_off: 50ms
+      - delayed_on: {off_debounce}
+      - delayed_off: {off_debounce}
     on_press:
-      - http_request.post:
-          url: "http://${{pc{pc_num}_ip}}:5000/shutdown"
-          request_headers:
-            Content-Type: "application/json"
-          json:
-            command: "shutdown"
-          on_response:
-            then:
-              - lambda: |-
-                  if (response->status_code == 200) {{
-                    id({pc_name_lower}_status).publish_state("Shutdown command sent");
-                  }} else {{
-                    id({pc_name_lower}_status).publish_state("Shutdown failed");
-                  }}
-          on_error:
-            then:
-              - lambda: |-
-                  id({pc_name_lower}_status).publish_state("Connection error");''')
+{shutdown_request}''')
         
         # Generate buttons (WOL and web shutdown)
         buttons = []
+        scripts = []
+        request_globals = []
+        relayed_pcs = {}
         for pc_num in range(1, num_pcs + 1):
             pc_section = f'PC{pc_num}'
             if pc_section in self.config:
                 pc_name_lower = self.config.get(pc_section, 'name').lower()
-                buttons.append(f'''  # PC{pc_num} Wake-on-LAN
+                scripts.append(self.get_agent_script_yaml(pc_num, dict(self.config[pc_section])))
+                request_globals.append(self.get_agent_script_globals(dict(self.config[pc_section])))
+                shutdown_request = self.get_agent_request_yaml(
+                    pc_num, pc_name_lower, 'shutdown', 'shutdown', 'Shutdown command sent', 'Shutdown failed',
+                    'Shutdown in progress')
+                cancel_request = self.get_agent_request_yaml(
+                    pc_num, pc_name_lower, 'cancel', 'cancel', 'Cancelled', 'Nothing to cancel')
+                action_buttons = []
+                for action in self.get_power_actions(dict(self.config[pc_section])):
+                    if action == 'shutdown':
+                        continue  # Shutdown has its own button above
+                    title = POWER_ACTIONS[action]
+                    action_request = self.get_agent_request_yaml(
+                        pc_num, pc_name_lower, 'command', action, f'{title} command sent', f'{title} failed',
+                        'Power action in progress')
+                    action_buttons.append(f'''
+
+  # PC{pc_num} {title} (web button)
+  - platform: template
+    name: "${{pc{pc_num}_name}} {title}"
+    id: {pc_name_lower}_{action}_button
+    on_press:
+{action_request}''')
+                relay = self.get_wol_relay(pc_num, dict(self.config[pc_section]))
+                if relay:
+                    # Broadcasts stay on the ESP32's subnet; an agent on the PC's subnet sends the packet
+                    relay_num, relay_config = relay
+                    relayed_pcs.setdefault(relay_num, []).append((pc_num, dict(self.config[pc_section])))
+                    wol_button = f'''  # PC{pc_num} Wake-on-LAN (relayed by {relay_config['name']})
+  - platform: template
+    name: "${{pc{pc_num}_name}} Wake on LAN"
+    id: {pc_name_lower}_wol_button
+    on_press:
+{self.get_wol_relay_request_yaml(relay_num, relay_config, [(pc_num, dict(self.config[pc_section]))])}'''
+                else:
+                    wol_button = f'''  # PC{pc_num} Wake-on-LAN
   - platform: wake_on_lan
     name: "${{pc{pc_num}_name}} Wake on LAN"
     id: {pc_name_lower}_wol_button
@@ -306,31 +1375,122 @@ Generated by ESP32 PC Controller Template Generator
     on_press:
       - text_sensor.template.publish:
           id: {pc_name_lower}_status
-          state: "WOL packet sent"
+          state: "WOL packet sent"'''
+                buttons.append(f'''{wol_button}
 
   # PC{pc_num} Shutdown (web button)
   - platform: template
     name: "${{pc{pc_num}_name}} Shutdown"
     id: {pc_name_lower}_shutdown_button
     on_press:
-      - http_request.post:
-          url: "http://${{pc{pc_num}_ip}}:5000/shutdown"
-          request_headers:
-            Content-Type: "application/json"
-          json:
-            command: "shutdown"
-          on_response:
-            then:
-              - lambda: |-
-                  if (response->status_code == 200) {{
-                    id({pc_name_lower}_status).publish_state("Shutdown command sent");
-                  }} else {{
-                    id({pc_name_lower}_status).publish_state("Shutdown failed");
-                  }}
-          on_error:
-            then:
-              - lambda: |-
-                  id({pc_name_lower}_status).publish_state("Connection error");''')
+{shutdown_request}{''.join(action_buttons)}
+
+  # PC{pc_num} Cancel pending shutdown (web button)
+  - platform: template
+    name: "${{pc{pc_num}_name}} Cancel Shutdown"
+    id: {pc_name_lower}_cancel_button
+    on_press:
+{cancel_request}''')
+        
+        # One request wakes every PC behind a relay, sent by its agent as a single burst
+        for relay_num, targets in relayed_pcs.items():
+            if len(targets) > 1:
+                relay_config = dict(self.config[f'PC{relay_num}'])
+                buttons.append(f'''  # Wake every PC relayed by {relay_config['name']}
+  - platform: template
+    name: "${{pc{relay_num}_name}} Relay Wake All"
+    id: {relay_config['name'].lower()}_relay_wake_all_button
+    on_press:
+{self.get_wol_relay_request_yaml(relay_num, relay_config, targets)}''')
+        
+        # PCs imported without button wiring are controlled from the web UI only
+        button_banks_section = self.get_button_banks_yaml(banks)
+        binary_sensor_section = ''
+        if binary_sensors:
+            binary_sensor_section = f'''# Binary sensors for physical buttons
+binary_sensor:
+{chr(10).join(binary_sensors)}
+'''
+        
+        # Signed agent requests need wall-clock time and the HMAC helper
+        includes = []
+        mqtt = self.get_mqtt_config()
+        global_entries = list(request_globals)
+        if not mqtt:
+            global_entries.insert(0, """  # Agent requests currently running or waiting to retry
+  - id: agent_pending
+    type: int
+    restore_value: no
+    initial_value: '0'""")
+        auth_sections = ''
+        if self.uses_agent_auth(num_pcs):
+            includes.append('agent_auth.h')
+            auth_sections = '''
+# Wall-clock time for signed agent requests (replay protection)
+time:
+  - platform: sntp
+    id: sntp_time
+'''
+            global_entries.append("""  # Timestamp shared by the fields of one signed request
+  - id: agent_auth_ts
+    type: uint32_t
+    restore_value: no
+    initial_value: '0'""")
+        
+        # The status display draws once at boot, then only on status changes
+        display_section = self.get_status_display_yaml(display, pc_sections)
+        boot_actions = ''
+        if display and display['type'] == 'ws2812':
+            includes.append('status_leds.h')
+        elif display:
+            global_entries.append("""  # Display rows waiting to be redrawn, and the page being shown
+  - id: display_dirty
+    type: uint32_t
+    restore_value: no
+    initial_value: '0xFFFFFFFF'
+  - id: display_page
+    type: int
+    restore_value: no
+    initial_value: '0'""")
+            boot_actions = '''
+  on_boot:
+    priority: -100
+    then:
+      - component.update: status_display'''
+        
+        # Agent traffic goes through the broker or straight to each PC over HTTP
+        if mqtt:
+            transport_section = self.get_mqtt_yaml(pc_sections, mqtt)
+            if relayed_pcs:
+                transport_section += f'''
+# HTTP request component for Wake-on-LAN relay requests (agents serve HTTP with MQTT too)
+http_request:
+  id: agent_http
+  timeout: {self.config.get('GENERAL', 'agent_timeout', fallback='2')}s
+  verify_ssl: false
+'''
+        else:
+            transport_section = f'''# HTTP request component for agent commands; each PC script sets its own timeout
+http_request:
+  id: agent_http
+  timeout: {self.config.get('GENERAL', 'agent_timeout', fallback='2')}s
+  verify_ssl: false
+'''
+        
+        script_section = ''
+        if scripts:
+            script_section = f'''
+# Agent request scripts
+script:
+{chr(10).join(scripts)}
+'''
+        
+        auth_includes = ''
+        if includes:
+            auth_includes = '\n  includes:\n' + '\n'.join(f'    - {include}' for include in includes)
+        auth_includes += boot_actions
+        if global_entries:
+            auth_sections += '\nglobals:\n' + '\n'.join(global_entries) + '\n'
         
         return f'''# ESPHome Configuration for PC Control with WOL and Shutdown
 # Generated by ESP32 PC Controller Template Generator
@@ -341,12 +1501,12 @@ substitutions:
 
 esphome:
   name: ${{device_name}}
-  friendly_name: ${{friendly_name}}
+  friendly_name: ${{friendly_name}}{auth_includes}
 
 esp32:
-  board: esp32dev
+  board: {board}
   framework:
-    type: arduino
+    type: {board_profile['framework']}
 
 # Enable logging
 logger:
@@ -385,22 +1545,48 @@ web_server:
 text_sensor:
 {chr(10).join(text_sensors)}
 
-# Binary sensors for physical buttons
-binary_sensor:
-{chr(10).join(binary_sensors)}
-
-# HTTP request component for shutdown commands
-http_request:
-  timeout: 5s
-  verify_ssl: false
-
+{button_banks_section}{display_section}{binary_sensor_section}
+{transport_section}{auth_sections}{script_section}
 # Wake-on-LAN and Shutdown buttons
 button:
 {chr(10).join(buttons)}
+'''
+
+    def get_agent_auth_header_template(self):
+        """Generate the C++ helper used by YAML lambdas to sign agent requests"""
+        return '''// Agent request signing helper for ESPHome lambdas
+// Generated by ESP32 PC Controller Template Generator
+#pragma once
+
+#include <string>
+#include "mbedtls/md.h"
+
+// HMAC-SHA256 of message under key, as lowercase hex
+inline std::string agent_signature(const std::string &key, const std::string &message) {
+  unsigned char digest[32];
+  mbedtls_md_hmac(mbedtls_md_info_from_type(MBEDTLS_MD_SHA256),
+                  reinterpret_cast<const unsigned char *>(key.data()), key.size(),
+                  reinterpret_cast<const unsigned char *>(message.data()), message.size(), digest);
+  static const char hex[] = "0123456789abcdef";
+  std::string signature;
+  signature.reserve(sizeof(digest) * 2);
+  for (unsigned char byte : digest) {
+    signature.push_back(hex[byte >> 4]);
+    signature.push_back(hex[byte & 0x0f]);
+  }
+  return signature;
+}
 '''
 
     def get_python_script_template(self, pc_num, pc_config, esp32_ip):
         """Generate Python shutdown script for a specific PC"""
+        shutdown_delay = self.get_shutdown_delay(pc_config)
+        rate_per_minute, rate_burst = self.get_rate_limit(pc_config)
+        enabled_commands = self.get_power_actions(pc_config)
+        agent_auth = self.get_agent_auth(pc_config)
+        mqtt = self.get_mqtt_config() or {'broker': '', 'port': 1883, 'username': '', 'topic_prefix': 'pc_controller'}
+        mqtt_topic = f"{mqtt['topic_prefix']}/{pc_config['name'].lower()}"
+        relay_macs = [normalize_mac(relayed['mac_address']) for _, relayed in self.get_relayed_pcs(pc_num)]
         return f'''#!/usr/bin/env python3
 """
 PC{pc_num} ({pc_config['name']}) Shutdown Script
@@ -408,7 +1594,7 @@ This script receives shutdown commands from ESP32 and sends status back
 Run this script on {pc_config['name']} to enable remote shutdown control
 
 Installation:
-1. Install required packages: pip install flask requests
+1. Install required packages: pip install {' '.join(self.get_agent_packages())}
 2. Run: python pc{pc_num}_shutdown.py
 3. For auto-start on boot, run install_pc{pc_num}_service.bat as Administrator
 
@@ -417,11 +1603,22 @@ Generated by ESP32 PC Controller Template Generator
 
 import os
 import sys
+import json
+import math
+import queue
+import socket
+import subprocess
 import requests
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from werkzeug.serving import make_server
 import threading
 import time
 import logging
+import hashlib
+import hmac
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
 from urllib.parse import quote
 
 app = Flask(__name__)
@@ -434,20 +1631,74 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Folder holding the key files; a .pyz bundle looks beside the archive
+AGENT_DIR = Path(__file__).resolve().parent
+if AGENT_DIR.is_file():
+    AGENT_DIR = AGENT_DIR.parent
+
 # Configuration - Auto-generated from config.ini
 ESP32_IP = "{esp32_ip}"
 ESP32_PORT = 80
 PC_NAME = "{pc_config['name']}"
 PC_NUMBER = {pc_num}
+SHUTDOWN_DELAY = {shutdown_delay}
+
+# Token bucket guarding the command endpoints: sustained rate and burst size
+RATE_LIMIT_PER_MINUTE = {rate_per_minute}
+RATE_LIMIT_BURST = {rate_burst}
+# Seconds a request id is remembered for deduplication
+REQUEST_DEDUP_WINDOW = 60
+
+# Request authentication: "hmac" requires signed command requests
+AGENT_AUTH = "{agent_auth}"
+AGENT_KEY_FILE = "agent_key.txt"
+# Signed requests older or newer than this many seconds are rejected
+REPLAY_WINDOW = 30
+
+# Transport for ESP32 commands and status: "http", or "mqtt" through the
+# broker below (the HTTP endpoints stay available either way)
+TRANSPORT = "{'mqtt' if self.get_mqtt_config() else 'http'}"
+MQTT_BROKER = "{mqtt['broker']}"
+MQTT_PORT = {mqtt['port']}
+MQTT_USERNAME = "{mqtt['username']}"
+MQTT_PASSWORD_FILE = "mqtt_password.txt"
+MQTT_KEEPALIVE = 30
+# Commands arrive on <topic>/command, results go to <topic>/result, status to
+# <topic>/status and online/offline to <topic>/availability
+MQTT_TOPIC = "{mqtt_topic}"
+
+# Minutes without requests after which a socket-activated agent exits; systemd
+# or launchd keeps port 5000 open and starts it again on demand (0 = never)
+IDLE_EXIT_MINUTES = {self.config.getint('GENERAL', 'agent_idle_exit', fallback=15)}
+# First file descriptor passed by systemd socket activation (sd_listen_fds)
+SD_LISTEN_FDS_START = 3
+
+# Seconds between keep-alive comments on idle /events streams
+SSE_KEEPALIVE = 15
+# Events buffered per subscriber before a slow reader starts missing states
+SSE_QUEUE_SIZE = 32
+
+# Wake-on-LAN relay: PCs on this PC's subnet that the ESP32's broadcasts
+# cannot reach; POST /wake sends their magic packets (empty = relay off)
+WOL_RELAY_MACS = {relay_macs!r}
+WOL_BROADCAST = "255.255.255.255"
+WOL_PORT = 9
+# UDP is lossy, so every packet of a burst is sent this many times
+WOL_REPEAT = 3
+
+# One keep-alive connection to the ESP32 is reused for every status push
+esp32_session = requests.Session()
 
 
 def send_status_to_esp32(status_message):
     """Send status update to ESP32"""
+    if mqtt_bridge is not None:
+        return mqtt_bridge.publish_status(status_message)
     try:
         # URL encode the status message to handle special characters
         encoded_message = quote(status_message)
         url = f"http://{{ESP32_IP}}:{{ESP32_PORT}}/text_sensor/{pc_config['name'].lower()}_status/set?value={{encoded_message}}"
-        response = requests.get(url, timeout=5)
+        response = esp32_session.get(url, timeout=5)
         logger.info(
             f"Status sent to ESP32: {{status_message}} - Response: {{response.status_code}}"
         )
@@ -463,87 +1714,568 @@ def send_status_to_esp32(status_message):
         return False
 
 
-def shutdown_pc():
-    """Shutdown the PC with a delay to allow status to be sent"""
-    logger.info("Shutdown initiated - PC will shutdown in 5 seconds...")
-    send_status_to_esp32("Shutting down in 5s...")
-    time.sleep(2)
-
-    send_status_to_esp32("Shutting down in 3s...")
-    time.sleep(2)
-
-    send_status_to_esp32("Shutting down now...")
-    time.sleep(1)
-
+class StatusBroadcaster:
+    """Fan out status transitions to /events subscribers and the ESP32
+
+    Publishing never blocks on the network: SSE subscribers get the event
+    through their own queue and a single background thread forwards only the
+    most recent state to the ESP32, coalescing bursts into one request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._esp32_ready = threading.Condition(self._lock)
+        self._subscribers = set()
+        self._event_id = 0
+        self._last_event = None
+        self._esp32_pending = None
+
+    def publish(self, state):
+        """Record a new state and notify every observer"""
+        with self._lock:
+            self._event_id += 1
+            event = {{
+                "id": self._event_id,
+                "state": state,
+                "pc": PC_NAME,
+                "pc_number": PC_NUMBER,
+                "timestamp": time.time(),
+            }}
+            self._last_event = event
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    # Slow readers skip intermediate states, never the stream
+                    pass
+            self._esp32_pending = state
+            self._esp32_ready.notify()
+        return event
+
+    def subscribe(self):
+        """Register a subscriber queue primed with the current state"""
+        subscriber = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        with self._lock:
+            if self._last_event is not None:
+                subscriber.put_nowait(self._last_event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def last_event(self):
+        with self._lock:
+            return self._last_event
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def run_esp32_forwarder(self):
+        """Forward the latest pending state to the ESP32 (runs in a thread)"""
+        while True:
+            with self._lock:
+                while self._esp32_pending is None:
+                    self._esp32_ready.wait()
+                state = self._esp32_pending
+                self._esp32_pending = None
+            send_status_to_esp32(state)
+
+
+broadcaster = StatusBroadcaster()
+
+
+def publish_status(status_message):
+    """Publish a status transition to all observers without blocking"""
+    logger.info(f"Status: {{status_message}}")
+    return broadcaster.publish(status_message)
+
+
+# Power actions: status label, whether they run after the countdown, and the
+# argv executed (without a shell) on each platform
+POWER_COMMANDS = {{
+    "shutdown": {{
+        "label": "Shutting down",
+        "countdown": True,
+        "win32": ["shutdown", "/s", "/t", "1"],
+        "linux": ["sudo", "shutdown", "-h", "now"],
+        "darwin": ["sudo", "shutdown", "-h", "now"],
+    }},
+    "restart": {{
+        "label": "Restarting",
+        "countdown": True,
+        "win32": ["shutdown", "/r", "/t", "1"],
+        "linux": ["sudo", "shutdown", "-r", "now"],
+        "darwin": ["sudo", "shutdown", "-r", "now"],
+    }},
+    "sleep": {{
+        "label": "Sleeping",
+        "countdown": False,
+        "win32": ["rundll32.exe", "powrprof.dll,SetSuspendState", "0,1,0"],
+        "linux": ["systemctl", "suspend"],
+        "darwin": ["pmset", "sleepnow"],
+    }},
+    "hibernate": {{
+        "label": "Hibernating",
+        "countdown": False,
+        "win32": ["shutdown", "/h"],
+        "linux": ["systemctl", "hibernate"],
+    }},
+    "lock": {{
+        "label": "Locking",
+        "countdown": False,
+        "win32": ["rundll32.exe", "user32.dll,LockWorkStation"],
+        "linux": ["loginctl", "lock-sessions"],
+        "darwin": ["pmset", "displaysleepnow"],
+    }},
+    "logoff": {{
+        "label": "Logging off",
+        "countdown": True,
+        "win32": ["shutdown", "/l"],
+        "linux": ["loginctl", "terminate-seat", "seat0"],
+        "darwin": ["osascript", "-e", 'tell application "System Events" to log out'],
+    }},
+}}
+ENABLED_COMMANDS = {enabled_commands!r}
+# Seconds a power command may run before it is considered hung
+COMMAND_TIMEOUT = 15
+
+
+def run_power_command(command):
+    """Execute a registered power command for this platform"""
+    argv = POWER_COMMANDS[command].get(sys.platform)
+    if argv is None:
+        logger.error(f"{{command}} is not supported on {{sys.platform}}")
+        publish_status(f"{{command.capitalize()}} failed - unsupported OS")
+        return False
     try:
-        # Windows shutdown command
-        if sys.platform == "win32":
-            logger.info("Executing Windows shutdown command")
-            os.system("shutdown /s /t 1")
-        # Linux shutdown command
-        elif sys.platform == "linux":
-            logger.info("Executing Linux shutdown command")
-            os.system("sudo shutdown -h now")
-        # macOS shutdown command
-        elif sys.platform == "darwin":
-            logger.info("Executing macOS shutdown command")
-            os.system("sudo shutdown -h now")
-        else:
-            logger.error(f"Unsupported platform: {{sys.platform}}")
-            send_status_to_esp32("Shutdown failed - unsupported OS")
+        logger.info(f"Executing {{command}} command: {{argv}}")
+        result = subprocess.run(argv, capture_output=True, text=True, timeout=COMMAND_TIMEOUT)
+        if result.returncode != 0:
+            logger.error(f"{{command}} command exited with {{result.returncode}}: {{result.stderr.strip()}}")
+            publish_status(f"{{command.capitalize()}} failed")
+            return False
+        return True
+    except subprocess.TimeoutExpired:
+        logger.error(f"{{command}} command timed out after {{COMMAND_TIMEOUT}}s")
+        publish_status(f"{{command.capitalize()}} failed - timeout")
     except Exception as e:
-        logger.error(f"Shutdown command failed: {{e}}")
-        send_status_to_esp32("Shutdown failed")
-
-
-@app.route("/shutdown", methods=["POST"])
-def shutdown():
-    """Handle shutdown request from ESP32"""
+        logger.error(f"{{command}} command failed: {{e}}")
+        publish_status(f"{{command.capitalize()}} failed")
+    return False
+
+
+class PowerCountdown:
+    """A single cancellable countdown scheduled on the monotonic clock
+
+    Each tick waits on the cancel event until the next whole second before the
+    deadline, so status pushes never stretch the countdown and a /cancel
+    request takes effect immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel_event = None
+        self._deadline = None
+        self._command = None
+
+    def start(self, delay, command):
+        """Start the countdown unless one is already running"""
+        with self._lock:
+            if self._cancel_event is not None:
+                return False
+            self._cancel_event = threading.Event()
+            self._deadline = time.monotonic() + delay
+            self._command = command
+            countdown_thread = threading.Thread(
+                target=self._run, args=(self._cancel_event, self._deadline, command)
+            )
+            countdown_thread.daemon = True
+            countdown_thread.start()
+            return True
+
+    def cancel(self):
+        """Abort the running countdown, returning its command or None"""
+        with self._lock:
+            if self._cancel_event is None:
+                return None
+            self._cancel_event.set()
+            self._cancel_event = None
+            self._deadline = None
+            return self._command
+
+    def remaining(self):
+        with self._lock:
+            if self._deadline is None:
+                return None
+            return max(0.0, self._deadline - time.monotonic())
+
+    def _run(self, cancel_event, deadline, command):
+        label = POWER_COMMANDS[command]["label"]
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            seconds_left = math.ceil(remaining)
+            publish_status(f"{{label}} in {{seconds_left}}s...")
+            if cancel_event.wait(remaining - (seconds_left - 1)):
+                logger.info(f"{{command}} countdown cancelled")
+                publish_status(f"{{command.capitalize()}} cancelled")
+                return
+
+        with self._lock:
+            if cancel_event.is_set():
+                publish_status(f"{{command.capitalize()}} cancelled")
+                return
+            # Past the deadline the command can no longer be aborted
+            self._cancel_event = None
+            self._deadline = None
+        publish_status(f"{{label}} now...")
+        run_power_command(command)
+
+
+countdown = PowerCountdown()
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled from the monotonic clock"""
+
+    def __init__(self, rate_per_minute, capacity):
+        self._lock = threading.Lock()
+        self._rate = rate_per_minute / 60.0
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def consume(self):
+        """Take one token, returning the seconds to wait if none is left"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+
+class RequestDeduplicator:
+    """Remember recent request ids together with the response they produced"""
+
+    def __init__(self, window):
+        self._lock = threading.Lock()
+        self._window = window
+        self._seen = OrderedDict()
+
+    def _prune(self, now):
+        # Entries are inserted in expiry order, so expired ones sit at the front
+        while self._seen:
+            request_id, (expires, _) = next(iter(self._seen.items()))
+            if expires > now:
+                break
+            del self._seen[request_id]
+
+    def lookup(self, request_id):
+        with self._lock:
+            self._prune(time.monotonic())
+            entry = self._seen.get(request_id)
+            return entry[1] if entry else None
+
+    def remember(self, request_id, response_body):
+        with self._lock:
+            self._seen[request_id] = (time.monotonic() + self._window, response_body)
+            self._seen.move_to_end(request_id)
+
+
+rate_limiter = TokenBucket(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+# Cancel has its own bucket so the commands that started a countdown can never lock out stopping it
+cancel_limiter = TokenBucket(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+# Wakes have their own bucket, large enough to wake every relayed PC at once
+wake_limiter = TokenBucket(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST + len(WOL_RELAY_MACS))
+recent_requests = RequestDeduplicator(REQUEST_DEDUP_WINDOW)
+
+
+def load_agent_signer():
+    """Precompute the HMAC state for the agent key (None when auth is off)"""
+    if AGENT_AUTH != "hmac":
+        return None
+    key_file = AGENT_DIR / AGENT_KEY_FILE
+    agent_key = key_file.read_text().strip()
+    return hmac.new(agent_key.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+agent_signer = load_agent_signer()
+seen_signatures = RequestDeduplicator(REPLAY_WINDOW * 2)
+
+
+def verify_signature(data):
+    """Return an error result unless the request is freshly and validly signed"""
+    try:
+        timestamp = int(data["timestamp"])
+        signature = str(data["signature"])
+    except (KeyError, TypeError, ValueError):
+        return {{"status": "error", "message": "Missing request signature"}}, 401
+    if abs(time.time() - timestamp) > REPLAY_WINDOW:
+        return {{"status": "error", "message": "Request timestamp outside replay window"}}, 401
+
+    message = f"{{timestamp}}:{{data.get('command', '')}}:{{data.get('request_id', '')}}"
+    if "macs" in data:
+        # Relay requests also sign the MACs to wake
+        message += f":{{data['macs']}}"
+    mac = agent_signer.copy()
+    mac.update(message.encode("utf-8"))
+    if not hmac.compare_digest(mac.hexdigest(), signature):
+        return {{"status": "error", "message": "Invalid request signature"}}, 401
+    return None
+
+
+def check_signature(data, source):
+    """Reject unsigned, stale, forged or replayed requests when auth is enabled"""
+    if agent_signer is None:
+        return None
+    error = verify_signature(data)
+    if error:
+        logger.warning(f"Rejected unauthenticated request from {{source}}")
+        return error
+    # A repeated signature is only acceptable as a deduplicated retry
+    dedup_key = get_dedup_key(data)
+    if not (dedup_key and recent_requests.lookup(dedup_key) is not None):
+        if seen_signatures.lookup(data["signature"]) is not None:
+            logger.warning(f"Rejected replayed request from {{source}}")
+            return {{"status": "error", "message": "Replayed request"}}, 409
+        seen_signatures.remember(data["signature"], True)
+    return None
+
+
+def get_request_id(data):
+    """Request id carried in the request body"""
+    request_id = data.get("request_id")
+    return str(request_id) if request_id else None
+
+
+def get_dedup_key(data):
+    """Deduplication key scoping the request id to its command (and relayed MACs)"""
+    request_id = get_request_id(data)
+    if not request_id:
+        return None
+    if data.get("macs"):
+        return f"{{data.get('command', '')}}:{{data['macs']}}:{{request_id}}"
+    return f"{{data.get('command', '')}}:{{request_id}}"
+
+
+def check_rate_limit(source, limiter=rate_limiter):
+    """Return a 429 result when the caller has exhausted the bucket"""
+    retry_after = limiter.consume()
+    if retry_after:
+        logger.warning(f"Rate limit exceeded by {{source}}")
+        return {{"status": "error", "message": "Too many requests", "retry_after": retry_after}}, 429
+    return None
+
+
+def process_command(data, source):
+    """Run a shutdown or other power command, returning (body, status code)
+
+    Shared by the HTTP endpoints and the MQTT command topic.
+    """
     try:
-        data = request.get_json()
         if not data:
             logger.warning("Received shutdown request with no JSON data")
-            return jsonify({{"status": "error", "message": "No JSON data provided"}}), 400
+            return {{"status": "error", "message": "No JSON data provided"}}, 400
 
         command = data.get("command", "")
-
-        if command == "shutdown":
-            logger.info(f"Shutdown command received from {{request.remote_addr}}")
-            send_status_to_esp32("Command received")
-
-            # Start shutdown in a separate thread to allow response to be sent
-            shutdown_thread = threading.Thread(target=shutdown_pc)
-            shutdown_thread.daemon = True
-            shutdown_thread.start()
-
-            return (
-                jsonify(
+        request_id = get_request_id(data)
+        dedup_key = get_dedup_key(data)
+
+        # Repeats of an accepted request are answered from cache, before
+        # they can consume rate limit tokens or touch the countdown
+        if dedup_key:
+            previous = recent_requests.lookup(dedup_key)
+            if previous is not None:
+                logger.info(f"Duplicate request {{request_id}} from {{source}}")
+                return dict(previous, duplicate=True), 202
+
+        limited = check_rate_limit(source)
+        if limited:
+            return limited
+
+        if command in ENABLED_COMMANDS:
+            logger.info(f"{{command}} command received from {{source}}")
+
+            # Countdown and commands run in their own threads so the response
+            # is sent at once; only one power action may be pending at a time
+            if POWER_COMMANDS[command]["countdown"]:
+                started = countdown.start(SHUTDOWN_DELAY, command)
+            elif countdown.remaining() is None:
+                publish_status(f"{{POWER_COMMANDS[command]['label']}}...")
+                command_thread = threading.Thread(target=run_power_command, args=(command,))
+                command_thread.daemon = True
+                command_thread.start()
+                started = True
+            else:
+                started = False
+
+            if not started:
+                logger.info("Power action already in progress - ignoring request")
+                return (
                     {{
-                        "status": "success",
-                        "message": "Shutdown initiated",
+                        "status": "in_progress",
+                        "message": "Power action already in progress",
+                        "remaining": countdown.remaining(),
                         "pc": PC_NAME,
-                        "pc_number": PC_NUMBER,
-                        "timestamp": time.time(),
-                    }}
-                ),
-                200,
-            )
+                    }},
+                    409,
+                )
+
+            response_body = {{
+                "status": "success",
+                "message": f"{{command.capitalize()}} initiated",
+                "command": command,
+                "delay": SHUTDOWN_DELAY if POWER_COMMANDS[command]["countdown"] else 0,
+                "pc": PC_NAME,
+                "pc_number": PC_NUMBER,
+                "request_id": request_id,
+                "timestamp": time.time(),
+            }}
+            if dedup_key:
+                recent_requests.remember(dedup_key, response_body)
+            return response_body, 200
         else:
             logger.warning(f"Invalid command received: {{command}}")
-            return (
-                jsonify({{"status": "error", "message": f"Invalid command: {{command}}"}}),
-                400,
-            )
+            return {{"status": "error", "message": f"Invalid command: {{command}}"}}, 400
 
     except Exception as e:
         logger.error(f"Error processing shutdown request: {{e}}")
-        send_status_to_esp32("Error processing request")
-        return jsonify({{"status": "error", "message": str(e)}}), 500
+        publish_status("Error processing request")
+        return {{"status": "error", "message": str(e)}}, 500
+
+
+def process_cancel(source):
+    """Abort a pending shutdown countdown, returning (body, status code)"""
+    limited = check_rate_limit(source, cancel_limiter)
+    if limited:
+        return limited
+    command = countdown.cancel()
+    if command:
+        logger.info(f"{{command}} cancelled by {{source}}")
+        return {{"status": "success", "message": f"{{command.capitalize()}} cancelled", "pc": PC_NAME}}, 200
+    return {{"status": "error", "message": "No power action in progress", "pc": PC_NAME}}, 409
+
+
+def send_magic_packets(macs):
+    """Broadcast the magic packets for all MACs as one burst from a single socket"""
+    packets = [b"\\xff" * 6 + bytes.fromhex(mac.replace(":", "")) * 16 for mac in macs]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        for _ in range(WOL_REPEAT):
+            for packet in packets:
+                sock.sendto(packet, (WOL_BROADCAST, WOL_PORT))
+
+
+def process_wake(data, source):
+    """Wake relayed PCs for the ESP32, returning (body, status code)
+
+    macs is a comma separated string (or a list); only the PCs this agent
+    was generated to relay for are woken.
+    """
+    if not WOL_RELAY_MACS:
+        return {{"status": "error", "message": "Wake-on-LAN relay is not enabled on this PC"}}, 404
+    requested = (data or {{}}).get("macs") or []
+    if isinstance(requested, str):
+        requested = requested.split(",")
+    macs = list(dict.fromkeys(str(mac).strip().upper().replace("-", ":") for mac in requested if str(mac).strip()))
+    if not macs:
+        return {{"status": "error", "message": "No MAC addresses provided"}}, 400
+    refused = [mac for mac in macs if mac not in WOL_RELAY_MACS]
+    if refused:
+        logger.warning(f"Refused to relay Wake-on-LAN for {{', '.join(refused)}} from {{source}}")
+        return {{"status": "error", "message": f"Not relayed by this PC: {{', '.join(refused)}}"}}, 403
+
+    dedup_key = get_dedup_key(data)
+    if dedup_key:
+        previous = recent_requests.lookup(dedup_key)
+        if previous is not None:
+            return dict(previous, duplicate=True), 202
+    limited = check_rate_limit(source, wake_limiter)
+    if limited:
+        return limited
+
+    try:
+        send_magic_packets(macs)
+    except OSError as e:
+        logger.error(f"Could not send Wake-on-LAN packets: {{e}}")
+        return {{"status": "error", "message": f"Could not send magic packets: {{e}}"}}, 500
+    logger.info(f"Relayed Wake-on-LAN for {{', '.join(macs)}} from {{source}}")
+    response_body = {{
+        "status": "success",
+        "message": f"Wake-on-LAN sent for {{len(macs)}} PC(s)",
+        "macs": macs,
+        "pc": PC_NAME,
+        "request_id": get_request_id(data),
+        "timestamp": time.time(),
+    }}
+    if dedup_key:
+        recent_requests.remember(dedup_key, response_body)
+    return response_body, 200
+
+
+def get_request_data():
+    """JSON body of the current HTTP request, with X-Request-ID folded in"""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and not data.get("request_id") and request.headers.get("X-Request-ID"):
+        data["request_id"] = request.headers["X-Request-ID"]
+    return data
+
+
+def http_response(result):
+    """Turn a (body, status code) result into a Flask response"""
+    body, status_code = result
+    response = jsonify(body)
+    if status_code == 429:
+        response.headers["Retry-After"] = str(math.ceil(body["retry_after"]))
+    return response, status_code
+
+
+def require_signature(view):
+    """Apply check_signature to an HTTP endpoint"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        error = check_signature(get_request_data() or {{}}, request.remote_addr)
+        if error:
+            return http_response(error)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+@app.route("/shutdown", methods=["POST"])
+@app.route("/command", methods=["POST"])
+@require_signature
+def shutdown():
+    """Handle shutdown and other power commands from ESP32"""
+    return http_response(process_command(get_request_data(), request.remote_addr))
+
+
+@app.route("/cancel", methods=["POST"])
+@require_signature
+def cancel():
+    """Abort a pending shutdown countdown"""
+    return http_response(process_cancel(request.remote_addr))
+
+
+@app.route("/wake", methods=["POST"])
+@require_signature
+def wake():
+    """Wake-on-LAN relay for PCs the ESP32's broadcasts do not reach"""
+    return http_response(process_wake(get_request_data(), request.remote_addr))
 
 
 @app.route("/status", methods=["GET"])
 def status():
     """Health check endpoint"""
+    last_event = broadcaster.last_event()
     return (
         jsonify(
             {{
@@ -551,6 +2283,9 @@ def status():
                 "pc": PC_NAME,
                 "pc_number": PC_NUMBER,
                 "platform": sys.platform,
+                "transport": TRANSPORT,
+                "state": last_event["state"] if last_event else None,
+                "shutdown_remaining": countdown.remaining(),
                 "timestamp": time.time(),
             }}
         ),
@@ -558,36 +2293,192 @@ def status():
     )
 
 
+@app.route("/events", methods=["GET"])
+def events():
+    """Server-Sent Events stream of status transitions"""
+    subscriber = broadcaster.subscribe()
+    logger.info(f"Event subscriber connected from {{request.remote_addr}}")
+
+    def stream():
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\\n\\n"
+                    continue
+                yield f"id: {{event['id']}}\\nevent: status\\ndata: {{json.dumps(event)}}\\n\\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={{"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}},
+    )
+
+
 @app.route("/ping", methods=["GET"])
 def ping():
     """Simple ping endpoint for connectivity testing"""
     return jsonify({{"pong": True, "pc": PC_NAME}}), 200
 
 
+class MqttBridge:
+    """Carry ESP32 commands and status over one persistent MQTT connection
+
+    Commands use the same JSON body as the HTTP endpoints and their result is
+    published to the result topic. Status is published retained, so the ESP32
+    sees the latest state as soon as it (re)subscribes, and the broker marks
+    the agent offline through the last will if the connection drops.
+    """
+
+    def __init__(self):
+        import paho.mqtt.client as mqtt
+
+        client_id = f"pc-agent-{{PC_NAME.lower()}}"
+        try:
+            self._client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        except AttributeError:  # paho-mqtt < 2.0
+            self._client = mqtt.Client(client_id=client_id)
+        if MQTT_USERNAME:
+            password_file = AGENT_DIR / MQTT_PASSWORD_FILE
+            self._client.username_pw_set(MQTT_USERNAME, password_file.read_text().strip())
+        self._client.will_set(f"{{MQTT_TOPIC}}/availability", "offline", qos=1, retain=True)
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self._client.on_connect = self._on_connect
+        self._client.on_message = self._on_message
+
+    def start(self):
+        """Connect in the background; paho reconnects on its own"""
+        self._client.connect_async(MQTT_BROKER, MQTT_PORT, keepalive=MQTT_KEEPALIVE)
+        self._client.loop_start()
+
+    def stop(self):
+        self._client.publish(f"{{MQTT_TOPIC}}/availability", "offline", qos=1, retain=True)
+        self._client.disconnect()
+        self._client.loop_stop()
+
+    def publish_status(self, status_message):
+        """Queue a retained status update for the ESP32"""
+        info = self._client.publish(f"{{MQTT_TOPIC}}/status", status_message, qos=1, retain=True)
+        logger.info(f"Status published to MQTT: {{status_message}}")
+        return info.rc == 0
+
+    def _on_connect(self, client, userdata, flags, reason_code, *args):
+        if getattr(reason_code, "value", reason_code) != 0:
+            logger.warning(f"MQTT connection refused by {{MQTT_BROKER}}: {{reason_code}}")
+            return
+        logger.info(f"Connected to MQTT broker {{MQTT_BROKER}}:{{MQTT_PORT}}")
+        # Subscriptions do not survive a reconnect, so they are renewed here
+        client.subscribe(f"{{MQTT_TOPIC}}/command", qos=1)
+        client.publish(f"{{MQTT_TOPIC}}/availability", "online", qos=1, retain=True)
+
+    def _on_message(self, client, userdata, message):
+        try:
+            data = json.loads(message.payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed MQTT command: {{message.payload[:100]!r}}")
+            return
+        if not isinstance(data, dict):
+            return
+        source = f"MQTT {{message.topic}}"
+        result = check_signature(data, source)
+        if result is None:
+            if data.get("command") == "cancel":
+                result = process_cancel(source)
+            else:
+                result = process_command(data, source)
+        body, status_code = result
+        client.publish(f"{{MQTT_TOPIC}}/result", json.dumps(dict(body, code=status_code)), qos=1)
+
+
+mqtt_bridge = MqttBridge() if TRANSPORT == "mqtt" else None
+
+
+def get_activation_fd():
+    """Listening socket handed over by systemd or launchd, or None"""
+    if os.environ.get("LISTEN_PID") == str(os.getpid()) and int(os.environ.get("LISTEN_FDS", "0")) > 0:
+        return SD_LISTEN_FDS_START
+    if sys.platform == "darwin":
+        try:
+            import ctypes
+
+            libc = ctypes.CDLL(None)
+            fds = ctypes.POINTER(ctypes.c_int)()
+            count = ctypes.c_size_t(0)
+            # Returns ESRCH when the process was not started by launchd
+            if libc.launch_activate_socket(b"Listeners", ctypes.byref(fds), ctypes.byref(count)) == 0 and count.value:
+                return fds[0]
+        except (AttributeError, OSError):
+            pass
+    return None
+
+
+last_request = time.monotonic()
+
+
+@app.before_request
+def track_activity():
+    global last_request
+    last_request = time.monotonic()
+
+
+def run_idle_exit():
+    """Exit a socket-activated agent once nothing needs it (runs in a thread)"""
+    while True:
+        time.sleep(30)
+        idle = time.monotonic() - last_request
+        if idle >= IDLE_EXIT_MINUTES * 60 and countdown.remaining() is None and broadcaster.subscriber_count() == 0:
+            logger.info(f"Idle for {{IDLE_EXIT_MINUTES}} minutes - exiting until the next request")
+            os._exit(0)
+
+
 if __name__ == "__main__":
     logger.info(f"Starting {{PC_NAME}} (PC{{PC_NUMBER}}) shutdown server on port 5000...")
     logger.info(f"Platform: {{sys.platform}}")
+    if mqtt_bridge is not None:
+        logger.info(f"Connecting to MQTT broker {{MQTT_BROKER}}:{{MQTT_PORT}} ({{MQTT_TOPIC}})...")
+        mqtt_bridge.start()
     logger.info(f"Attempting to register with ESP32 at {{ESP32_IP}}...")
 
     # Try to register with ESP32
     if send_status_to_esp32("Server starting..."):
         logger.info("Successfully registered with ESP32")
-        send_status_to_esp32("Online")
     else:
         logger.warning("Failed to register with ESP32 - continuing anyway")
 
+    # Forward later status transitions from a single background thread
+    forwarder_thread = threading.Thread(target=broadcaster.run_esp32_forwarder)
+    forwarder_thread.daemon = True
+    forwarder_thread.start()
+    publish_status("Online")
+
     logger.info("Server ready! Listening for shutdown commands...")
     logger.info("Press Ctrl+C to stop")
 
     try:
-        # Run Flask server
-        app.run(host="0.0.0.0", port=5000, debug=False)
+        listen_fd = get_activation_fd()
+        if listen_fd is not None:
+            # Started on demand: serve the socket the service manager listens on
+            logger.info("Using the listening socket passed by the service manager")
+            if IDLE_EXIT_MINUTES > 0:
+                idle_thread = threading.Thread(target=run_idle_exit)
+                idle_thread.daemon = True
+                idle_thread.start()
+            make_server("0.0.0.0", 5000, app, threaded=True, fd=listen_fd).serve_forever()
+        else:
+            # Run Flask server
+            app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
         send_status_to_esp32("Server stopped")
     except Exception as e:
         logger.error(f"Server error: {{e}}")
         send_status_to_esp32("Server error")
+    finally:
+        if mqtt_bridge is not None:
+            mqtt_bridge.stop()
 '''
 
     def get_run_batch_template(self, pc_num, pc_config, esp32_ip):
@@ -597,7 +2488,7 @@ REM {pc_config['name']} Shutdown Server Launcher
 REM This batch file runs the {pc_config['name']} shutdown script with administrator privileges
 REM 
 REM Installation:
-REM 1. Place this file in the same directory as pc{pc_num}_shutdown.py
+REM 1. Place this file in the same directory as {self.get_agent_file(pc_config)}
 REM 2. Right-click and "Run as administrator" 
 REM 3. Or set up Task Scheduler to run at startup with highest privileges
 REM
@@ -633,8 +2524,8 @@ if errorlevel 1 (
 )
 
 REM Check if the Python script exists
-if not exist "{pc_config['name'].lower()}_shutdown.py" (
-    echo ERROR: {pc_config['name'].lower()}_shutdown.py not found in current directory
+if not exist "{self.get_agent_file(pc_config)}" (
+    echo ERROR: {self.get_agent_file(pc_config)} not found in current directory
     echo Please ensure the script is in the same folder as this batch file
     echo Current directory: %CD%
     echo.
@@ -642,33 +2533,105 @@ if not exist "{pc_config['name'].lower()}_shutdown.py" (
     exit /b 1
 )
 
+{self.get_batch_dependency_steps(pc_config)}echo Dependencies OK. Starting server...
+echo.
+
+REM Run the Python script
+python {self.get_agent_file(pc_config)}
+
+REM If we get here, the script has stopped
+echo.
+echo ========================================
+echo Server has stopped.
+echo ========================================
+pause
+'''
+
+    def get_batch_dependency_steps(self, pc_config):
+        """Launcher steps that install the agent's packages on Windows"""
+        if self.agent_bundle_dir:
+            return f"REM Dependencies are bundled in {self.get_agent_file(pc_config)}\n"
+        return f'''REM Install from the bundled wheelhouse only when its marker changed
+if not exist "wheels\\wheelhouse.marker" goto online_deps
+fc /b "wheels\\wheelhouse.marker" "deps_installed.txt" >nul 2>&1
+if not errorlevel 1 goto deps_ok
+echo Installing Python packages from the bundled wheelhouse...
+python -m pip install --no-index --find-links wheels -r "wheels\\requirements.txt"
+if errorlevel 1 (
+    echo ERROR: Failed to install the bundled packages
+    echo Please run: python -m pip install --no-index --find-links wheels -r wheels\\requirements.txt
+    echo.
+    pause
+    exit /b 1
+)
+copy /y "wheels\\wheelhouse.marker" "deps_installed.txt" >nul
+goto deps_ok
+
+:online_deps
 REM Install required packages if needed
 echo Checking Python dependencies...
-python -c "import flask, requests" >nul 2>&1
+python -c "import {', '.join(AGENT_PACKAGES[package] for package in self.get_agent_packages())}" >nul 2>&1
 if errorlevel 1 (
     echo Installing required Python packages...
-    python -m pip install flask requests
+    python -m pip install {' '.join(self.get_agent_packages())}
     if errorlevel 1 (
         echo ERROR: Failed to install required packages
-        echo Please run: pip install flask requests
+        echo Please run: pip install {' '.join(self.get_agent_packages())}
         echo.
         pause
         exit /b 1
     )
 )
 
-echo Dependencies OK. Starting server...
-echo.
+:deps_ok
+'''
 
-REM Run the Python script
-python {pc_config['name'].lower()}_shutdown.py
+    def get_shell_dependency_steps(self, pc_config):
+        """Launcher steps that install the agent's packages on Linux or macOS"""
+        if self.agent_bundle_dir:
+            return f"# Dependencies are bundled in {self.get_agent_file(pc_config)}\n"
+        return f'''if [ -f wheels/wheelhouse.marker ]; then
+    # Install from the bundled wheelhouse only when its marker changed
+    if ! cmp -s wheels/wheelhouse.marker deps_installed.txt; then
+        echo "Installing Python packages from the bundled wheelhouse..."
+        if ! python3 -m pip install --no-index --find-links wheels -r wheels/requirements.txt; then
+            echo "ERROR: Failed to install the bundled packages"
+            echo "Please run: python3 -m pip install --no-index --find-links wheels -r wheels/requirements.txt"
+            exit 1
+        fi
+        cp wheels/wheelhouse.marker deps_installed.txt
+    fi
+else
+    echo "Checking Python dependencies..."
+    if ! python3 -c "import {', '.join(AGENT_PACKAGES[package] for package in self.get_agent_packages())}" >/dev/null 2>&1; then
+        echo "Installing required Python packages..."
+        if ! python3 -m pip install {' '.join(self.get_agent_packages())}; then
+            echo "ERROR: Failed to install required packages"
+            echo "Please run: python3 -m pip install {' '.join(self.get_agent_packages())}"
+            exit 1
+        fi
+    fi
+fi
+'''
 
-REM If we get here, the script has stopped
-echo.
-echo ========================================
-echo Server has stopped.
-echo ========================================
-pause
+    def get_install_dependency_steps(self, pc_config):
+        """Service installer steps that make the agent's packages available to root"""
+        if self.agent_bundle_dir:
+            return f"# Dependencies are bundled in {self.get_agent_file(pc_config)}\n"
+        imports = ', '.join(AGENT_PACKAGES[package] for package in self.get_agent_packages())
+        return f'''if [ -f "$SCRIPT_DIR/wheels/wheelhouse.marker" ] && ! cmp -s "$SCRIPT_DIR/wheels/wheelhouse.marker" "$INSTALL_DIR/deps_installed.txt"; then
+    echo "Installing Python packages from the bundled wheelhouse..."
+    if "$PYTHON" -m pip install --no-index --find-links "$SCRIPT_DIR/wheels" -r "$SCRIPT_DIR/wheels/requirements.txt"; then
+        mkdir -p "$INSTALL_DIR"
+        cp "$SCRIPT_DIR/wheels/wheelhouse.marker" "$INSTALL_DIR/deps_installed.txt"
+    fi
+fi
+if ! "$PYTHON" -c "import {imports}" >/dev/null 2>&1; then
+    echo "ERROR: Required Python packages are missing for $PYTHON"
+    echo "Please run: sudo $PYTHON -m pip install {' '.join(self.get_agent_packages())}"
+    echo "(or install them from your system package manager)"
+    exit 1
+fi
 '''
 
     def get_service_batch_template(self, pc_num, pc_config):
@@ -746,10 +2709,308 @@ echo - Restart your computer, or
 echo - Run: schtasks /run /tn "{pc_config['name']}_Shutdown_Server"
 echo.
 pause
+'''
+
+    def get_pc_os(self, pc_config):
+        """Operating system a PC's agent and service files are generated for"""
+        pc_os = pc_config.get('os', 'windows').strip().lower()
+        if pc_os not in PC_OPERATING_SYSTEMS:
+            raise ValueError(f"os for {pc_config['name']} must be one of {', '.join(PC_OPERATING_SYSTEMS)}")
+        return pc_os
+
+    def get_service_names(self, pc_config):
+        """Service unit / launchd label and install folder for a Linux or macOS PC"""
+        name = pc_config['name'].lower()
+        pc_os = self.get_pc_os(pc_config)
+        unit = f"pc-controller-{name}" if pc_os == 'linux' else f"com.esp32-pc-controller.{name}"
+        return unit, f"{AGENT_INSTALL_DIRS.get(pc_os, '')}/{name}"
+
+    def get_service_files(self, pc_num, pc_config, esp32_ip):
+        """(filename, content, mode) of the launcher and auto-start files for a PC"""
+        name = pc_config['name'].lower()
+        pc_os = self.get_pc_os(pc_config)
+        if pc_os == 'windows':
+            return [
+                (f"run_{name}.bat", self.get_run_batch_template(pc_num, pc_config, esp32_ip), 0o755),
+                (f"install_{name}_service.bat", self.get_service_batch_template(pc_num, pc_config), 0o755),
+            ]
+        unit, _ = self.get_service_names(pc_config)
+        files = [(f"run_{name}.sh", self.get_run_shell_template(pc_num, pc_config, esp32_ip), 0o755)]
+        if pc_os == 'linux':
+            files.append((f"{unit}.service", self.get_systemd_service_template(pc_config), 0o644))
+            if not self.get_mqtt_config():
+                files.append((f"{unit}.socket", self.get_systemd_socket_template(pc_config), 0o644))
+        else:
+            files.append((f"{unit}.plist", self.get_launchd_plist_template(pc_config), 0o644))
+        files.append((f"install_{name}_service.sh", self.get_service_shell_template(pc_config), 0o755))
+        return files
+
+    def get_run_shell_template(self, pc_num, pc_config, esp32_ip):
+        """Generate the foreground launcher for a Linux or macOS PC"""
+        name = pc_config['name'].lower()
+        return f'''#!/bin/sh
+# {pc_config['name']} Shutdown Server Launcher
+# Runs the {pc_config['name']} shutdown server in the foreground. Power commands need root,
+# so start it with sudo; install_{name}_service.sh sets up start on demand instead.
+#
+# Generated by ESP32 PC Controller Template Generator
+
+cd "$(dirname "$0")" || exit 1
+
+echo "========================================"
+echo "     {pc_config['name']} Shutdown Server"
+echo "========================================"
+echo "ESP32 IP: {esp32_ip}"
+echo "Listen Port: 5000"
+echo "PC IP: {pc_config['ip_address']}"
+echo "MAC Address: {pc_config['mac_address']}"
+echo
+
+if ! command -v python3 >/dev/null 2>&1; then
+    echo "ERROR: python3 is not installed or not in PATH"
+    exit 1
+fi
+
+{self.get_shell_dependency_steps(pc_config)}
+echo "Dependencies OK. Starting server..."
+exec python3 {self.get_agent_file(pc_config)}
+'''
+
+    def get_systemd_service_template(self, pc_config):
+        """Generate the systemd service for a Linux PC's agent"""
+        unit, install_dir = self.get_service_names(pc_config)
+        name = pc_config['name'].lower()
+        if self.get_mqtt_config():
+            # The MQTT bridge must stay connected, so the agent starts at boot
+            activation = '''Wants=network-online.target
+After=network-online.target'''
+            restart = '''Restart=always
+RestartSec=5'''
+            install = '''WantedBy=multi-user.target'''
+        else:
+            activation = f'''Requires={unit}.socket
+After=network-online.target {unit}.socket'''
+            restart = '''# Exits by itself after agent_idle_exit idle minutes; the socket starts it again
+Restart=on-failure'''
+            install = f'''Also={unit}.socket'''
+        return f'''# {pc_config['name']} shutdown agent (ESP32 PC Controller)
+# Installed by install_{name}_service.sh
+#
+# Generated by ESP32 PC Controller Template Generator
+
+[Unit]
+Description={pc_config['name']} shutdown agent (ESP32 PC Controller)
+{activation}
+
+[Service]
+Type=simple
+WorkingDirectory={install_dir}
+ExecStart=/usr/bin/python3 {install_dir}/{self.get_agent_file(pc_config)}
+{restart}
+
+[Install]
+{install}
+'''
+
+    def get_systemd_socket_template(self, pc_config):
+        """Generate the systemd socket that starts a Linux PC's agent on demand"""
+        unit, _ = self.get_service_names(pc_config)
+        return f'''# {pc_config['name']} shutdown agent socket (ESP32 PC Controller)
+# systemd listens on port 5000 and starts {unit}.service on the first request
+#
+# Generated by ESP32 PC Controller Template Generator
+
+[Unit]
+Description={pc_config['name']} shutdown agent socket (ESP32 PC Controller)
+
+[Socket]
+ListenStream=5000
+# One agent process serves every connection
+Accept=no
+
+[Install]
+WantedBy=sockets.target
+'''
+
+    def get_launchd_plist_template(self, pc_config):
+        """Generate the launchd daemon for a macOS PC's agent"""
+        label, install_dir = self.get_service_names(pc_config)
+        name = pc_config['name'].lower()
+        if self.get_mqtt_config():
+            # The MQTT bridge must stay connected, so the agent starts at boot
+            activation = '''    <key>RunAtLoad</key>
+    <true/>
+    <key>KeepAlive</key>
+    <true/>'''
+        else:
+            activation = '''    <!-- launchd listens on port 5000 and starts the agent on the first request -->
+    <key>Sockets</key>
+    <dict>
+        <key>Listeners</key>
+        <dict>
+            <key>SockServiceName</key>
+            <string>5000</string>
+            <key>SockType</key>
+            <string>stream</string>
+            <key>SockFamily</key>
+            <string>IPv4</string>
+        </dict>
+    </dict>'''
+        return f'''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
+<!-- {pc_config['name']} shutdown agent (ESP32 PC Controller), installed by install_{name}_service.sh -->
+<!-- Generated by ESP32 PC Controller Template Generator -->
+<plist version="1.0">
+<dict>
+    <key>Label</key>
+    <string>{label}</string>
+    <key>ProgramArguments</key>
+    <array>
+        <string>/usr/bin/python3</string>
+        <string>{install_dir}/{self.get_agent_file(pc_config)}</string>
+    </array>
+    <key>WorkingDirectory</key>
+    <string>{install_dir}</string>
+{activation}
+    <key>StandardOutPath</key>
+    <string>{install_dir}/launchd.log</string>
+    <key>StandardErrorPath</key>
+    <string>{install_dir}/launchd.log</string>
+</dict>
+</plist>
+'''
+
+    def get_service_shell_template(self, pc_config):
+        """Generate the service installer for a Linux or macOS PC"""
+        unit, install_dir = self.get_service_names(pc_config)
+        name = pc_config['name'].lower()
+        if self.get_pc_os(pc_config) == 'linux':
+            if self.get_mqtt_config():
+                enable = f'''cp "$SCRIPT_DIR/{unit}.service" /etc/systemd/system/
+sed -i "s|/usr/bin/python3|$PYTHON|" /etc/systemd/system/{unit}.service
+systemctl daemon-reload
+systemctl enable --now {unit}.service'''
+                started = "The agent starts at boot and stays connected to the MQTT broker."
+            else:
+                enable = f'''cp "$SCRIPT_DIR/{unit}.service" "$SCRIPT_DIR/{unit}.socket" /etc/systemd/system/
+sed -i "s|/usr/bin/python3|$PYTHON|" /etc/systemd/system/{unit}.service
+systemctl daemon-reload
+systemctl enable --now {unit}.socket'''
+                started = "systemd now listens on port 5000 and starts the agent on the first request."
+            units = f"{unit}.service" if self.get_mqtt_config() else f"{unit}.socket {unit}.service"
+            manage = f'''echo "  Status:    systemctl status {unit}.service"
+echo "  Logs:      journalctl -u {unit}.service"
+echo "  Uninstall: sudo systemctl disable --now {units}; sudo rm /etc/systemd/system/{unit}.*"'''
+            system = "systemd"
+        else:
+            enable = f'''PLIST=/Library/LaunchDaemons/{unit}.plist
+launchctl bootout system "$PLIST" 2>/dev/null || true
+sed "s|/usr/bin/python3|$PYTHON|" "$SCRIPT_DIR/{unit}.plist" > "$PLIST"
+chown root:wheel "$PLIST"
+chmod 644 "$PLIST"
+launchctl bootstrap system "$PLIST"'''
+            started = ("The agent starts at boot and stays connected to the MQTT broker." if self.get_mqtt_config()
+                       else "launchd now listens on port 5000 and starts the agent on the first request.")
+            manage = f'''echo "  Status:    sudo launchctl print system/{unit}"
+echo "  Logs:      {install_dir}/pc_shutdown.log"
+echo "  Uninstall: sudo launchctl bootout system /Library/LaunchDaemons/{unit}.plist"'''
+            system = "launchd"
+        return f'''#!/bin/sh
+# {pc_config['name']} Service Installer ({system})
+# Copies this folder to {install_dir} and registers the shutdown server
+# with {system}. Run as root: sudo ./install_{name}_service.sh
+#
+# Generated by ESP32 PC Controller Template Generator
+
+set -e
+
+if [ "$(id -u)" -ne 0 ]; then
+    echo "ERROR: This script must be run as root (sudo $0)"
+    exit 1
+fi
+
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+INSTALL_DIR="{install_dir}"
+
+PYTHON=$(command -v python3) || {{
+    echo "ERROR: python3 is not installed or not in PATH"
+    exit 1
+}}
+{self.get_install_dependency_steps(pc_config)}
+echo "Installing {pc_config['name']} shutdown server to $INSTALL_DIR..."
+mkdir -p "$INSTALL_DIR"
+if [ "$SCRIPT_DIR" != "$INSTALL_DIR" ]; then
+    cp -Rp "$SCRIPT_DIR"/. "$INSTALL_DIR"/
+fi
+
+{enable}
+
+echo
+echo "Installation completed successfully!"
+echo "{started}"
+{manage}
 '''
 
     def get_pc_readme_template(self, pc_num, pc_config, esp32_ip):
         """Generate README for a specific PC"""
+        name = pc_config['name'].lower()
+        pc_os = self.get_pc_os(pc_config)
+        descriptions = {
+            f"run_{name}.bat": "Manual launcher (run as administrator)",
+            f"install_{name}_service.bat": "Auto-startup installer (run as administrator)",
+            f"run_{name}.sh": "Manual launcher (sudo ./run_" + name + ".sh)",
+            f"install_{name}_service.sh": "Service installer (sudo ./install_" + name + "_service.sh)",
+        }
+        files = [(self.get_agent_file(pc_config), "Python shutdown server bundle (agent and packages)"
+                  if self.agent_bundle_dir else "Python shutdown server script")]
+        for filename, _, _ in self.get_service_files(pc_num, pc_config, esp32_ip):
+            files.append((filename, descriptions.get(filename, "Service definition used by the installer")))
+        if self.wheelhouse_dir:
+            files.append(("wheels/", "Bundled Python packages for offline installs"))
+        files.append(("README.txt", "This file"))
+        width = max(len(filename) for filename, _ in files) + 1
+        file_list = '\n'.join(f"{index}. {filename.ljust(width)}- {description}"
+                              for index, (filename, description) in enumerate(files, 1))
+        if pc_os == 'windows':
+            setup = f'''1. Copy this entire folder to {pc_config['name']}
+2. Right-click "run_{name}.bat" and select "Run as administrator"
+3. Test shutdown from ESP32 web interface at http://{esp32_ip}
+4. If working, run "install_{name}_service.bat" as administrator for auto-startup'''
+            requirements = '''- Windows firewall allows port 5000
+- Administrator privileges for shutdown commands'''
+            troubleshooting = '''- If Python not found: Install Python from python.org
+- If firewall blocks: Allow port 5000 in Windows Firewall
+- If shutdown fails: Check administrator privileges'''
+        else:
+            _, install_dir = self.get_service_names(pc_config)
+            on_demand = "" if self.get_mqtt_config() else " (started on the first request)"
+            setup = f'''1. Copy this entire folder to {pc_config['name']}
+2. Run "sudo ./run_{name}.sh" and test shutdown from http://{esp32_ip}
+3. Stop it with Ctrl+C, then run "sudo ./install_{name}_service.sh"
+   to install it to {install_dir} as a {'systemd' if pc_os == 'linux' else 'launchd'} service{on_demand}'''
+            requirements = '''- Firewall allows incoming TCP port 5000
+- Root privileges for shutdown commands'''
+            troubleshooting = f'''- If python3 not found: Install it with your package manager{' or Xcode command line tools' if pc_os == 'macos' else ''}
+- If shutdown fails: Make sure the server runs as root
+- Service logs: {'journalctl -u ' + self.get_service_names(pc_config)[0] + '.service' if pc_os == 'linux' else install_dir + '/pc_shutdown.log'}'''
+        if self.agent_bundle_dir:
+            packages = f'''- Python 3 installed (Python {bytecode_tag()} starts fastest, the bundled bytecode is built for it)
+- No internet needed: {self.get_agent_file(pc_config)} contains every package'''
+        elif self.wheelhouse_dir:
+            python_versions = ', '.join(parse_python_versions(self.config.get('GENERAL', 'wheelhouse_python')))
+            packages = f'''- Python installed (one of {python_versions})
+- No internet needed: packages install once from wheels/ (again only when they change)'''
+        else:
+            packages = '''- Python 3.7+ installed
+- Internet connection for package installation'''
+        relay = self.get_wol_relay(pc_num, pc_config)
+        relayed = [relayed_config['name'] for _, relayed_config in self.get_relayed_pcs(pc_num)]
+        if relayed:
+            wake = f"relays wakes for {', '.join(relayed)} (keep this PC on)"
+        elif relay:
+            wake = f"relayed by {relay[1]['name']} (outside the ESP32's subnet)"
+        else:
+            wake = "ESP32 broadcast"
         return f'''PC{pc_num} ({pc_config['name']}) - ESP32 Controller Setup
 ========================================================
 
@@ -760,37 +3021,33 @@ This folder contains all files needed to set up remote shutdown control for:
 
 FILES IN THIS FOLDER:
 --------------------
-1. pc{pc_num}_shutdown.py        - Python shutdown server script
-2. run_pc{pc_num}.bat            - Manual launcher (run as administrator)
-3. install_pc{pc_num}_service.bat - Auto-startup installer (run as administrator)
-4. README.txt                    - This file
+{file_list}
 
 QUICK SETUP:
 -----------
-1. Copy this entire folder to {pc_config['name']}
-2. Right-click "run_pc{pc_num}.bat" and select "Run as administrator"
-3. Test shutdown from ESP32 web interface at http://{esp32_ip}
-4. If working, run "install_pc{pc_num}_service.bat" as administrator for auto-startup
+{setup}
 
 CONFIGURATION:
 -------------
 ESP32 IP: {esp32_ip}
 PC{pc_num} Listen Port: 5000
-Button GPIOs: ON={pc_config['on_button_gpio']}, OFF={pc_config['off_button_gpio']}
+Shutdown countdown: {self.get_shutdown_delay(pc_config)}s (POST /cancel to abort)
+Power actions: {', '.join(self.get_power_actions(pc_config))}
+Request signing: {self.get_agent_auth(pc_config)} (key in agent_key.txt - keep it private)
+Operating system: {pc_os}
+Wake-on-LAN: {wake}
+Transport: {f"MQTT via {self.get_mqtt_config()['broker']} ({self.get_mqtt_topic(self.get_mqtt_config(), pc_config, '#')})" if self.get_mqtt_config() else "HTTP"}
+Button GPIOs: {f"ON={pc_config['on_button_gpio']}, OFF={pc_config['off_button_gpio']}" if self.has_buttons(pc_config) else "none (web/Home Assistant control only)"}
 
 REQUIREMENTS:
 ------------
-- Python 3.7+ installed
-- Internet connection for package installation
-- Windows firewall allows port 5000
-- Administrator privileges for shutdown commands
+{packages}
+{requirements}
 
 TROUBLESHOOTING:
 ---------------
-- If Python not found: Install Python from python.org
-- If packages fail: Run "pip install flask requests" manually
-- If firewall blocks: Allow port 5000 in Windows Firewall
-- If shutdown fails: Check administrator privileges
+- If packages fail: Run "pip install {' '.join(self.get_agent_packages())}" manually
+{troubleshooting}
 
 For more help, see the main project README.md and docs/ folder.
 
@@ -798,18 +3055,98 @@ Generated by ESP32 PC Controller Template Generator
 '''
 
 
-def main():
+def parse_list(value):
+    """Split a comma separated command line value, ignoring blanks"""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_artifacts(value):
+    artifacts = parse_list(value)
+    unknown = [artifact for artifact in artifacts if artifact not in ARTIFACTS]
+    if unknown or not artifacts:
+        raise argparse.ArgumentTypeError(f"expected a comma separated list of {', '.join(ARTIFACTS)}")
+    return artifacts
+
+
+def main(argv=None):
     """Main function to run the template generator"""
-    generator = TemplateGenerator()
+    parser = argparse.ArgumentParser(
+        description="Generate the ESP32 firmware YAML and the PC agent folders",
+        epilog=f"Exit codes: {EXIT_OK} success, {EXIT_FAILED} generation failed, "
+               f"{EXIT_USAGE} bad arguments or unknown PC, {EXIT_INVALID_CONFIG} invalid configuration, "
+               f"{EXIT_SYNC_FAILED} a PC folder failed to sync, {EXIT_INVALID_ARTIFACTS} generated files failed validation, "
+               f"{EXIT_BUILD_FAILED} the firmware build failed",
+    )
+    parser.add_argument("-c", "--config", default="config.ini",
+                        help="Base configuration file (default: config.ini)")
+    parser.add_argument("-o", "--output",
+                        help="Deployment folder, overriding [GENERAL] deployment_path")
+    parser.add_argument("--only", type=parse_list, metavar="PCS",
+                        help="Comma separated PCs to regenerate, by section or name (e.g. PC3,PC7)")
+    parser.add_argument("--exclude", type=parse_list, metavar="PCS",
+                        help="Comma separated PCs to leave untouched")
+    parser.add_argument("--artifacts", type=parse_artifacts, default=list(ARTIFACTS),
+                        help=f"Comma separated artifacts to write (default: {','.join(ARTIFACTS)})")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="Skip checking the generated YAML, agents and batch files")
+    parser.add_argument("--build", action="store_true",
+                        help="Compile the firmware with ESPHome afterwards, unless its inputs are unchanged")
+    parser.add_argument("--sync", action="store_true",
+                        help="Push the regenerated PC folders to their [PCn] sync_target afterwards")
+    args = parser.parse_args(argv)
+    
+    if not Path(args.config).exists():
+        print(f"❌ Error: config file not found: {args.config}")
+        return EXIT_USAGE
     
     try:
-        generator.generate_all()
+        generator = TemplateGenerator(args.config)
+        if args.output:
+            generator.config['GENERAL']['deployment_path'] = args.output
+        pc_nums = generator.generate_all(only=args.only, exclude=args.exclude, artifacts=args.artifacts,
+                                         validate=not args.no_validate)
+    except PCSelectionError as e:
+        print(f"❌ Error: {e}")
+        return EXIT_USAGE
+    except (ConfigSchemaError, configparser.Error) as e:
+        print(f"❌ Error: {e}")
+        return EXIT_INVALID_CONFIG
+    except ArtifactValidationError as e:
+        print(f"❌ Error: {e}")
+        return EXIT_INVALID_ARTIFACTS
     except Exception as e:
         print(f"❌ Error: {e}")
-        return 1
+        return EXIT_FAILED
+    
+    deploy_dir = Path(generator.config.get('GENERAL', 'deployment_path'))
+    if args.build:
+        print()
+        try:
+            _, _, failed = build_all([deploy_dir / FIRMWARE_YAML], jobs=1)
+        except OSError as e:
+            print(f"❌ Error: cannot build {deploy_dir / FIRMWARE_YAML}: {e}")
+            return EXIT_BUILD_FAILED
+        if failed:
+            return EXIT_BUILD_FAILED
+    
+    if args.sync:
+        config = generator.config
+        try:
+            jobs = get_sync_jobs(config, deploy_dir, pc_nums)
+            if not jobs:
+                print("\nℹ️  No regenerated PC has a sync_target - nothing to sync")
+                return EXIT_OK
+            print()
+            workers = config.getint('GENERAL', 'sync_workers', fallback=DEFAULT_WORKERS)
+            _, failures = sync_all(jobs, workers)
+        except (OSError, ValueError, configparser.Error) as e:
+            print(f"❌ Error: sync failed: {e}")
+            return EXIT_SYNC_FAILED
+        if failures:
+            return EXIT_SYNC_FAILED
     
-    return 0
+    return EXIT_OK
 
 
 if __name__ == "__main__":
-    exit(main())
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Shared fixtures: the project root on sys.path and a generated PC agent
+imported in-process, so its Flask app can be driven with the test client.
+"""
+
+import importlib.util
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fleet_dashboard import sign_command  # noqa: E402
+from template_generator import TemplateGenerator  # noqa: E402
+
+AGENT_KEY = 'test-agent-key'
+
+
+def signed(command, request_id, key=AGENT_KEY, timestamp=None, **fields):
+    """Request body signed the way the ESP32 and the GUI sign it"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    body = dict(fields, command=command, request_id=request_id, timestamp=timestamp)
+    message_id = request_id if 'macs' not in fields else f"{request_id}:{fields['macs']}"
+    body['signature'] = sign_command(key, timestamp, command, message_id)
+    return body
+
+
+def wait_until(condition, timeout=2.0):
+    """Poll for a condition set by one of the agent's worker threads"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def load_agent(tmp_path, monkeypatch):
+    """Generate PC1's agent from config.ini with setting overrides and import it
+
+    Power commands are recorded in agent.executed instead of being run.
+    """
+    def load(**settings):
+        generator = TemplateGenerator(str(ROOT / 'config.ini'))
+        generator.config['PC1'].update(settings)
+        source = generator.get_python_script_template(1, dict(generator.config['PC1']),
+                                                      generator.config.get('ESP32', 'static_ip'))
+        (tmp_path / 'agent_key.txt').write_text(AGENT_KEY)
+        agent_path = tmp_path / 'pc1_shutdown.py'
+        agent_path.write_text(source, encoding='utf-8')
+        monkeypatch.chdir(tmp_path)
+        spec = importlib.util.spec_from_file_location(f"agent_{uuid.uuid4().hex}", agent_path)
+        agent = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(agent)
+        agent.executed = []
+        monkeypatch.setattr(agent, 'run_power_command', lambda command: agent.executed.append(command) or True)
+        return agent
+
+    yield load
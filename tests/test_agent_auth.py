@@ -0,0 +1,121 @@
+"""HMAC request signing on the generated PC agent and the secrets it is keyed from"""
+
+import os
+import stat
+import time
+
+import pytest
+
+from conftest import AGENT_KEY, signed, wait_until
+from scripts.generate_api_key import ensure_secrets, generate_agent_key, read_secrets_file
+
+
+@pytest.fixture
+def agent(load_agent):
+    return load_agent(agent_auth='hmac', agent_rate_burst='20')
+
+
+@pytest.fixture
+def client(agent):
+    return agent.app.test_client()
+
+
+def test_signed_request_is_accepted(agent, client):
+    response = client.post('/command', json=signed('lock', 'req-1'))
+    assert response.status_code == 200
+    assert wait_until(lambda: agent.executed == ['lock'])
+
+
+@pytest.mark.parametrize('path', ['/command', '/shutdown', '/cancel', '/wake'])
+def test_unsigned_request_is_rejected(client, path):
+    response = client.post(path, json={'command': 'lock', 'request_id': 'req-1'})
+    assert response.status_code == 401
+    assert response.get_json()['message'] == "Missing request signature"
+
+
+def test_wrong_key_is_rejected(agent, client):
+    response = client.post('/command', json=signed('lock', 'req-1', key='not-the-agent-key'))
+    assert response.status_code == 401
+    assert response.get_json()['message'] == "Invalid request signature"
+    assert agent.executed == []
+
+
+def test_tampered_command_is_rejected(agent, client):
+    body = signed('lock', 'req-1')
+    body['command'] = 'shutdown'
+    assert client.post('/command', json=body).status_code == 401
+    body = signed('lock', 'req-2')
+    body['request_id'] = 'req-3'
+    assert client.post('/command', json=body).status_code == 401
+
+
+@pytest.mark.parametrize('skew', [-1, 1])
+def test_timestamp_outside_replay_window_is_rejected(agent, client, skew):
+    timestamp = int(time.time()) + skew * (agent.REPLAY_WINDOW + 5)
+    response = client.post('/command', json=signed('lock', 'req-1', timestamp=timestamp))
+    assert response.status_code == 401
+    assert response.get_json()['message'] == "Request timestamp outside replay window"
+
+
+def test_malformed_timestamp_is_rejected(client):
+    body = signed('lock', 'req-1')
+    body['timestamp'] = 'yesterday'
+    assert client.post('/command', json=body).status_code == 401
+
+
+def test_retry_of_same_request_is_answered_from_cache(agent, client):
+    body = signed('lock', 'req-1')
+    assert client.post('/command', json=body).status_code == 200
+    retry = client.post('/command', json=body)
+    assert retry.status_code == 202
+    assert retry.get_json()['duplicate'] is True
+    assert wait_until(lambda: agent.executed == ['lock'])
+
+
+def test_replayed_signature_is_rejected(agent, client, monkeypatch):
+    body = signed('lock', 'req-1')
+    assert client.post('/command', json=body).status_code == 200
+    # Once the request id is forgotten, the same signature must not run the command again
+    monkeypatch.setattr(agent, 'recent_requests', agent.RequestDeduplicator(agent.REQUEST_DEDUP_WINDOW))
+    response = client.post('/command', json=body)
+    assert response.status_code == 409
+    assert response.get_json()['message'] == "Replayed request"
+    assert wait_until(lambda: agent.executed == ['lock'])
+
+
+def test_deduplicator_forgets_after_window(agent, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(agent.time, 'monotonic', lambda: now[0])
+    cache = agent.RequestDeduplicator(60)
+    cache.remember('lock:req-1', {'status': 'success'})
+    now[0] += 59
+    assert cache.lookup('lock:req-1') == {'status': 'success'}
+    now[0] += 2
+    assert cache.lookup('lock:req-1') is None
+
+
+def test_unsigned_request_is_accepted_without_auth(load_agent):
+    agent = load_agent(agent_auth='none', agent_rate_burst='20')
+    response = agent.app.test_client().post('/command', json={'command': 'lock', 'request_id': 'req-1'})
+    assert response.status_code == 200
+
+
+def test_agent_keys_are_random_hex():
+    keys = {generate_agent_key() for _ in range(10)}
+    assert len(keys) == 10
+    assert all(len(key) == 64 and int(key, 16) >= 0 for key in keys)
+
+
+def test_ensure_secrets_never_rotates_existing_keys(tmp_path):
+    secrets_path = tmp_path / 'secrets.yaml'
+    created = ensure_secrets(secrets_path, {'pc1_agent_key': generate_agent_key, 'api_key': 'fixed'})
+    assert created == ['pc1_agent_key', 'api_key']
+    first = read_secrets_file(secrets_path)
+    assert first['api_key'] == 'fixed'
+    assert stat.S_IMODE(os.stat(secrets_path).st_mode) == 0o600
+
+    created = ensure_secrets(secrets_path, {'pc1_agent_key': generate_agent_key, 'pc2_agent_key': AGENT_KEY})
+    assert created == ['pc2_agent_key']
+    second = read_secrets_file(secrets_path)
+    assert second['pc1_agent_key'] == first['pc1_agent_key']
+    assert second['pc2_agent_key'] == AGENT_KEY
@@ -0,0 +1,28 @@
+"""Power commands and countdown cancellation on the generated PC agent"""
+
+from conftest import signed
+
+
+def test_cancel_is_not_locked_out_by_commands(load_agent):
+    agent = load_agent(agent_auth='hmac', agent_rate_burst='3', shutdown_delay='30')
+    client = agent.app.test_client()
+
+    statuses = [client.post('/shutdown', json=signed('shutdown', f"req-{index}")).status_code
+                for index in range(3)]
+    assert statuses == [200, 409, 409]
+    # The command bucket is now empty, which must not stop the countdown being cancelled
+    assert client.post('/shutdown', json=signed('shutdown', 'req-3')).status_code == 429
+
+    response = client.post('/cancel', json=signed('cancel', 'cancel-1'))
+    assert response.status_code == 200
+    assert agent.countdown.remaining() is None
+    assert agent.executed == []
+
+
+def test_macos_agent_has_no_hibernate_command(load_agent):
+    agent = load_agent(os='macos', agent_auth='hmac', power_actions='shutdown,restart,hibernate')
+    assert agent.ENABLED_COMMANDS == ['shutdown', 'restart']
+
+    response = agent.app.test_client().post('/command', json=signed('hibernate', 'req-1'))
+    assert response.status_code != 200
+    assert agent.executed == []
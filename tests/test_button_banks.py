@@ -0,0 +1,38 @@
+"""I2C bus frequency of the button banks in button_banks.py"""
+
+import configparser
+
+import pytest
+
+from button_banks import i2c_frequency, load_banks, validate_banks
+
+
+def make_banks(**banks):
+    config = configparser.ConfigParser()
+    for section, settings in banks.items():
+        config[section] = settings
+    return load_banks(config)
+
+
+def test_frequency_defaults_to_the_chip_rating():
+    banks = make_banks(BANK1={'type': 'pcf8574', 'address': '0x20'})
+    assert banks['BANK1']['frequency'] == '100kHz'
+    assert i2c_frequency(banks) == '100kHz'
+
+
+def test_shared_bus_runs_at_the_slowest_bank():
+    banks = make_banks(BANK1={'type': 'mcp23017', 'address': '0x20', 'frequency': '400kHz'},
+                       BANK2={'type': 'pcf8574', 'address': '0x21', 'frequency': '100kHz'})
+    assert i2c_frequency(banks) == '100kHz'
+
+
+@pytest.mark.parametrize('bank_type, frequency, valid', [
+    ('pcf8574', '100kHz', True),
+    ('pcf8574', '400kHz', False),
+    ('mcp23017', '400000Hz', True),
+    ('mcp23017', '1000kHz', False),
+])
+def test_frequency_above_the_chip_rating_is_rejected(bank_type, frequency, valid):
+    errors = []
+    validate_banks(make_banks(BANK1={'type': bank_type, 'address': '0x20', 'frequency': frequency}), errors)
+    assert (errors == []) == valid
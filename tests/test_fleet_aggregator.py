@@ -0,0 +1,37 @@
+"""Cached fleet snapshot and its ETag in fleet_aggregator.py"""
+
+import json
+
+from fleet_aggregator import FleetState
+
+
+def make_fleet():
+    fleet = FleetState('pc-controller', '192.168.1.50')
+    fleet.add_pc('PC1', '192.168.1.100')
+    return fleet
+
+
+def test_etag_is_stable_while_nothing_changes():
+    fleet = make_fleet()
+    etag, body = fleet.snapshot()
+    assert fleet.snapshot() == (etag, body)
+
+
+def test_heartbeat_changes_the_etag_without_an_event():
+    fleet = make_fleet()
+    subscriber = fleet.subscribe()
+    etag, _ = fleet.snapshot()
+    fleet.update_pc('PC1', last_seen=1000.0, latency_ms=3.5)
+    new_etag, body = fleet.snapshot()
+    assert new_etag != etag
+    assert json.loads(body)['pcs'][0]['latency_ms'] == 3.5
+    assert subscriber.empty()
+
+
+def test_state_change_changes_the_etag_and_publishes():
+    fleet = make_fleet()
+    subscriber = fleet.subscribe()
+    etag, _ = fleet.snapshot()
+    fleet.update_pc('PC1', online=True, state='Online')
+    assert fleet.snapshot()[0] != etag
+    assert subscriber.get_nowait()['pc']['state'] == 'Online'
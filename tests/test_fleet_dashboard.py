@@ -0,0 +1,47 @@
+"""Wake-on-LAN fallback in fleet_dashboard.py"""
+
+import asyncio
+
+import pytest
+
+import fleet_dashboard
+from fleet_dashboard import wake_pc
+
+MAC = 'AA:BB:CC:DD:EE:FF'
+
+
+@pytest.fixture
+def broadcasts(monkeypatch):
+    sent = []
+    monkeypatch.setattr(fleet_dashboard, 'send_magic_packet', lambda mac: sent.append(mac))
+    return sent
+
+
+def answer_with(monkeypatch, result):
+    async def http_request(*args):
+        if isinstance(result, Exception):
+            raise result
+        return result, {}, b''
+    monkeypatch.setattr(fleet_dashboard, 'http_request', http_request)
+
+
+def wake(monkeypatch, result):
+    answer_with(monkeypatch, result)
+    return asyncio.run(wake_pc('192.168.1.50', 'PC1', MAC, 0.1))
+
+
+def test_esp32_sends_the_wake(monkeypatch, broadcasts):
+    assert wake(monkeypatch, 200) == (True, "Wake-on-LAN sent by the ESP32")
+    assert broadcasts == []
+
+
+def test_esp32_error_is_reported_without_broadcast(monkeypatch, broadcasts):
+    assert wake(monkeypatch, 404) == (False, "ESP32 answered HTTP 404")
+    assert broadcasts == []
+
+
+@pytest.mark.parametrize('error', [ConnectionRefusedError(), asyncio.TimeoutError()])
+def test_unreachable_esp32_falls_back_to_local_broadcast(monkeypatch, broadcasts, error):
+    sent, message = wake(monkeypatch, error)
+    assert sent and "only wakes the PC if it is on this computer's subnet" in message
+    assert broadcasts == [MAC]
@@ -0,0 +1,141 @@
+"""Delta encoding and folder sync in scripts/sync_pcs.py"""
+
+import json
+import os
+import random
+
+import pytest
+
+from scripts.sync_pcs import (
+    COPY_TOKEN_SIZE,
+    apply_delta,
+    block_signatures,
+    block_size_for,
+    compute_delta,
+    delta_size,
+    sync_folder,
+)
+
+
+def make_data(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+def round_trip(old, new, block_size=None):
+    """Delta from old to new, asserting it rebuilds new exactly"""
+    block_size = block_size or block_size_for(len(old))
+    ops = compute_delta(new, block_signatures(old, block_size), block_size, len(old))
+    assert apply_delta(old, ops, block_size) == new
+    return ops
+
+
+OLD = make_data(40000)
+
+
+@pytest.mark.parametrize('new', [
+    OLD,                                           # unchanged
+    OLD[:12345] + b'inserted bytes' + OLD[12345:],  # insertion
+    OLD[:5000] + OLD[9000:],                        # deletion
+    OLD[:-1] + b'!',                               # last byte changed
+    b'prefix' + OLD,                                # shifted by a prefix
+    b'',                                            # emptied
+    make_data(40000, seed=1),                       # nothing in common
+], ids=['unchanged', 'insertion', 'deletion', 'last-byte', 'prefix', 'emptied', 'unrelated'])
+def test_delta_round_trip(new):
+    round_trip(OLD, new)
+
+
+def test_unchanged_file_is_sent_as_block_references():
+    ops = round_trip(OLD, OLD)
+    assert all(op == 'copy' for op, _ in ops)
+    assert delta_size(ops) == len(ops) * COPY_TOKEN_SIZE
+
+
+def test_insertion_only_sends_the_new_bytes():
+    new = OLD[:12345] + b'inserted bytes' + OLD[12345:]
+    ops = round_trip(OLD, new)
+    literal = sum(len(value) for op, value in ops if op == 'data')
+    # The inserted bytes plus at most the partial block they broke up
+    assert literal <= len(b'inserted bytes') + block_size_for(len(OLD))
+
+
+def test_short_tail_block_is_reused():
+    block_size = 512
+    old = make_data(3 * block_size + 100)
+    new = b'changed' + old
+    ops = round_trip(old, new, block_size)
+    assert ('copy', 3) in ops  # The 100 byte tail block
+    assert sum(len(value) for op, value in ops if op == 'data') == len(b'changed')
+
+
+def test_old_file_shorter_than_a_block():
+    round_trip(b'tiny', b'tiny but longer', 512)
+
+
+@pytest.fixture
+def folders(tmp_path):
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    source.mkdir()
+    return source, target, tmp_path / 'state.json'
+
+
+def test_sync_folder_sends_deltas_and_deletes_removed_files(folders):
+    source, target, state = folders
+    agent = make_data(60000)
+    (source / 'agent.py').write_bytes(agent)
+    (source / 'old.bat').write_bytes(b'@echo off\r\n')
+    first = sync_folder(source, target, state)
+    assert (first.changed, first.sent_bytes) == (2, first.total_bytes)
+
+    (source / 'agent.py').write_bytes(agent[:30000] + b'# fixed\n' + agent[30000:])
+    (source / 'old.bat').unlink()
+    second = sync_folder(source, target, state)
+    assert (target / 'agent.py').read_bytes() == (source / 'agent.py').read_bytes()
+    assert not (target / 'old.bat').exists()
+    assert (second.changed, second.deleted) == (1, 1)
+    assert second.sent_bytes < 2000
+    assert not list(target.glob('.*sync-tmp'))
+
+    third = sync_folder(source, target, state)
+    assert (third.changed, third.sent_bytes) == (0, 0)
+
+
+def test_sync_folder_leaves_foreign_files_alone(folders):
+    source, target, state = folders
+    (source / 'agent.py').write_bytes(b'print(1)\n')
+    target.mkdir()
+    (target / 'agent.log').write_bytes(b'kept')
+    sync_folder(source, target, state)
+    (source / 'agent.py').unlink()
+    sync_folder(source, target, state)
+    assert (target / 'agent.log').read_bytes() == b'kept'
+
+
+def test_stale_state_record_falls_back_to_full_file(folders):
+    source, target, state = folders
+    (source / 'agent.py').write_bytes(make_data(20000))
+    sync_folder(source, target, state)
+
+    # Rewrite the target behind the sync's back while keeping the recorded size and mtime,
+    # so the record is trusted but its block signatures no longer describe the file
+    stat = (target / 'agent.py').stat()
+    (target / 'agent.py').write_bytes(make_data(20000, seed=2))
+    os.utime(target / 'agent.py', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    record = json.loads(state.read_text())['files']['agent.py']
+    assert [stat.st_size, stat.st_mtime_ns] == [record['size'], record['mtime_ns']]
+
+    new = make_data(20000)[:10000] + b'update' + make_data(20000)[10000:]
+    (source / 'agent.py').write_bytes(new)
+    report = sync_folder(source, target, state)
+    assert (target / 'agent.py').read_bytes() == new
+    assert report.sent_bytes == len(new)
+
+
+def test_changed_target_folder_resets_the_state(folders, tmp_path):
+    source, target, state = folders
+    (source / 'agent.py').write_bytes(b'print(1)\n')
+    sync_folder(source, target, state)
+    other = tmp_path / 'other'
+    report = sync_folder(source, other, state)
+    assert report.changed == 1
+    assert (other / 'agent.py').read_bytes() == b'print(1)\n'